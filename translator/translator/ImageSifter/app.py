@@ -1,389 +1,202 @@
 import streamlit as st
 import os
-import time
-from PIL import Image
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+import hashlib
 import tempfile
-import zipfile
-from io import BytesIO
-import requests
-import urllib.parse
+import threading
+import time
+from archive import JsonLinesExport, StreamingArchive
+from dedupe import DEDUPE_THRESHOLD, saved_work
+from jobqueue import JobQueue
+from metrics import REGISTRY, summarize
+from reporting import StreamlitReporter
+from thumbnails import thumbnail_for_digest, thumbnail_for_file
+from worker import ensure_worker
+from translation import (
+    MAX_DIMENSION,
+    MAX_WORKERS,
+    POOL_SIZE,
+    SUPPORTED_EXTENSIONS,
+    get_driver_pool,
+    get_translation_cache,
+    translate_batch,
+)
 
-def setup_chrome_driver():
-    """Set up Chrome driver with headless options for Replit environment"""
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")  # Use new headless mode
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-logging")
-    chrome_options.add_argument("--disable-web-security")
-    chrome_options.add_argument("--allow-running-insecure-content")
-    chrome_options.add_argument("--disable-background-timer-throttling")
-    chrome_options.add_argument("--disable-backgrounding-occluded-windows")
-    chrome_options.add_argument("--disable-renderer-backgrounding")
-    chrome_options.add_argument("--disable-features=VizDisplayCompositor")
-    chrome_options.add_argument("--disable-ipc-flooding-protection")
-    chrome_options.add_argument("--disable-default-apps")
-    chrome_options.add_argument("--disable-hang-monitor")
-    chrome_options.add_argument("--disable-prompt-on-repost")
-    chrome_options.add_argument("--disable-sync")
-    chrome_options.add_argument("--force-color-profile=srgb")
-    chrome_options.add_argument("--metrics-recording-only")
-    chrome_options.add_argument("--disable-background-networking")
-    chrome_options.add_argument("--enable-features=NetworkService,NetworkServiceInProcess")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--start-maximized")
-    
-    # Set up binary locations
-    import subprocess
-    
+def _streamlit_thread_initializer():
+    """Let worker threads write st.* messages into the session that started the batch"""
     try:
-        # Get chromium path
-        result = subprocess.run(['which', 'chromium'], capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            chrome_options.binary_location = result.stdout.strip()
-    except:
-        pass
-    
-    # Use system chromedriver directly
-    chromedriver_path = "/nix/store/8zj50jw4w0hby47167kqqsaqw4mm5bkd-chromedriver-unwrapped-138.0.7204.100/bin/chromedriver"
-    
-    try:
-        service = Service(executable_path=chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Set timeouts to prevent session issues
-        driver.implicitly_wait(10)
-        driver.set_page_load_timeout(30)
-        driver.set_script_timeout(30)
-        
-        return driver
-    except Exception as e:
-        raise Exception(f"Failed to start ChromeDriver: {str(e)}")
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+# Thumbnails shown per page in the upload preview grid
+PREVIEW_PAGE_SIZE = 12
+
+# (code, name) pairs offered in the language pickers
+TARGET_LANGUAGES = [
+    ("en", "English"),
+    ("es", "Spanish"),
+    ("fr", "French"),
+    ("de", "German"),
+    ("it", "Italian"),
+    ("pt", "Portuguese"),
+    ("ru", "Russian"),
+    ("ja", "Japanese"),
+    ("ko", "Korean"),
+    ("zh", "Chinese"),
+    ("ar", "Arabic"),
+    ("hi", "Hindi"),
+]
+SOURCE_LANGUAGES = [("auto", "Auto-detect")] + TARGET_LANGUAGES
 
-def translate_image_with_google(image_path, source_lang="auto", target_lang="en"):
+def per_file_languages(uploaded_files, source_lang, target_lang):
+    """(source, target) for every upload: the pickers above, unless overridden in an editable table"""
+    if len(uploaded_files) < 2:
+        return [(source_lang, target_lang)] * len(uploaded_files)
+    source_names, target_names = dict(SOURCE_LANGUAGES), dict(TARGET_LANGUAGES)
+    source_codes = {name: code for code, name in SOURCE_LANGUAGES}
+    target_codes = {name: code for code, name in TARGET_LANGUAGES}
+    names = [uploaded_file.name for uploaded_file in uploaded_files]
+    with st.expander("🗺️ Per-image languages"):
+        st.caption("Mixed-language batch? Change the languages of individual images here. "
+                   "Images are scheduled by language pair, so each browser keeps its page loaded.")
+        rows = st.data_editor(
+            [{"Image": name, "Source": source_names[source_lang], "Target": target_names[target_lang]} for name in names],
+            column_config={
+                "Image": st.column_config.TextColumn(disabled=True),
+                "Source": st.column_config.SelectboxColumn(options=list(source_codes), required=True),
+                "Target": st.column_config.SelectboxColumn(options=list(target_codes), required=True),
+            },
+            hide_index=True,
+            # A different set of uploads starts from the pickers again
+            key="file_languages_" + hashlib.sha256("\n".join(names).encode()).hexdigest()[:16],
+        )
+    return [(source_codes.get(row["Source"], source_lang), target_codes.get(row["Target"], target_lang)) for row in rows]
+
+def upload_thumbnail(uploaded_file, max_size):
+    """Preview of an upload; the content hash is remembered per upload so reruns skip re-reading it"""
+    digests = st.session_state.setdefault("upload_digests", {})
+    file_key = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    digest = digests.get(file_key)
+    if digest is None:
+        digest = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+        digests[file_key] = digest
+    return thumbnail_for_digest(digest, max_size, uploaded_file.getvalue)
+
+# How often a running background job's page refreshes itself
+JOB_POLL_SECONDS = 2
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+def render_results(results, archive_path=None):
     """
-    Translate an image using Google Translate's image translation feature
+    Show original/translated previews side by side, plus a download if there is one: a ZIP of
+    images, or for text-only results (a 'translated_text' dict) a JSON-lines file
     """
-    try:
-        driver = setup_chrome_driver()
-    except Exception as e:
-        import traceback
-        error_msg = f"Failed to start browser: {str(e)}"
-        full_traceback = traceback.format_exc()
-        st.error(error_msg)
-        st.error(f"Browser setup error details: {full_traceback}")
-        return None, None
+    if not results:
+        st.warning("No images were successfully translated. Please try again.")
+        return
     
-    try:
-        # Navigate to Google Translate image translation with explicit parameters
-        url = f"https://translate.google.com/?sl={source_lang}&tl={target_lang}&op=images"
-        st.info(f"🌐 Navigating to: {url}")
-        driver.get(url)
-        
-        # Wait for page to load completely
-        WebDriverWait(driver, 15).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
-        
-        # Extra wait and check if we're on the right page
-        time.sleep(4)
-        
-        # Verify we're on the image translation page
-        current_url = driver.current_url
-        page_title = driver.title
-        st.info(f"📍 Current page: {page_title}")
-        
-        if "translate" not in current_url.lower():
-            st.error("❌ Failed to navigate to Google Translate properly")
-            raise Exception("Not on Google Translate page")
-        
-        # Check if Images tab is selected
-        try:
-            images_tab = driver.find_element(By.XPATH, "//div[contains(text(), 'Images') or contains(text(), 'images')]")
-            if images_tab:
-                st.info("✅ Images tab found - clicking to ensure it's selected")
-                driver.execute_script("arguments[0].click();", images_tab)
-                time.sleep(2)
-        except:
-            st.info("ℹ️ Images tab not found or already selected")
-        
-        # First try to click the "Browse your files" button if it exists
-        try:
-            browse_button = driver.find_element(By.XPATH, "//button[contains(text(), 'Browse your files') or contains(text(), 'browse')]")
-            if browse_button.is_displayed():
-                st.info("🔍 Found 'Browse your files' button - clicking it")
-                driver.execute_script("arguments[0].click();", browse_button)
-                time.sleep(1)
-        except:
-            st.info("ℹ️ No 'Browse your files' button found")
-        
-        # Find the file upload input element
-        upload_selectors = [
-            "input[type='file'][accept*='image']",
-            "input[type='file']",
-            "[data-test-id='file-upload'] input",
-            ".VfPpkd-Bz112c input[type='file']"
-        ]
-        
-        upload_element = None
-        for selector in upload_selectors:
-            try:
-                upload_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                for element in upload_elements:
-                    # Make sure it's visible or at least present
-                    if element.is_enabled():
-                        upload_element = element
-                        st.info(f"✅ Found upload element using selector: {selector}")
-                        break
-                if upload_element:
-                    break
-            except:
-                continue
-        
-        if not upload_element:
-            st.error("❌ Could not find any file upload element")
-            # Try to take a screenshot for debugging
-            debug_screenshot = f"{image_path}_debug_upload_page.png"
-            driver.save_screenshot(debug_screenshot)
-            raise Exception("Could not find file upload element")
-        
-        # Upload the image
-        st.info(f"📤 Uploading image: {image_path}")
-        upload_element.send_keys(image_path)
-        st.info("✅ File upload command sent")
+    st.subheader("🎯 Translation Results")
+    
+    for result in results:
+        st.markdown(f"### 📄 {result['original_name']}")
         
-        # Wait for upload confirmation and then for translation
-        time.sleep(3)  # Wait for upload
+        col1, col2 = st.columns([1, 1])
         
-        # Wait for the page to change after upload - look for actual content changes
-        max_wait_for_translation = 25
-        translation_completed = False
+        with col1:
+            st.markdown("**Original Image:**")
+            st.image(result['original_preview'], width=300)
         
-        for attempt in range(max_wait_for_translation):
-            try:
-                # Look for specific translation UI elements that appear after successful translation
-                translation_indicators = [
-                    "//button[contains(text(), 'Download translation')]",
-                    "//button[contains(text(), 'Copy text')]",
-                    "//*[contains(text(), 'Detected language')]",
-                    "//*[contains(@aria-label, 'Download')]",
-                    "//*[contains(@aria-label, 'Copy')]"
-                ]
-                
-                found_indicator = False
-                for indicator_xpath in translation_indicators:
-                    try:
-                        elements = driver.find_elements(By.XPATH, indicator_xpath)
-                        if elements and any(elem.is_displayed() for elem in elements):
-                            translation_completed = True
-                            found_indicator = True
-                            st.success(f"✅ Translation UI detected after {attempt + 1} seconds using: {indicator_xpath}")
-                            break
-                    except:
-                        continue
-                
-                if found_indicator:
-                    break
-                
-                # Also check if page URL changed (sometimes happens after successful upload)
-                current_url = driver.current_url
-                if "blob:" in current_url or len(current_url) > 100:
-                    st.info(f"📍 Page URL changed - possible translation: {current_url[:100]}...")
-                    
-                time.sleep(1)
-            except Exception as e:
-                st.warning(f"Error checking translation status: {str(e)}")
-                time.sleep(1)
-                
-        if not translation_completed:
-            # Check if Google Translate shows "No text found" or similar messages
-            page_source = driver.page_source.lower()
-            
-            if "no text found" in page_source or "no text" in page_source:
-                st.error("❌ Google Translate reports: 'No text found' in the image")
-                st.info("💡 Suggestions to fix this:")
-                st.info("• Try an image with clearer, larger text")
-                st.info("• Ensure the text has good contrast with the background")
-                st.info("• Use images with horizontal text (not rotated)")
-                st.info("• Try a different image format or higher resolution")
-            elif "not supported" in page_source:
-                st.error("❌ Image format not supported by Google Translate")
+        with col2:
+            text = result.get('translated_text')
+            if text:
+                st.markdown("**Translated Text:**")
+                if text.get('detected_language'):
+                    st.caption(f"Detected language: {text['detected_language']}")
+                st.text(text['translated_text'])
+                if text.get('source_text'):
+                    with st.expander("Original text"):
+                        st.text(text['source_text'])
             else:
-                st.error("❌ Translation failed - Google Translate couldn't process this image")
-                st.info("🔄 This could mean the image format isn't supported or the text wasn't detected")
-        
-        # Additional wait for any remaining processing
-        time.sleep(3)
-        
-        # Look for the translated image and download it directly
-        translated_image_path = None
-        
-        try:
-            # Look for all images on the page and find the translated one
-            all_imgs = driver.find_elements(By.TAG_NAME, "img")
-            
-            translated_img = None
-            original_img_src = None
-            
-            # First, identify the original image to avoid selecting it
-            for img in all_imgs:
-                try:
-                    src = img.get_attribute('src')
-                    # Skip if it's an icon or very small image
-                    if img.size['width'] < 100 or img.size['height'] < 100:
-                        continue
-                    # This might be the original uploaded image
-                    if src and ('blob:' in src or 'data:image' in src):
-                        # Check if this is in the input area (left side)
-                        location = img.location
-                        if location['x'] < driver.get_window_size()['width'] / 2:
-                            original_img_src = src
-                except:
-                    continue
-            
-            # Now find the translated image (should be on the right side or different from original)
-            for img in all_imgs:
-                try:
-                    src = img.get_attribute('src')
-                    
-                    # Skip small images
-                    if img.size['width'] < 100 or img.size['height'] < 100:
-                        continue
-                    
-                    # Skip if it's the same as original
-                    if src == original_img_src:
-                        continue
-                        
-                    # Look for images that are likely the translation result
-                    location = img.location
-                    window_width = driver.get_window_size()['width']
-                    
-                    # Prefer images on the right side of the screen (translation result area)
-                    if location['x'] > window_width / 2:
-                        translated_img = img
-                        break
-                    
-                    # Or images with translation-related attributes
-                    if (src and ('googleusercontent.com' in src or 'translate' in src) and 
-                        src != original_img_src):
-                        translated_img = img
-                        break
-                        
-                except:
-                    continue
-            
-            # Fallback: get the last significant image that's not the original
-            if not translated_img:
-                for img in reversed(all_imgs):
-                    try:
-                        src = img.get_attribute('src')
-                        if (img.size['width'] > 100 and img.size['height'] > 100 and 
-                            src != original_img_src and src):
-                            translated_img = img
-                            break
-                    except:
-                        continue
-            
-            if translated_img:
-                # Get the source URL of the translated image
-                img_src = translated_img.get_attribute('src')
-                st.info(f"Found translated image with source: {img_src[:50]}..." if img_src else "No source found")
-                
-                if img_src:
-                    # Handle blob URLs by getting image data directly from browser
-                    try:
-                        # Always use the canvas method for better quality
-                        script = """
-                        var img = arguments[0];
-                        var canvas = document.createElement('canvas');
-                        var ctx = canvas.getContext('2d');
-                        canvas.width = img.naturalWidth || img.width;
-                        canvas.height = img.naturalHeight || img.height;
-                        ctx.drawImage(img, 0, 0);
-                        return canvas.toDataURL('image/png');
-                        """
-                        
-                        base64_data = driver.execute_script(script, translated_img)
-                        
-                        if base64_data and base64_data.startswith('data:image'):
-                            # Remove the data URL prefix
-                            image_data = base64_data.split(',')[1]
-                            
-                            # Decode base64 and save
-                            import base64
-                            translated_image_path = f"{image_path}_translated.png"
-                            with open(translated_image_path, 'wb') as f:
-                                f.write(base64.b64decode(image_data))
-                            
-                            st.success("✅ Successfully extracted high-quality translated image using canvas method!")
-                        else:
-                            raise Exception("Canvas method failed - no valid image data returned")
-                        
-                    except Exception as download_error:
-                        st.error(f"❌ Canvas extraction failed: {str(download_error)}")
-                        # Try element screenshot as fallback
-                        try:
-                            translated_image_path = f"{image_path}_translated.png"
-                            translated_img.screenshot(translated_image_path)
-                            st.warning("⚠️ Used element screenshot fallback - quality may be reduced")
-                        except Exception as screenshot_error:
-                            st.error(f"Element screenshot also failed: {str(screenshot_error)}")
-                            # Final fallback to full screenshot
-                            translated_image_path = f"{image_path}_translated.png"
-                            driver.save_screenshot(translated_image_path)
-                            st.warning("⚠️ Used full page screenshot as final fallback")
+                st.markdown("**Translated Image:**")
+                if result['translated_path'] and os.path.exists(result['translated_path']):
+                    st.image(thumbnail_for_file(result['translated_path'], 600), width=300)
                 else:
-                    st.error("No image source URL found")
-                    # Fallback to full screenshot
-                    translated_image_path = f"{image_path}_translated.png"
-                    driver.save_screenshot(translated_image_path)
-            
-            else:
-                st.error("❌ No translated image found on the page")
-                
-        except Exception as e:
-            st.error(f"❌ Error during image extraction: {str(e)}")
-            
-        # Fallback to regular screenshot if everything else failed
-        if not translated_image_path:
-            st.warning("⚠️ Using full page screenshot as final fallback")
-            translated_image_path = f"{image_path}_translated.png"
-            driver.save_screenshot(translated_image_path)
+                    st.error("Translation failed for this image")
         
-        return translated_image_path, None
-            
-    except Exception as e:
-        import traceback
-        error_msg = f"Error translating image: {str(e)}"
-        full_traceback = traceback.format_exc()
-        st.error(error_msg)
-        st.error(f"Full error details: {full_traceback}")
-        return None, None
-    finally:
-        try:
-            driver.quit()
-        except:
-            pass
+        st.markdown("---")
+    
+    # Download translated images (or text)
+    if archive_path and archive_path.endswith(".jsonl") and os.path.exists(archive_path):
+        with open(archive_path, "rb") as jsonl_file:
+            st.download_button(
+                label="📥 Download All Translations (JSON Lines)",
+                data=jsonl_file,
+                file_name="translations.jsonl",
+                mime="application/jsonl",
+                type="primary"
+            )
+    elif archive_path and os.path.exists(archive_path):
+        with open(archive_path, "rb") as zip_file:
+            st.download_button(
+                label="📥 Download All Translated Images",
+                data=zip_file,
+                file_name="translated_images.zip",
+                mime="application/zip",
+                type="primary"
+            )
 
-def create_download_link(file_paths, filename="translated_images.zip"):
-    """Create a download link for multiple files as a zip"""
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for i, file_path in enumerate(file_paths):
-            if file_path and os.path.exists(file_path):
-                zip_file.write(file_path, f"translated_image_{i+1}.png")
+def render_job(queue, job_id):
+    """Progress of a queued job; polls until it finishes, then shows its results"""
+    job = queue.job(job_id)
+    if job is None:
+        st.warning(f"Background job {job_id} was not found (it may have been cleaned up).")
+        return
+    
+    counts = job['counts']
+    finished = counts['done'] + counts['failed']
+    st.subheader(f"🗂️ Background job {job_id}")
+    st.progress(finished / job['total'] if job['total'] else 1.0)
+    st.text(
+        f"{finished}/{job['total']} finished · {counts['running']} translating · "
+        f"{counts['pending']} waiting · {counts['failed']} failed"
+    )
+    
+    if job['status'] != 'finished':
+        if not queue.live_workers():
+            ensure_worker(queue)
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
     
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+    items = queue.items(job_id)
+    for item in items:
+        if item['status'] == 'failed':
+            st.error(f"Failed to translate {item['name']}: {item['error']}")
+    render_results([
+        {
+            'original_name': item['name'],
+            'original_preview': thumbnail_for_file(item['input_path'], 600),
+            'translated_path': item['output_path'],
+            'translated_text': item['result'],
+        }
+        for item in items if item['status'] == 'done'
+    ], job['archive_path'])
+    
+    phase_rows = summarize(job['phases'])
+    if phase_rows:
+        with st.expander("⏱️ Phase timings"):
+            st.table(phase_rows)
+    
+    if st.button("Clear job", key=f"clear_job_{job_id}"):
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+        st.rerun()
 
 def main():
     st.set_page_config(
@@ -401,21 +214,7 @@ def main():
     with col1:
         source_lang = st.selectbox(
             "Source Language",
-            options=[
-                ("auto", "Auto-detect"),
-                ("en", "English"),
-                ("es", "Spanish"),
-                ("fr", "French"),
-                ("de", "German"),
-                ("it", "Italian"),
-                ("pt", "Portuguese"),
-                ("ru", "Russian"),
-                ("ja", "Japanese"),
-                ("ko", "Korean"),
-                ("zh", "Chinese"),
-                ("ar", "Arabic"),
-                ("hi", "Hindi")
-            ],
+            options=SOURCE_LANGUAGES,
             format_func=lambda x: x[1],
             index=0
         )[0]
@@ -423,28 +222,55 @@ def main():
     with col2:
         target_lang = st.selectbox(
             "Target Language",
-            options=[
-                ("en", "English"),
-                ("es", "Spanish"),
-                ("fr", "French"),
-                ("de", "German"),
-                ("it", "Italian"),
-                ("pt", "Portuguese"),
-                ("ru", "Russian"),
-                ("ja", "Japanese"),
-                ("ko", "Korean"),
-                ("zh", "Chinese"),
-                ("ar", "Arabic"),
-                ("hi", "Hindi")
-            ],
+            options=TARGET_LANGUAGES,
             format_func=lambda x: x[1],
             index=0
         )[0]
     
+    concurrency = st.slider(
+        "Parallel browsers",
+        min_value=1,
+        max_value=max(MAX_WORKERS, 1),
+        value=min(POOL_SIZE, max(MAX_WORKERS, 1)),
+        help="Number of images translated at the same time. Each one uses its own browser."
+    )
+    background = st.toggle(
+        "Run as background job",
+        value=True,
+        help="Translation continues in a worker process even if you refresh or close this tab. "
+             "Reopen the page with the same ?job= link to collect the results."
+    )
+    restore_size = st.checkbox(
+        "Return translations at original resolution",
+        value=False,
+        help=f"Large images are downscaled to {MAX_DIMENSION}px before upload. Tick this to scale the translated result back up."
+    )
+    text_only = st.checkbox(
+        "Text only (no translated images)",
+        value=False,
+        help="Return just the recognized and translated text of each image, as a JSON-lines download. "
+             "Faster, because no image is pulled out of the browser."
+    )
+    dedupe = st.checkbox(
+        "Translate near-duplicate images once",
+        value=DEDUPE_THRESHOLD >= 0,
+        help="Re-screenshots, slight crops and re-saved copies of the same image reuse one translation."
+    )
+    dedupe_threshold = -1
+    if dedupe:
+        dedupe_threshold = st.slider(
+            "Near-duplicate tolerance",
+            min_value=0,
+            max_value=16,
+            value=max(DEDUPE_THRESHOLD, 0),
+            help="How many of 256 perceptual-hash bits may differ. 0 merges only visually identical images; "
+                 "higher values also merge bigger edits, at the risk of merging pages with different text."
+        )
+    
     # File upload
     uploaded_files = st.file_uploader(
         "Choose image files to translate",
-        type=['png', 'jpg', 'jpeg', 'jfif', 'gif', 'bmp', 'webp'],
+        type=SUPPORTED_EXTENSIONS,
         accept_multiple_files=True,
         help="Upload one or more images containing text you want to translate"
     )
@@ -452,12 +278,18 @@ def main():
     if uploaded_files:
         st.subheader(f"📁 {len(uploaded_files)} image(s) uploaded")
         
-        # Show uploaded images
-        cols = st.columns(min(len(uploaded_files), 3))
-        for i, uploaded_file in enumerate(uploaded_files):
+        # Show uploaded images as cached thumbnails, a page at a time for large batches
+        page_count = (len(uploaded_files) + PREVIEW_PAGE_SIZE - 1) // PREVIEW_PAGE_SIZE
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Preview page (of {page_count})", min_value=1, max_value=page_count, value=1)
+        page_files = uploaded_files[(page - 1) * PREVIEW_PAGE_SIZE:page * PREVIEW_PAGE_SIZE]
+        cols = st.columns(min(len(page_files), 3))
+        for i, uploaded_file in enumerate(page_files):
             with cols[i % 3]:
-                image = Image.open(uploaded_file)
-                st.image(image, caption=uploaded_file.name, width='stretch')
+                st.image(upload_thumbnail(uploaded_file, 480), caption=uploaded_file.name, width='stretch')
+        
+        file_languages = per_file_languages(uploaded_files, source_lang, target_lang)
         
         col1, col2 = st.columns([1, 1])
         with col1:
@@ -472,15 +304,30 @@ def main():
             st.session_state.test_browser = False
             with st.spinner("Testing browser setup..."):
                 try:
-                    driver = setup_chrome_driver()
-                    driver.get("https://www.google.com")
+                    with get_driver_pool().lease() as driver:
+                        driver.get("https://www.google.com")
                     st.success("✅ Browser setup is working correctly!")
-                    driver.quit()
                 except Exception as e:
                     import traceback
                     st.error(f"❌ Browser test failed: {str(e)}")
                     st.error(f"Details: {traceback.format_exc()}")
         
+        if st.session_state.get("start_translation", False) and background:
+            st.session_state.start_translation = False
+            queue = get_job_queue()
+            job_id = queue.submit(
+                [(uploaded_file.name, uploaded_file.getvalue(), *languages)
+                 for uploaded_file, languages in zip(uploaded_files, file_languages)],
+                source_lang,
+                target_lang,
+                restore_size=restore_size,
+                dedupe_threshold=dedupe_threshold,
+                text_only=text_only,
+            )
+            ensure_worker(queue, concurrency=concurrency)
+            st.session_state.job_id = job_id
+            st.query_params["job"] = job_id
+        
         if st.session_state.get("start_translation", False):
             st.session_state.start_translation = False
             progress_bar = st.progress(0)
@@ -492,80 +339,117 @@ def main():
             # Create temporary directory for processing
             with tempfile.TemporaryDirectory() as temp_dir:
                 
+                # Save uploaded files to temporary locations (index prefix keeps duplicate names apart)
+                items = []
                 for i, uploaded_file in enumerate(uploaded_files):
-                    status_text.text(f"Processing {uploaded_file.name}... ({i+1}/{len(uploaded_files)})")
-                    
-                    # Save uploaded file to temporary location
-                    temp_image_path = os.path.join(temp_dir, uploaded_file.name)
+                    temp_image_path = os.path.join(temp_dir, f"{i:04d}_{uploaded_file.name}")
                     with open(temp_image_path, "wb") as f:
                         f.write(uploaded_file.getbuffer())
-                    
-                    # Translate the image
-                    try:
-                        translated_path, translated_text = translate_image_with_google(
-                            temp_image_path, source_lang, target_lang
-                        )
-                        
-                        if translated_path or translated_text:
-                            translated_files.append(translated_path)
-                            translation_results.append({
-                                'original_name': uploaded_file.name,
-                                'translated_path': translated_path,
-                                'translated_text': translated_text
-                            })
-                        
-                    except Exception as e:
-                        st.error(f"Failed to translate {uploaded_file.name}: {str(e)}")
+                    items.append((temp_image_path, *file_languages[i], None))
+                
+                cache = get_translation_cache()
+                if text_only:
+                    archive = JsonLinesExport(os.path.join(temp_dir, "translations.jsonl"))
+                else:
+                    archive = StreamingArchive(os.path.join(temp_dir, "translated_images.zip"))
+                status_text.text(f"Translating {len(items)} image(s) with {concurrency} browser(s)...")
+                
+                # Cache hits come back first, then translations as each browser finishes
+                done = 0
+                cached_count = 0
+                duplicate_count = 0
+                fallback_count = 0
+                started = time.perf_counter()
+                metrics_before = REGISTRY.snapshot()
+                for outcome in translate_batch(
+                    items,
+                    concurrency=concurrency,
+                    reporter=StreamlitReporter(),
+                    cache=cache,
+                    initializer=_streamlit_thread_initializer(),
+                    restore_size=restore_size,
+                    dedupe_threshold=dedupe_threshold,
+                    text_only=text_only,
+                ):
+                    done += 1
+                    i = outcome['index']
+                    uploaded_file = uploaded_files[i]
+                    if outcome['cached']:
+                        cached_count += 1
+                    if outcome['duplicate_of'] is not None:
+                        duplicate_count += 1
+                    if outcome['fallback_path']:
+                        fallback_count += 1
+                    if outcome['error'] is not None:
+                        st.error(f"Failed to translate {uploaded_file.name}: {str(outcome['error'])}")
+                    elif outcome['translated_path'] or outcome['translated_text']:
+                        translated_files.append(outcome['translated_path'])
+                        # Append to the download archive as soon as each result lands
+                        if outcome['translated_text']:
+                            archive.add(dict(image=uploaded_file.name, source_lang=items[i][1],
+                                             target_lang=items[i][2], **outcome['translated_text']))
+                        elif outcome['translated_path'] and os.path.exists(outcome['translated_path']):
+                            archive.add(outcome['translated_path'], f"translated_image_{i+1}.png")
+                        translation_results.append({
+                            'index': i,
+                            'original_name': uploaded_file.name,
+                            'translated_path': outcome['translated_path'],
+                            'translated_text': outcome['translated_text']
+                        })
                     
                     # Update progress
-                    progress_bar.progress((i + 1) / len(uploaded_files))
-                    time.sleep(1)  # Small delay to avoid overwhelming Google Translate
+                    progress_bar.progress(done / len(items))
+                    status_text.text(f"Finished {uploaded_file.name} ({done}/{len(items)})")
                 
+                if cached_count:
+                    st.info(f"⚡ {cached_count} image(s) served from the translation cache")
+                if fallback_count:
+                    st.warning(
+                        f"📸 {fallback_count} image(s) only produced a page screenshot after every retry; "
+                        "they are not included in the results or the ZIP"
+                    )
+                if duplicate_count:
+                    saved = saved_work(duplicate_count, len(items) - cached_count - duplicate_count, time.perf_counter() - started)
+                    st.info(
+                        f"🧬 {duplicate_count} near-duplicate image(s) reused another upload's translation: "
+                        f"{saved['browser_runs']} browser run(s) instead of {saved['browser_runs'] + duplicate_count}, "
+                        f"about {saved['estimated_seconds_saved']:.0f}s saved"
+                    )
+                translation_results.sort(key=lambda r: r['index'])
                 status_text.text("Translation completed!")
+                if cache:
+                    cache_stats = cache.stats()
+                    st.caption(
+                        f"Translation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                        f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['bytes'] / (1024 * 1024):.1f} MB stored)"
+                    )
+                phase_rows = REGISTRY.summary(metrics_before)
+                if phase_rows:
+                    with st.expander("⏱️ Phase timings"):
+                        st.table(phase_rows)
                 
                 # Display results
-                if translation_results:
-                    st.subheader("🎯 Translation Results")
-                    
-                    for i, result in enumerate(translation_results):
-                        st.markdown(f"### 📄 {result['original_name']}")
-                        
-                        col1, col2 = st.columns([1, 1])
-                        
-                        with col1:
-                            st.markdown("**Original Image:**")
-                            original_image = Image.open(uploaded_files[i])
-                            st.image(original_image, width=300)
-                        
-                        with col2:
-                            st.markdown("**Translated Image:**")
-                            if result['translated_path'] and os.path.exists(result['translated_path']):
-                                st.image(result['translated_path'], width=300)
-                            else:
-                                st.error("Translation failed for this image")
-                        
-                        st.markdown("---")
-                    
-                    # Download translated images
-                    if any(result['translated_path'] for result in translation_results):
-                        valid_files = [result['translated_path'] for result in translation_results if result['translated_path'] and os.path.exists(result['translated_path'])]
-                        if valid_files:
-                            zip_data = create_download_link(valid_files)
-                            st.download_button(
-                                label="📥 Download All Translated Images",
-                                data=zip_data,
-                                file_name="translated_images.zip",
-                                mime="application/zip",
-                                type="primary"
-                            )
-                else:
-                    st.warning("No images were successfully translated. Please try again.")
+                archive_path = archive.close()
+                render_results([
+                    {
+                        'original_name': result['original_name'],
+                        'original_preview': upload_thumbnail(uploaded_files[result['index']], 600),
+                        'translated_path': result['translated_path'],
+                        'translated_text': result['translated_text'],
+                    }
+                    for result in translation_results
+                ], archive_path if archive.count else None)
+    
+    # Background job started from this tab (or reopened through the ?job= link)
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    if job_id:
+        render_job(get_job_queue(), job_id)
     
     # Instructions
     with st.expander("ℹ️ How to use this app"):
         st.markdown("""
         1. **Select Languages**: Choose your source language (or auto-detect) and target language
-        2. **Upload Images**: Select one or more images containing text you want to translate
+        2. **Upload Images**: Select one or more images containing text you want to translate (for a mixed-language batch, set each image's languages under **Per-image languages**)
         3. **Translate**: Click the "Translate All Images" button to process your images
         4. **Download**: Once translation is complete, download your translated images as a zip file
         
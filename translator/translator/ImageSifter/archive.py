@@ -0,0 +1,107 @@
+"""Streaming exports of batch results: a ZIP of translated images, or JSON lines of text"""
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from metrics import span
+
+# Formats that are already compressed; deflating them again only burns CPU
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.jfif', '.gif', '.webp'}
+
+
+class StreamingArchive:
+    """
+    Builds a ZIP on disk one file at a time, as results complete.
+
+    Entries are streamed from their source files in chunks, so peak memory stays flat no
+    matter how many images the batch produces. Already-compressed images are STORED.
+    """
+
+    def __init__(self, path=None, directory=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=".zip", dir=directory)
+            os.close(fd)
+        self.path = path
+        self.count = 0
+        self._names = set()
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(path, "w", allowZip64=True)
+
+    def _unique_name(self, arcname):
+        stem, extension = os.path.splitext(arcname)
+        counter = 2
+        while arcname in self._names:
+            arcname = f"{stem}_{counter}{extension}"
+            counter += 1
+        self._names.add(arcname)
+        return arcname
+
+    def add(self, file_path, arcname=None):
+        """Append one file; returns the name it was stored under"""
+        arcname = arcname or os.path.basename(file_path)
+        extension = os.path.splitext(arcname)[1].lower()
+        compression = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        with self._lock, span("zip"):
+            arcname = self._unique_name(arcname)
+            self._zip.write(file_path, arcname, compress_type=compression)
+            self.count += 1
+        return arcname
+
+    def close(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+        return self.path
+
+    def open(self):
+        """Finish the archive and return it as a binary file object, ready to stream out"""
+        self.close()
+        return open(self.path, "rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonLinesExport:
+    """
+    Text-only counterpart of StreamingArchive: appends one JSON object per line as results
+    complete, so a bulk export never has to be held in memory.
+    """
+
+    def __init__(self, path=None, directory=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=".jsonl", dir=directory)
+            os.close(fd)
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+
+    def add(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return self.path
+
+    def open(self):
+        """Finish the export and return it as a binary file object, ready to stream out"""
+        self.close()
+        return open(self.path, "rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
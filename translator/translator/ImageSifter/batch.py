@@ -0,0 +1,243 @@
+"""Concurrent batch translation across several pooled browsers"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all workers so the batch as a whole never starts more than
+    `rate` translations per second (with short bursts of up to `burst`).
+    """
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = self.base_rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self, factor=0.5, floor=0.05):
+        """Cut the rate (multiplicatively, never below `floor` of the base rate)"""
+        with self._lock:
+            if self.base_rate > 0:
+                self.rate = max(self.base_rate * floor, self.rate * factor)
+
+    def recover(self, step=0.1):
+        """Creep back towards the base rate after a success"""
+        with self._lock:
+            if self.base_rate > 0:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * step)
+
+
+class CircuitBreaker:
+    """
+    Pauses every worker when Google starts throttling, then lets a single probe through.
+
+    A throttle response, `failure_threshold` remote failures in a row, or a failed probe opens
+    the breaker for `cooldown` seconds (doubling on each reopen up to `max_cooldown`) and halves
+    the shared rate limiter, which recovers gradually as translations succeed again.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, max_cooldown=300.0, rate_limiter=None):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_cooldown = self.cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.rate_limiter = rate_limiter
+        self.state = "closed"
+        self.trips = 0
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_attempt(self):
+        """Block while the breaker is open; in half-open state only one caller gets through"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.state == "open" and now >= self._open_until:
+                    self.state = "half_open"
+                    self._probing = False
+                if self.state == "closed":
+                    return
+                if self.state == "half_open" and not self._probing:
+                    self._probing = True
+                    return
+                wait = self._open_until - now if self.state == "open" else 0.5
+            time.sleep(min(max(wait, 0.05), 5.0))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != "closed":
+                self.state = "closed"
+                self.cooldown = self.base_cooldown
+            self._probing = False
+        if self.rate_limiter:
+            self.rate_limiter.recover()
+
+    def release(self):
+        """End an attempt that says nothing about Google (e.g. a local browser crash)"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, throttled=False):
+        """Count a remote failure; returns the pause in seconds if this opened the breaker"""
+        with self._lock:
+            if self.state == "open":
+                return None
+            self._failures += 1
+            if not (throttled or self.state == "half_open" or self._failures >= self.failure_threshold):
+                return None
+            pause = self.cooldown
+            self.state = "open"
+            self._open_until = time.monotonic() + pause
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._failures = 0
+            self._probing = False
+            self.trips += 1
+        if self.rate_limiter:
+            self.rate_limiter.slow_down()
+        return pause
+
+
+class GroupScheduler:
+    """
+    Hands out jobs so that each worker sticks to one group (e.g. a language pair, whose page its
+    browser already has loaded) for as long as that group has work.
+
+    A worker moves on when its group runs dry, or after `quantum` jobs in a row while another
+    group has nobody working on it. It then takes the group that has gone unserved the longest,
+    or else helps the one with the most jobs left per worker. A small group therefore waits for
+    at most `quantum` jobs of one worker instead of for the big groups to drain.
+    """
+
+    _UNASSIGNED = object()
+
+    def __init__(self, keys, quantum=8):
+        self.quantum = max(1, int(quantum)) if quantum else None
+        self.switches = 0
+        self._pending = {}
+        for index, key in enumerate(keys):
+            self._pending.setdefault(key, deque()).append(index)
+        self._serving = dict.fromkeys(self._pending, 0)
+        # Dispatch count at which each group was last left without a worker
+        self._idle_since = dict.fromkeys(self._pending, 0)
+        self._dispatched = 0
+        self._workers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def groups(self):
+        return len(self._pending)
+
+    def _leave(self, key):
+        if key in self._serving:
+            self._serving[key] -= 1
+            if not self._serving[key]:
+                self._idle_since[key] = self._dispatched
+
+    def next(self, worker):
+        """Index of the next job for `worker`, or None when there is nothing left"""
+        with self._lock:
+            state = self._workers.setdefault(worker, [self._UNASSIGNED, 0])
+            key, streak = state
+            jobs = self._pending.get(key) if key is not self._UNASSIGNED else None
+            starved = any(
+                pending and not self._serving[other] for other, pending in self._pending.items() if other != key
+            )
+            if not jobs or (self.quantum and streak >= self.quantum and starved):
+                self._leave(key)
+                candidates = [other for other, pending in self._pending.items() if pending and other != key]
+                if not candidates and jobs:
+                    candidates = [key]
+                if not candidates:
+                    state[:] = [self._UNASSIGNED, 0]
+                    return None
+                unserved = [other for other in candidates if not self._serving[other]]
+                if unserved:
+                    chosen = min(unserved, key=self._idle_since.__getitem__)
+                else:
+                    chosen = max(candidates, key=lambda other: len(self._pending[other]) / self._serving[other])
+                if key is not self._UNASSIGNED and chosen != key:
+                    self.switches += 1
+                self._serving[chosen] += 1
+                state[:] = [chosen, 0]
+            state[1] += 1
+            self._dispatched += 1
+            return self._pending[state[0]].popleft()
+
+    def cancel(self):
+        """Drop every job not handed out yet"""
+        with self._lock:
+            for pending in self._pending.values():
+                pending.clear()
+
+
+def run_batch(jobs, translate_fn, concurrency=2, rate_limiter=None, initializer=None, scheduler=None):
+    """
+    Run `translate_fn(*job)` for every job on `concurrency` worker threads.
+
+    Each worker leases its own browser from the driver pool inside `translate_fn`. Yields
+    `(index, result, error)` in completion order, not input order, so callers can report
+    progress as soon as any image finishes. Jobs are handed out first in, first out unless a
+    GroupScheduler over the same jobs is passed as `scheduler`.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    if scheduler is None:
+        scheduler = GroupScheduler([None] * len(jobs))
+    results = queue.Queue()
+    finished = object()
+
+    def _work():
+        worker = threading.get_ident()
+        try:
+            while True:
+                index = scheduler.next(worker)
+                if index is None:
+                    return
+                try:
+                    if rate_limiter:
+                        rate_limiter.acquire()
+                    results.put((index, translate_fn(*jobs[index]), None))
+                except Exception as e:
+                    results.put((index, None, e))
+        finally:
+            results.put(finished)
+
+    workers = max(1, min(int(concurrency), len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate", initializer=initializer) as executor:
+        futures = [executor.submit(_work) for _ in range(workers)]
+        try:
+            running = workers
+            while running:
+                result = results.get()
+                if result is finished:
+                    running -= 1
+                    continue
+                yield result
+            for future in futures:
+                # A worker killed by something other than an Exception would leave jobs unreported
+                future.result()
+        finally:
+            # The caller stopped listening; let the workers finish what they hold, nothing more
+            scheduler.cancel()
@@ -0,0 +1,259 @@
+"""
+Offline benchmark of the Selenium flow against a local stand-in for Google Translate.
+
+    python benchmark.py --images 12 --delay 1.5 --concurrency 2 --json bench.json
+    python benchmark.py --baseline bench.json --max-regression 0.15
+
+Each scenario translates the same synthetic images through translate_image_with_google with a
+real headless browser and reports throughput, p50/p95 latency, peak RSS and browser-start cost.
+With --baseline the run fails (exit 1) when a scenario is slower than the baseline by more than
+--max-regression, so it can gate performance changes. --text-only measures the text-only
+mode, which reads the result panel's text instead of extracting the image.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from driver_pool import _process_tree_rss
+from fake_translate import FakeTranslateServer
+from metrics import REGISTRY
+
+logger = logging.getLogger("imagesifter")
+
+# name -> (concurrency, pool size, max jobs per browser); None means --concurrency
+SCENARIOS = {
+    "sequential": (1, 1, 1),        # one cold browser per image, the pre-pool behaviour
+    "pooled": (1, 1, None),         # one warm browser reused for every image
+    "parallel": (None, None, None), # --concurrency warm browsers side by side
+}
+
+
+def make_inputs(count, size, directory):
+    """Write `count` distinct synthetic text images of `size` (width, height)"""
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    paths = []
+    for i in range(count):
+        image = Image.new("RGB", size, (250, 250, 245))
+        draw = ImageDraw.Draw(image)
+        line = max(12, height // 24)
+        for row, y in enumerate(range(line, height - line, line * 2)):
+            draw.text((line, y), f"Sample {i} line {row}", fill=(20, 20, 20))
+            draw.rectangle((width // 2, y, width // 2 + (i * 37 + row * 53) % (width // 3), y + line // 2), fill=(60, 60, 60))
+        path = os.path.join(directory, f"bench_{i:03d}.png")
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+class RssSampler:
+    """Tracks the peak resident memory of this process and every browser it started"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, _process_tree_rss(os.getpid()) or 0)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def run_scenario(name, inputs, output_dir, concurrency, pool_size, max_jobs, text_only=False):
+    """Translate every input once under one pool configuration; returns the result row"""
+    from batch import run_batch
+    from driver_pool import DriverPool
+    from reporting import LoggingReporter
+    from translation import POOL_MAX_RSS_MB, images_page_url, launch_driver, translate_image_with_google
+
+    pool = DriverPool(
+        launch_driver,
+        size=pool_size,
+        max_jobs=max_jobs,
+        max_rss_mb=POOL_MAX_RSS_MB,
+        warm_url=images_page_url("auto", "en"),
+    )
+    reporter = LoggingReporter()
+    latencies = []
+    succeeded = 0
+
+    def _timed(*job):
+        start = time.perf_counter()
+        try:
+            return translate_image_with_google(*job, text_only=text_only)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    jobs = [
+        (path, "auto", "en", pool, None, None, reporter, os.path.join(output_dir, f"{name}_{i:03d}.png"))
+        for i, path in enumerate(inputs)
+    ]
+    before = REGISTRY.snapshot()
+    # No rate limiter: the point is what the browsers can do, not the politeness budget
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        try:
+            for index, result, error in run_batch(jobs, _timed, concurrency=concurrency):
+                if error is None and result and (result[1] if text_only else result[0] and os.path.exists(result[0])):
+                    succeeded += 1
+                else:
+                    logger.warning("%s: image %d failed: %s", name, index, error)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = dict(pool.stats)
+            pool.close()
+
+    phases = {row["phase"]: row for row in REGISTRY.summary(before)}
+    launches = phases.get("driver_launch", {})
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "images": len(inputs),
+        "succeeded": succeeded,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_min": round(len(inputs) / elapsed * 60, 2) if elapsed else 0.0,
+        "p50_s": round(_percentile(latencies, 0.5) or 0.0, 3),
+        "p95_s": round(_percentile(latencies, 0.95) or 0.0, 3),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+        "browser_starts": launches.get("count", 0),
+        "browser_start_mean_s": launches.get("mean_s", 0.0),
+        "browser_start_total_s": launches.get("total_s", 0.0),
+        "pool": stats,
+        "phases": list(phases.values()),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Return one message per scenario that regressed beyond `max_regression` (a fraction)"""
+    previous = {row["scenario"]: row for row in baseline.get("results", [])}
+    failures = []
+    for row in results:
+        old = previous.get(row["scenario"])
+        if not old:
+            continue
+        if row["succeeded"] < old["succeeded"]:
+            failures.append(f"{row['scenario']}: {row['succeeded']} succeeded, baseline {old['succeeded']}")
+        if old["throughput_per_min"] and row["throughput_per_min"] < old["throughput_per_min"] * (1 - max_regression):
+            failures.append(
+                f"{row['scenario']}: throughput {row['throughput_per_min']}/min, baseline {old['throughput_per_min']}/min"
+            )
+        if old["p95_s"] and row["p95_s"] > old["p95_s"] * (1 + max_regression):
+            failures.append(f"{row['scenario']}: p95 {row['p95_s']}s, baseline {old['p95_s']}s")
+    return failures
+
+
+def _size(value):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the translation flow against a local fake Translate page.")
+    parser.add_argument("-n", "--images", type=int, default=12, help="Images per scenario")
+    parser.add_argument("--image-size", type=_size, default=(1600, 1200), help="Synthetic input size, WIDTHxHEIGHT")
+    parser.add_argument("--result-size", type=_size, help="Rendered translation size (default: same as input)")
+    parser.add_argument("--delay", type=float, default=1.5, help="Seconds the fake page takes to 'translate'")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds")
+    parser.add_argument("-c", "--concurrency", type=int, default=2, help="Browsers for the parallel scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--text-only", action="store_true", help="Read the translated text instead of extracting images")
+    parser.add_argument("--json", help="Write the results here")
+    parser.add_argument("--baseline", help="Fail if results regress against this earlier --json output")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="Allowed slowdown vs. baseline (fraction)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every step of each translation")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        logger.error("Unknown scenario(s): %s", ", ".join(unknown))
+        return 2
+
+    server = FakeTranslateServer(delay=args.delay, jitter=args.jitter, result_size=args.result_size).start()
+    # translation.py reads its settings at import time, so point it at the fake page first;
+    # the result cache stays off so every scenario does the full browser round trip
+    os.environ["IMAGESIFTER_TRANSLATE_URL"] = server.url
+    os.environ["IMAGESIFTER_CACHE_DIR"] = ""
+    # Rebuilding the shared profile would add a browser to the measurement; warm it beforehand
+    os.environ["IMAGESIFTER_PROFILE_AUTO_WARM"] = "0"
+    from translation import POOL_MAX_JOBS
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="imagesifter-bench-") as work_dir:
+            inputs = make_inputs(args.images, args.image_size, work_dir)
+            for name in names:
+                concurrency, pool_size, max_jobs = SCENARIOS[name]
+                concurrency = concurrency or args.concurrency
+                pool_size = pool_size or args.concurrency
+                logger.info("Running %s: %d image(s), %d browser(s)", name, len(inputs), concurrency)
+                row = run_scenario(name, inputs, work_dir, concurrency, pool_size, max_jobs or POOL_MAX_JOBS, args.text_only)
+                results.append(row)
+                logger.info(
+                    "%-10s %6.1f img/min  p50 %.2fs  p95 %.2fs  peak RSS %.0f MB  %d browser start(s) @ %.2fs",
+                    name, row["throughput_per_min"], row["p50_s"], row["p95_s"], row["peak_rss_mb"],
+                    row["browser_starts"], row["browser_start_mean_s"],
+                )
+    finally:
+        server.stop()
+
+    report = {
+        "created_at": time.time(),
+        "settings": {
+            "images": args.images,
+            "image_size": list(args.image_size),
+            "result_size": list(args.result_size) if args.result_size else None,
+            "delay": args.delay,
+            "jitter": args.jitter,
+            "concurrency": args.concurrency,
+            "text_only": args.text_only,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.max_regression)
+        for failure in failures:
+            logger.error("Regression: %s", failure)
+        if failures:
+            return 1
+    return 0 if all(row["succeeded"] == row["images"] for row in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
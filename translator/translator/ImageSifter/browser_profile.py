@@ -0,0 +1,337 @@
+"""
+Lightweight browser profile: smaller window, blocked non-essential requests, reused disk cache.
+
+The Translate page pulls in analytics, telemetry beacons, web fonts, account widgets and
+decorative images that play no part in image translation. They are dropped inside the browser
+with CDP Network.setBlockedURLs, so they never touch the network.
+
+A shared profile template (warmed once with the Translate app's bundles, cookies and consent
+state) is cloned copy-on-write for every browser, so new drivers start with a hot cache:
+
+    python browser_profile.py --warm
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+
+logger = logging.getLogger("imagesifter")
+
+# Viewport for every browser; the result heuristics only care about left vs. right half
+WINDOW_SIZE = os.environ.get("IMAGESIFTER_WINDOW_SIZE", "1280,900")
+
+# Set to 0 to let the page load everything, e.g. when diagnosing a layout change
+BLOCK_RESOURCES = os.environ.get("IMAGESIFTER_BLOCK_RESOURCES", "1") != "0"
+
+# Set to 0 to keep Google's icons and illustrations (uploads and results are never blocked)
+BLOCK_DECORATIVE_IMAGES = os.environ.get("IMAGESIFTER_BLOCK_DECORATIVE_IMAGES", "1") != "0"
+
+# Persistent HTTP cache shared between sessions (empty string disables it)
+DISK_CACHE_DIR = os.environ.get(
+    "IMAGESIFTER_DISK_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "imagesifter", "browser-cache")
+)
+DISK_CACHE_MB = int(os.environ.get("IMAGESIFTER_DISK_CACHE_MB", "200"))
+
+# Shared user-data template and its per-browser clones (empty string disables them)
+PROFILE_DIR = os.environ.get(
+    "IMAGESIFTER_PROFILE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "imagesifter", "profile")
+)
+
+# Templates older than this are rebuilt, so expired cookies and old bundles do not linger
+PROFILE_MAX_AGE_HOURS = float(os.environ.get("IMAGESIFTER_PROFILE_MAX_AGE_HOURS", "24"))
+
+# Rebuild a missing or stale template in the background when a browser starts
+PROFILE_AUTO_WARM = os.environ.get("IMAGESIFTER_PROFILE_AUTO_WARM", "1") != "0"
+
+_MANIFEST = "imagesifter-profile.json"
+
+# Per-process lock files Chromium leaves in a user-data dir; a copy must not inherit them
+_SINGLETON_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie")
+
+# Requests image translation does not need (CDP wildcard patterns)
+BLOCKED_URL_PATTERNS = [
+    # Analytics, ads and telemetry beacons
+    "*googletagmanager.com/*",
+    "*google-analytics.com/*",
+    "*doubleclick.net/*",
+    "*googlesyndication.com/*",
+    "*play.google.com/log*",
+    "*/gen_204*",
+    "*/jserror*",
+    "*/csi?*",
+    # Web fonts; system fonts render the same button labels
+    "*fonts.googleapis.com/*",
+    "*fonts.gstatic.com/*",
+    # Account bar, sign-in and sharing widgets
+    "*ogs.google.com/*",
+    "*apis.google.com/*",
+    "*accounts.google.com/*",
+    "*www.gstatic.com/og/*",
+    # Media the page never plays
+    "*.mp3",
+    "*.mp4",
+    "*.webm",
+]
+
+# Illustrations and icons served from static hosts; uploads are blob: and results are blob: or
+# googleusercontent.com, so neither is affected
+DECORATIVE_IMAGE_PATTERNS = [
+    "*gstatic.com/*.png",
+    "*gstatic.com/*.svg",
+    "*gstatic.com/*.gif",
+    "*gstatic.com/*.jpg",
+    "*gstatic.com/*.webp",
+]
+
+# Extra comma-separated patterns for local tweaks
+EXTRA_BLOCKED_URLS = [pattern.strip() for pattern in os.environ.get("IMAGESIFTER_BLOCKED_URLS", "").split(",") if pattern.strip()]
+
+
+def blocked_url_patterns():
+    if not BLOCK_RESOURCES:
+        return []
+    patterns = list(BLOCKED_URL_PATTERNS)
+    if BLOCK_DECORATIVE_IMAGES:
+        patterns.extend(DECORATIVE_IMAGE_PATTERNS)
+    return patterns + EXTRA_BLOCKED_URLS
+
+
+def apply_network_filter(driver, patterns=None):
+    """Block `patterns` (default: blocked_url_patterns()) for this browser; returns how many"""
+    patterns = blocked_url_patterns() if patterns is None else patterns
+    if not patterns or not hasattr(driver, "execute_cdp_cmd"):
+        return 0
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return len(patterns)
+
+
+def _claim_slot(root, slots):
+    """Take the first numbered directory under `root` whose flock is free; (directory, lock_file)"""
+    os.makedirs(root, exist_ok=True)
+    for slot in range(slots):
+        directory = os.path.join(root, f"slot-{slot}")
+        lock_file = open(f"{directory}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        os.makedirs(directory, exist_ok=True)
+        return directory, lock_file
+    return None, None
+
+
+def claim_disk_cache(root=None, slots=32):
+    """
+    Claim a cache directory no other running browser is using.
+
+    Chromium must not share one disk cache between live processes, so browsers take numbered
+    slots under `root`, each guarded by an flock. The lock is held by the returned file object
+    for as long as it stays open; keep it alive with the driver. Returns (directory, lock_file),
+    or (None, None) when caching is disabled or every slot is busy.
+    """
+    root = DISK_CACHE_DIR if root is None else root
+    if not root:
+        return None, None
+    return _claim_slot(root, slots)
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, _MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_singletons(directory):
+    for name in _SINGLETON_FILES:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def _copy_tree(source, destination):
+    """Clone a directory, sharing blocks with the source where the filesystem supports reflinks"""
+    try:
+        subprocess.run(["cp", "-a", "--reflink=auto", source, destination], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination, symlinks=True, ignore=shutil.ignore_patterns(*_SINGLETON_FILES))
+    _remove_singletons(destination)
+
+
+def profile_status(root=None):
+    """State of the shared template: 'disabled', 'missing', 'corrupt', 'stale' or 'fresh'"""
+    root = PROFILE_DIR if root is None else root
+    if not root:
+        return "disabled"
+    template = os.path.join(root, "template")
+    if not os.path.isdir(template):
+        return "missing"
+    manifest = _read_manifest(template)
+    if not manifest or not manifest.get("generation"):
+        return "corrupt"
+    try:
+        with open(os.path.join(template, "Default", "Preferences")) as f:
+            json.load(f)
+    except (OSError, ValueError):
+        return "corrupt"
+    if time.time() - manifest.get("created_at", 0) > PROFILE_MAX_AGE_HOURS * 3600:
+        return "stale"
+    return "fresh"
+
+
+def invalidate_profile(root=None, reason="invalidated"):
+    """Drop the shared template; browsers start from a blank profile until it is warmed again"""
+    root = PROFILE_DIR if root is None else root
+    template = os.path.join(root, "template") if root else None
+    if not template or not os.path.isdir(template):
+        return False
+    # Move it aside first so no clone ever copies a half-deleted template
+    doomed = os.path.join(root, f"template.invalid-{uuid.uuid4().hex[:8]}")
+    try:
+        os.rename(template, doomed)
+    except OSError:
+        return False
+    shutil.rmtree(doomed, ignore_errors=True)
+    logger.warning("Shared browser profile discarded: %s", reason)
+    return True
+
+
+def claim_profile(root=None, slots=32):
+    """
+    Copy-on-write clone of the shared template for one browser.
+
+    Clones live in flock-guarded slots like the disk cache and are refreshed whenever the
+    template has been rebuilt since. Stale or corrupt templates are discarded here. Returns
+    (directory, lock_file, manifest), or (None, None, None) when there is no usable template.
+    """
+    root = PROFILE_DIR if root is None else root
+    status = profile_status(root)
+    if status in ("stale", "corrupt"):
+        invalidate_profile(root, reason=f"template is {status}")
+    if status != "fresh":
+        return None, None, None
+
+    template = os.path.join(root, "template")
+    manifest = _read_manifest(template)
+    directory, lock_file = _claim_slot(os.path.join(root, "clones"), slots)
+    if directory is None:
+        return None, None, None
+    clone_manifest = _read_manifest(directory)
+    if not clone_manifest or clone_manifest.get("generation") != manifest["generation"]:
+        shutil.rmtree(directory, ignore_errors=True)
+        try:
+            _copy_tree(template, directory)
+        except (OSError, shutil.Error) as e:
+            logger.warning("Could not clone the shared browser profile: %s", e)
+            shutil.rmtree(directory, ignore_errors=True)
+            lock_file.close()
+            return None, None, None
+    return directory, lock_file, manifest
+
+
+def browser_version_changed(manifest, driver):
+    """True when `driver` runs a different browser build than the one that wrote the template"""
+    expected = (manifest or {}).get("browser_version")
+    actual = getattr(driver, "capabilities", {}).get("browserVersion")
+    return bool(expected and actual and expected != actual)
+
+
+def build_profile_template(launch, prime, root=None):
+    """
+    Publish a new shared template: `launch(user_data_dir)` starts a browser on a blank profile,
+    `prime(driver)` loads what should be cached, and the result atomically replaces the old
+    template. Returns the new manifest.
+    """
+    root = PROFILE_DIR if root is None else root
+    os.makedirs(root, exist_ok=True)
+    building = os.path.join(root, f"template.building-{uuid.uuid4().hex[:8]}")
+    template = os.path.join(root, "template")
+    previous = None
+    try:
+        driver = launch(building)
+        try:
+            prime(driver)
+            browser_version = driver.capabilities.get("browserVersion")
+        finally:
+            driver.quit()
+        _remove_singletons(building)
+        manifest = {"generation": uuid.uuid4().hex, "created_at": time.time(), "browser_version": browser_version}
+        with open(os.path.join(building, _MANIFEST), "w") as f:
+            json.dump(manifest, f)
+
+        if os.path.exists(template):
+            previous = os.path.join(root, f"template.old-{uuid.uuid4().hex[:8]}")
+            os.rename(template, previous)
+        os.rename(building, template)
+    except Exception:
+        if previous and not os.path.exists(template):
+            os.rename(previous, template)
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def profile_arguments(disk_cache_dir=None, user_data_dir=None):
+    """Chrome switches for the lightweight profile"""
+    arguments = [
+        f"--window-size={WINDOW_SIZE}",
+        "--no-first-run",
+        "--mute-audio",
+        "--disable-component-update",
+        "--disable-domain-reliability",
+        "--disable-client-side-phishing-detection",
+    ]
+    if user_data_dir:
+        # The cache lives inside the cloned profile, already primed by the template
+        arguments.append(f"--user-data-dir={user_data_dir}")
+    elif disk_cache_dir:
+        arguments.append(f"--disk-cache-dir={disk_cache_dir}")
+    if user_data_dir or disk_cache_dir:
+        arguments.append(f"--disk-cache-size={DISK_CACHE_MB * 1024 * 1024}")
+    return arguments
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the shared browser profile template.")
+    parser.add_argument("--warm", action="store_true", help="Build a fresh template by loading the Translate page once")
+    parser.add_argument("--clear", action="store_true", help="Delete the template and every clone")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if not PROFILE_DIR:
+        logger.error("IMAGESIFTER_PROFILE_DIR is empty; the shared profile is disabled")
+        return 2
+    if args.clear:
+        invalidate_profile(reason="cleared on request")
+        shutil.rmtree(os.path.join(PROFILE_DIR, "clones"), ignore_errors=True)
+    if args.warm:
+        from reporting import LoggingReporter
+        from translation import warm_profile
+        warm_profile(LoggingReporter())
+
+    manifest = _read_manifest(os.path.join(PROFILE_DIR, "template")) or {}
+    logger.info(
+        "Profile %s: %s (browser %s, built %s)",
+        PROFILE_DIR,
+        profile_status(),
+        manifest.get("browser_version", "?"),
+        time.strftime("%Y-%m-%d %H:%M", time.localtime(manifest["created_at"])) if "created_at" in manifest else "never",
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
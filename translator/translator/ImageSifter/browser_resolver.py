@@ -0,0 +1,192 @@
+"""
+Finds the browser and chromedriver to launch: once per process, with the answer cached on disk.
+
+IMAGESIFTER_CHROME_BINARY / IMAGESIFTER_CHROMEDRIVER win when set; otherwise the first of
+CHROME_CANDIDATES / DRIVER_CANDIDATES on PATH is used, with KNOWN_DRIVER_PATHS (the Replit
+image's Nix store chromedriver) after them. Both are asked for their version and a driver
+whose major version does not match the browser is skipped. The result is kept in
+BROWSER_CACHE and reused while every candidate found keeps its size and modification
+time, so a new container pays for a few stat() calls instead of `--version` subprocesses, and
+an upgraded or newly installed browser or driver is noticed. When no matching chromedriver
+is installed, Selenium Manager is left to provide one.
+
+    python browser_resolver.py            # show what would be launched
+    python browser_resolver.py --refresh  # probe again and rewrite the cache
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+CHROME_BINARY = os.environ.get("IMAGESIFTER_CHROME_BINARY", "")
+CHROMEDRIVER = os.environ.get("IMAGESIFTER_CHROMEDRIVER", "")
+
+# Where the resolved pair is remembered between processes (empty string disables)
+BROWSER_CACHE = os.environ.get(
+    "IMAGESIFTER_BROWSER_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "imagesifter", "browser.json")
+)
+
+CHROME_CANDIDATES = ["chromium", "chromium-browser", "google-chrome", "google-chrome-stable", "chrome"]
+DRIVER_CANDIDATES = ["chromedriver"]
+
+# Absolute paths tried after PATH; the Replit image's chromedriver is not on PATH
+KNOWN_DRIVER_PATHS = [
+    "/nix/store/8zj50jw4w0hby47167kqqsaqw4mm5bkd-chromedriver-unwrapped-138.0.7204.100/bin/chromedriver",
+]
+
+_VERSION_RE = re.compile(r"\d+\.\d+\.\d+(?:\.\d+)?")
+
+logger = logging.getLogger("imagesifter")
+
+_lock = threading.Lock()
+_resolved = None
+
+
+def _version(path):
+    """`path --version` as a dotted version string, or None if it does not run"""
+    try:
+        output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=15).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = _VERSION_RE.search(output or "")
+    return match.group(0) if match else None
+
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
+
+def _fingerprint(path):
+    """What has to stay the same for a cached version to still be true"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [os.path.realpath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def _candidates(override, names, known=()):
+    if override:
+        return [override]
+    found = []
+    for name in names:
+        path = shutil.which(name)
+        if path and path not in found:
+            found.append(path)
+    found.extend(path for path in known if os.access(path, os.X_OK) and path not in found)
+    return found
+
+
+def _inventory():
+    """Fingerprints of every browser and driver candidate; cheap, nothing is executed"""
+    paths = _candidates(CHROME_BINARY, CHROME_CANDIDATES) + _candidates(CHROMEDRIVER, DRIVER_CANDIDATES, KNOWN_DRIVER_PATHS)
+    return [_fingerprint(path) for path in paths]
+
+
+def probe():
+    """Look for a working browser/driver pair, ignoring every cache"""
+    binary = browser_version = None
+    for path in _candidates(CHROME_BINARY, CHROME_CANDIDATES):
+        browser_version = _version(path)
+        if browser_version:
+            binary = path
+            break
+    if binary is None:
+        logger.warning("No Chrome/Chromium binary found; leaving it to Selenium Manager")
+
+    driver = driver_version = None
+    for path in _candidates(CHROMEDRIVER, DRIVER_CANDIDATES, KNOWN_DRIVER_PATHS):
+        version = _version(path)
+        if not version:
+            continue
+        if browser_version and _major(version) != _major(browser_version):
+            if CHROMEDRIVER:
+                logger.warning("IMAGESIFTER_CHROMEDRIVER is %s but the browser is %s; using it anyway", version, browser_version)
+            else:
+                logger.warning("Skipping %s: chromedriver %s does not match browser %s", path, version, browser_version)
+                continue
+        driver, driver_version = path, version
+        break
+
+    return {
+        "binary": binary,
+        "browser_version": browser_version,
+        "driver": driver,
+        "driver_version": driver_version,
+        "overrides": [CHROME_BINARY, CHROMEDRIVER],
+        "inventory": _inventory(),
+        "resolved_at": time.time(),
+    }
+
+
+def _still_valid(cached):
+    return (
+        cached.get("binary")
+        and cached.get("overrides") == [CHROME_BINARY, CHROMEDRIVER]
+        and cached.get("inventory") == _inventory()
+    )
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, resolved):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(resolved, f, indent=2)
+        os.replace(temporary, path)
+    except OSError as e:
+        logger.warning("Could not cache the browser location: %s", e)
+
+
+def resolve_browser(refresh=False, cache_path=None):
+    """
+    The browser/driver pair to launch: a dict with binary, browser_version, driver and
+    driver_version, where binary or driver is None when Selenium should find it itself.
+    """
+    global _resolved
+    cache_path = BROWSER_CACHE if cache_path is None else cache_path
+    with _lock:
+        if _resolved is not None and not refresh:
+            return _resolved
+        cached = _read_cache(cache_path) if cache_path and not refresh else None
+        if cached and _still_valid(cached):
+            _resolved = cached
+            return cached
+        resolved = probe()
+        if cache_path:
+            _write_cache(cache_path, resolved)
+        _resolved = resolved
+        return resolved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show (and cache) which browser and chromedriver will be launched.")
+    parser.add_argument("--refresh", action="store_true", help="Probe again instead of trusting the cache")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    resolved = resolve_browser(refresh=args.refresh)
+    logger.info("Browser: %s (%s)", resolved["binary"] or "Selenium Manager", resolved["browser_version"] or "?")
+    logger.info("Driver:  %s (%s)", resolved["driver"] or "Selenium Manager", resolved["driver_version"] or "?")
+    return 0 if resolved["binary"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
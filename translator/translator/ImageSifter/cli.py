@@ -0,0 +1,239 @@
+"""
+Headless batch runner: translate a directory or glob of images without Streamlit.
+
+    python cli.py scans/ "more/*.jpg" --source ja --target en --output-dir out/
+
+Translated PNGs are written to the output directory together with a JSON manifest. With
+--text-only no images are extracted; the recognized and translated text of every image goes to
+a JSON-lines file instead (one object per image).
+
+Mixed-language batches take a --languages file that overrides --source/--target per image:
+
+    # pattern           source  [target]
+    scans/japanese/     ja      en
+    "*_ko.png"          ko
+"""
+import argparse
+import fnmatch
+import glob
+import json
+import logging
+import os
+import shlex
+import sys
+import time
+from archive import JsonLinesExport, StreamingArchive
+from dedupe import DEDUPE_THRESHOLD, saved_work
+from metrics import REGISTRY
+from reporting import LoggingReporter
+from tiling import TILE_SIZE
+from translation import MAX_DIMENSION, POOL_SIZE, SUPPORTED_EXTENSIONS, get_translation_cache, translate_batch
+
+logger = logging.getLogger("imagesifter")
+
+
+def collect_inputs(patterns, recursive=False):
+    """Expand directories and glob patterns into a sorted, de-duplicated list of image files"""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            walker = os.walk(pattern) if recursive else [(pattern, [], os.listdir(pattern))]
+            for dirpath, _, filenames in walker:
+                found.extend(os.path.join(dirpath, name) for name in filenames)
+        else:
+            found.extend(glob.glob(pattern, recursive=recursive))
+
+    images = []
+    seen = set()
+    for path in sorted(found):
+        path = os.path.abspath(path)
+        extension = os.path.splitext(path)[1].lower().lstrip(".")
+        if path in seen or not os.path.isfile(path) or extension not in SUPPORTED_EXTENSIONS:
+            continue
+        seen.add(path)
+        images.append(path)
+    return images
+
+
+def output_paths_for(inputs, output_dir):
+    """Map inputs to <stem>_translated.png in output_dir, numbering clashing names"""
+    used = set()
+    paths = []
+    for path in inputs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name = f"{stem}_translated.png"
+        counter = 2
+        while name in used:
+            name = f"{stem}_{counter}_translated.png"
+            counter += 1
+        used.add(name)
+        paths.append(os.path.join(output_dir, name))
+    return paths
+
+
+def load_language_rules(path):
+    """
+    Read a --languages file: one `<pattern> <source> [<target>]` per line, shell-style quoting,
+    '#' starts a comment. Returns a list of (pattern, source, target-or-None) in file order.
+    """
+    rules = []
+    with open(path) as f:
+        for number, line in enumerate(f, start=1):
+            fields = shlex.split(line, comments=True)
+            if not fields:
+                continue
+            if len(fields) not in (2, 3):
+                raise ValueError(f"{path}:{number}: expected '<pattern> <source> [<target>]'")
+            rules.append((fields[0], fields[1], fields[2] if len(fields) == 3 else None))
+    return rules
+
+
+def languages_for(image_path, rules, source_lang, target_lang):
+    """
+    (source, target) for one image: the first rule whose pattern is a directory above it or a
+    glob matching its path or file name, else the defaults
+    """
+    for pattern, source, target in rules:
+        if os.path.isdir(pattern):
+            matched = image_path.startswith(os.path.join(os.path.abspath(pattern), ""))
+        else:
+            matched = (fnmatch.fnmatch(image_path, os.path.abspath(pattern))
+                       or fnmatch.fnmatch(os.path.basename(image_path), pattern))
+        if matched:
+            return source, target or target_lang
+    return source_lang, target_lang
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Translate images with Google Translate, no UI required.")
+    parser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    parser.add_argument("-s", "--source", default="auto", help="Source language code (default: auto)")
+    parser.add_argument("-t", "--target", default="en", help="Target language code (default: en)")
+    parser.add_argument("-o", "--output-dir", default="translated", help="Where translated images are written")
+    parser.add_argument("-m", "--manifest", help="Manifest path (default: <output-dir>/manifest.json)")
+    parser.add_argument("-z", "--zip", help="Also stream every translated image into this ZIP archive")
+    parser.add_argument("-l", "--languages", help="File of per-image '<pattern> <source> [<target>]' overrides")
+    parser.add_argument("-c", "--concurrency", type=int, default=POOL_SIZE, help="Parallel browsers")
+    parser.add_argument("--max-dimension", type=int, default=MAX_DIMENSION,
+                        help="Downscale uploads so the longest side fits (0 uploads originals untouched)")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE,
+                        help="Split very long or very large images into overlapping tiles of this size (0 disables)")
+    parser.add_argument("--dedupe-threshold", type=int, default=DEDUPE_THRESHOLD,
+                        help="Translate images within this many perceptual-hash bits of each other once (-1 disables)")
+    parser.add_argument("--text-only", action="store_true",
+                        help="Return only the recognized and translated text, no translated images")
+    parser.add_argument("--jsonl", help="Text export path (default with --text-only: <output-dir>/translations.jsonl)")
+    parser.add_argument("--restore-size", action="store_true", help="Scale translations back to the original resolution")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Descend into directories / allow ** in globs")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every step of each translation")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    inputs = collect_inputs(args.inputs, recursive=args.recursive)
+    if not inputs:
+        logger.error("No images matched %s", " ".join(args.inputs))
+        return 2
+
+    try:
+        rules = load_language_rules(args.languages) if args.languages else []
+    except (OSError, ValueError) as e:
+        logger.error("Could not read the language overrides: %s", e)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    outputs = output_paths_for(inputs, args.output_dir)
+    items = [(path, *languages_for(path, rules, args.source, args.target), output) for path, output in zip(inputs, outputs)]
+    pairs = len({(source, target) for _, source, target, _ in items})
+    if pairs > 1:
+        logger.info("Translating %d image(s) in %d language pairs with %d browser(s)", len(items), pairs, args.concurrency)
+    else:
+        logger.info("Translating %d image(s) %s -> %s with %d browser(s)", len(items), items[0][1], items[0][2], args.concurrency)
+
+    archive = StreamingArchive(args.zip) if args.zip and not args.text_only else None
+    if args.text_only and not args.jsonl:
+        args.jsonl = os.path.join(args.output_dir, "translations.jsonl")
+    text_export = JsonLinesExport(args.jsonl) if args.jsonl else None
+    started = time.time()
+    entries = [None] * len(items)
+    for done, outcome in enumerate(
+        translate_batch(
+            items,
+            concurrency=args.concurrency,
+            reporter=LoggingReporter(verbose=args.verbose),
+            max_dimension=args.max_dimension,
+            restore_size=args.restore_size,
+            dedupe_threshold=args.dedupe_threshold,
+            text_only=args.text_only,
+            tile_size=args.tile_size,
+        ),
+        start=1,
+    ):
+        i = outcome["index"]
+        ok = outcome["error"] is None and bool(outcome["translated_path"] or outcome["translated_text"])
+        entries[i] = {
+            "input": inputs[i],
+            "source_lang": items[i][1],
+            "target_lang": items[i][2],
+            "output": outcome["translated_path"] if ok else None,
+            "status": "ok" if ok else "failed",
+            "cached": outcome["cached"],
+            "tiles": outcome["tiles"],
+            "duplicate_of": inputs[outcome["duplicate_of"]] if outcome["duplicate_of"] is not None else None,
+            "translated_text": outcome["translated_text"],
+            "error": str(outcome["error"]) if outcome["error"] is not None else None,
+            "reason": getattr(outcome["error"], "reason", None),
+            "attempts": getattr(outcome["error"], "attempts", None),
+            "fallback_screenshot": outcome["fallback_path"],
+        }
+        if ok and archive:
+            archive.add(outcome["translated_path"], os.path.basename(outputs[i]))
+        if ok and text_export and outcome["translated_text"]:
+            text_export.add(dict(input=inputs[i], source_lang=items[i][1], target_lang=items[i][2],
+                                    **outcome["translated_text"]))
+        logger.info("[%d/%d] %s %s", done, len(items), entries[i]["status"], inputs[i])
+    if archive:
+        archive.close()
+    if text_export:
+        text_export.close()
+
+    elapsed = time.time() - started
+    succeeded = sum(1 for entry in entries if entry["status"] == "ok")
+    cached = sum(1 for entry in entries if entry["cached"])
+    duplicates = sum(1 for entry in entries if entry["duplicate_of"])
+    cache = get_translation_cache()
+    manifest = {
+        "source_lang": args.source,
+        "target_lang": args.target,
+        "languages": args.languages,
+        "started_at": started,
+        "elapsed_seconds": round(elapsed, 3),
+        "total": len(entries),
+        "succeeded": succeeded,
+        "failed": len(entries) - succeeded,
+        "cached": cached,
+        "screenshot_fallbacks": sum(1 for entry in entries if entry["fallback_screenshot"]),
+        "cache": cache.stats() if cache else None,
+        "dedupe": dict(saved_work(duplicates, len(entries) - cached - duplicates, elapsed), threshold=args.dedupe_threshold),
+        "phases": REGISTRY.summary(),
+        "archive": archive.path if archive else None,
+        "text_only": args.text_only,
+        "jsonl": args.jsonl,
+        "items": entries,
+    }
+    manifest_path = args.manifest or os.path.join(args.output_dir, "manifest.json")
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info("%d/%d translated in %.1fs; manifest written to %s", succeeded, len(entries), manifest["elapsed_seconds"], manifest_path)
+    return 0 if succeeded == len(entries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+"""
+Multi-host batches: one coordinator shards a job across translation workers on other machines.
+
+    IMAGESIFTER_CLUSTER_TOKEN=... python coordinator.py scans/ --output-dir out/ --host 0.0.0.0  # on one host
+    IMAGESIFTER_CLUSTER_TOKEN=... python worker.py --coordinator http://coordinator-host:8765      # on every other host
+    python coordinator.py scans/ --output-dir out/ --local-workers 3                             # everything on localhost
+
+The coordinator owns the inputs, outputs, manifest and archive; workers only translate (with
+translate_batch, so caching, dedupe, tiling and retries all apply on each host). The protocol
+is JSON over HTTP:
+
+    POST /register              {worker_id, capacity}          -> {heartbeat_seconds}
+    POST /claim                 {worker_id, limit}             -> {items, options, done}
+    GET  /items/<id>/input                                     -> the image bytes
+    PUT  /items/<id>/output?worker_id=<worker_id>              <- the translated PNG
+    POST /items/<id>/complete   {worker_id, ok, error, ...}
+    POST /heartbeat             {worker_id, running}
+    GET  /status
+
+Every worker drains its own shard of the pending items, then steals half of the largest other
+shard, so fast hosts stay busy until the end. A worker that misses heartbeats for DEAD_SECONDS
+is dropped: its shard and in-flight items go back to the pool (each item is dispatched at most
+MAX_DISPATCHES times), and whatever it reports later is ignored once another worker finished
+the item. Items a live worker no longer lists in its heartbeat (say, its report got lost) are
+re-dispatched the same way. The coordinator listens on loopback unless told otherwise, and
+only binds other addresses when IMAGESIFTER_CLUSTER_TOKEN is set (on every host) so strangers
+are rejected.
+"""
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+logger = logging.getLogger("imagesifter")
+
+# How often workers check in, and how long the coordinator waits before declaring one dead
+HEARTBEAT_SECONDS = float(os.environ.get("IMAGESIFTER_CLUSTER_HEARTBEAT_SECONDS", "5"))
+DEAD_SECONDS = float(os.environ.get("IMAGESIFTER_CLUSTER_DEAD_SECONDS", "30"))
+
+# An item handed out this many times (its workers kept dying) is failed instead of retried
+MAX_DISPATCHES = int(os.environ.get("IMAGESIFTER_CLUSTER_MAX_DISPATCHES", "3"))
+
+CLUSTER_TOKEN = os.environ.get("IMAGESIFTER_CLUSTER_TOKEN", "")
+TOKEN_HEADER = "X-ImageSifter-Token"
+
+# Worker ids end up in file names, so they are kept to a safe alphabet
+WORKER_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+
+def check_worker_id(worker_id):
+    if not isinstance(worker_id, str) or not WORKER_ID_RE.fullmatch(worker_id):
+        raise ValueError(f"Invalid worker id {worker_id!r}")
+    return worker_id
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Coordinator:
+    """
+    Shards `items` ((image_path, source_lang, target_lang, output_path) tuples, as for
+    translate_batch) across the workers that register, and collects what they send back.
+    `options` are passed to translate_batch on every worker; `archive` is an optional
+    StreamingArchive/JsonLinesExport that results are added to as they arrive.
+    """
+
+    def __init__(self, items, options=None, archive=None, dead_seconds=DEAD_SECONDS, max_dispatches=MAX_DISPATCHES):
+        self.items = [
+            {
+                "id": i,
+                "input": image_path,
+                "output": output_path,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "status": "pending",
+                "worker": None,
+                "dispatches": 0,
+                "claimed_at": 0.0,
+                "result": None,
+            }
+            for i, (image_path, source_lang, target_lang, output_path) in enumerate(items)
+        ]
+        self.options = options or {}
+        self.archive = archive
+        self.dead_seconds = dead_seconds
+        self.max_dispatches = max_dispatches
+        self.steals = 0
+        self.redispatched = 0
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = {}
+        # worker id -> item ids it will get next; None holds items nobody owns yet. Items are
+        # lined up by language pair, so shards (contiguous runs) mostly hold a single pair and
+        # each worker's browsers keep their page loaded instead of navigating to another pair
+        pairs = {}
+        for item in self.items:
+            pairs.setdefault((item["source_lang"], item["target_lang"]), []).append(item["id"])
+        self._shards = {None: deque(item_id for ids in pairs.values() for item_id in ids)}
+        if not self.items:
+            self.finished.set()
+
+    def _touch(self, worker_id, capacity=None):
+        worker = self._workers.get(check_worker_id(worker_id))
+        if worker is None:
+            worker = self._workers[worker_id] = {"capacity": capacity or 1, "completed": 0, "failed": 0}
+            self._shards[worker_id] = deque()
+            # A newcomer takes a fair share straight away instead of waiting to steal
+            self._steal(worker_id, share=len(self._workers))
+        worker["heartbeat"] = time.monotonic()
+        if capacity:
+            worker["capacity"] = capacity
+        return worker
+
+    def _steal(self, thief, share=2, minimum=1):
+        """Move 1/share of the largest other shard (taken from its far end) to `thief`"""
+        victims = [owner for owner, shard in self._shards.items() if owner != thief and shard]
+        if not victims:
+            return 0
+        victim = max(victims, key=lambda owner: (owner is None, len(self._shards[owner])))
+        shard = self._shards[victim]
+        count = min(len(shard), max(minimum, len(shard) // share))
+        taken = [shard.pop() for _ in range(count)]
+        self._shards[thief].extend(reversed(taken))
+        if victim is not None:
+            self.steals += 1
+        return count
+
+    def register(self, worker_id, capacity=1):
+        with self._lock:
+            self._touch(worker_id, capacity)
+        logger.info("Worker %s joined (capacity %d)", worker_id, capacity)
+        return {"heartbeat_seconds": HEARTBEAT_SECONDS}
+
+    def _requeue(self, item, shard):
+        if item["dispatches"] >= self.max_dispatches:
+            item.update(status="failed", result={"ok": False, "error": "Lost with its worker too many times",
+                                                 "reason": "worker_lost"})
+        else:
+            item.update(status="pending", worker=None)
+            shard.appendleft(item["id"])
+            self.redispatched += 1
+
+    def heartbeat(self, worker_id, running=None):
+        """`running` lists the item ids the worker still holds; anything else it was given is lost"""
+        with self._lock:
+            self._touch(worker_id)
+            if running is not None:
+                held = set(running)
+                # Claims younger than a heartbeat may not be in the list yet
+                settled = time.monotonic() - 2 * HEARTBEAT_SECONDS
+                for item in self.items:
+                    if (item["status"] == "running" and item["worker"] == worker_id
+                            and item["id"] not in held and item["claimed_at"] < settled):
+                        self._requeue(item, self._shards[None])
+                        logger.warning("Worker %s dropped item %d; re-dispatching it", worker_id, item["id"])
+                self._settle()
+        return {"done": self.finished.is_set()}
+
+    def _settle(self):
+        if all(item["status"] in ("done", "failed") for item in self.items):
+            self.finished.set()
+
+    def claim(self, worker_id, limit=1):
+        with self._lock:
+            self._touch(worker_id)
+            shard = self._shards[worker_id]
+            if not shard:
+                self._steal(worker_id, minimum=limit)
+            claimed = []
+            while shard and len(claimed) < limit:
+                item = self.items[shard.popleft()]
+                if item["status"] != "pending":
+                    continue  # finished by the worker it was taken from after all
+                item.update(status="running", worker=worker_id, claimed_at=time.monotonic())
+                item["dispatches"] += 1
+                claimed.append({
+                    "id": item["id"],
+                    "name": os.path.basename(item["input"]),
+                    "source_lang": item["source_lang"],
+                    "target_lang": item["target_lang"],
+                })
+        return {"items": claimed, "options": self.options, "done": self.finished.is_set()}
+
+    def input_path(self, item_id):
+        return self.items[item_id]["input"]
+
+    def store_output(self, item_id, worker_id, data):
+        """Keep an uploaded result aside until its completion report arrives"""
+        check_worker_id(worker_id)
+        item = self.items[item_id]
+        if item["status"] in ("done", "failed"):
+            return False
+        with open(f"{item['output']}.{worker_id}.part", "wb") as f:
+            f.write(data)
+        return True
+
+    def complete(self, item_id, worker_id, report):
+        """Record a worker's report for one item; the first successful report wins"""
+        item = self.items[item_id]
+        part = f"{item['output']}.{check_worker_id(worker_id)}.part"
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if item["status"] in ("done", "failed") or (not report.get("ok") and item["worker"] != worker_id):
+                # Already settled, or a failure from a worker the item was taken away from
+                accepted = False
+            else:
+                accepted = True
+                if report.get("ok") and os.path.exists(part):
+                    os.replace(part, item["output"])
+                item.update(status="done" if report.get("ok") else "failed", worker=worker_id, result=report)
+                if worker:
+                    worker["completed" if report.get("ok") else "failed"] += 1
+                self._settle()
+        if os.path.exists(part):
+            os.remove(part)
+        if accepted and report.get("ok") and self.archive:
+            if report.get("translated_text"):
+                self.archive.add(dict(input=item["input"], source_lang=item["source_lang"],
+                                      target_lang=item["target_lang"], **report["translated_text"]))
+            elif os.path.exists(item["output"]):
+                self.archive.add(item["output"], os.path.basename(item["output"]))
+        return {"accepted": accepted}
+
+    def reap(self):
+        """Drop workers that stopped checking in and hand their items to the others"""
+        now = time.monotonic()
+        with self._lock:
+            dead = [worker_id for worker_id, worker in self._workers.items() if now - worker["heartbeat"] > self.dead_seconds]
+            for worker_id in dead:
+                del self._workers[worker_id]
+                orphans = self._shards.pop(worker_id)
+                for item in self.items:
+                    if item["status"] == "running" and item["worker"] == worker_id:
+                        self._requeue(item, orphans)
+                self._shards[None].extendleft(reversed(orphans))
+                logger.warning("Worker %s missed its heartbeats; re-dispatching %d item(s)", worker_id, len(orphans))
+            if dead:
+                self._settle()
+        return dead
+
+    def status(self):
+        with self._lock:
+            counts = {status: 0 for status in ("pending", "running", "done", "failed")}
+            for item in self.items:
+                counts[item["status"]] += 1
+            now = time.monotonic()
+            workers = {
+                worker_id: dict(
+                    capacity=worker["capacity"],
+                    completed=worker["completed"],
+                    failed=worker["failed"],
+                    queued=len(self._shards[worker_id]),
+                    last_seen_s=round(now - worker["heartbeat"], 1),
+                )
+                for worker_id, worker in self._workers.items()
+            }
+        return {"counts": counts, "workers": workers, "steals": self.steals, "redispatched": self.redispatched,
+                "done": self.finished.is_set()}
+
+    def entries(self):
+        """Per-item manifest entries, in input order"""
+        by_id = {item["id"]: item["input"] for item in self.items}
+        entries = []
+        for item in self.items:
+            report = item["result"] or {}
+            ok = item["status"] == "done"
+            entries.append({
+                "input": item["input"],
+                "output": item["output"] if ok and os.path.exists(item["output"]) else None,
+                "status": "ok" if ok else "failed",
+                "source_lang": item["source_lang"],
+                "target_lang": item["target_lang"],
+                "worker": item["worker"],
+                "dispatches": item["dispatches"],
+                "cached": report.get("cached", False),
+                "tiles": report.get("tiles", 0),
+                "duplicate_of": by_id.get(report.get("duplicate_of")),
+                "translated_text": report.get("translated_text"),
+                "error": report.get("error") if not ok else None,
+                "reason": report.get("reason"),
+                "attempts": report.get("attempts"),
+            })
+        return entries
+
+
+def serve(coordinator, host="127.0.0.1", port=0, token=CLUSTER_TOKEN):
+    """
+    Run the coordinator's HTTP API (and its reaper) in background threads; returns the server.
+    Anyone who can reach the API can read the inputs and overwrite results, so listening
+    beyond loopback requires a token.
+    """
+    if not token and not is_loopback(host):
+        raise ValueError(f"Refusing to listen on {host} without IMAGESIFTER_CLUSTER_TOKEN set")
+
+    class _Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload=None, body=None, content_type="application/json"):
+            body = body if body is not None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def _route(self, method):
+            if token and self.headers.get(TOKEN_HEADER) != token:
+                self._reply(403, {"error": "bad token"})
+                return
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            try:
+                if method == "GET" and parts == ["status"]:
+                    self._reply(200, coordinator.status())
+                elif method == "GET" and len(parts) == 3 and parts[0] == "items" and parts[2] == "input":
+                    with open(coordinator.input_path(int(parts[1])), "rb") as f:
+                        self._reply(200, body=f.read(), content_type="application/octet-stream")
+                elif method == "PUT" and len(parts) == 3 and parts[0] == "items" and parts[2] == "output":
+                    worker_id = parse_qs(url.query).get("worker_id", [""])[0]
+                    self._reply(200, {"accepted": coordinator.store_output(int(parts[1]), worker_id, self._body())})
+                elif method == "POST" and len(parts) == 3 and parts[0] == "items" and parts[2] == "complete":
+                    report = json.loads(self._body())
+                    self._reply(200, coordinator.complete(int(parts[1]), report.pop("worker_id"), report))
+                elif method == "POST" and parts == ["register"]:
+                    request = json.loads(self._body())
+                    self._reply(200, coordinator.register(request["worker_id"], request.get("capacity", 1)))
+                elif method == "POST" and parts == ["claim"]:
+                    request = json.loads(self._body())
+                    self._reply(200, coordinator.claim(request["worker_id"], request.get("limit", 1)))
+                elif method == "POST" and parts == ["heartbeat"]:
+                    request = json.loads(self._body())
+                    self._reply(200, coordinator.heartbeat(request["worker_id"], request.get("running")))
+                else:
+                    self._reply(404, {"error": "not found"})
+            except (IndexError, KeyError, ValueError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_PUT(self):
+            self._route("PUT")
+
+        def do_POST(self):
+            self._route("POST")
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=httpd.serve_forever, name="coordinator-http", daemon=True).start()
+
+    def _reap():
+        while not coordinator.finished.wait(min(HEARTBEAT_SECONDS, coordinator.dead_seconds / 2)):
+            coordinator.reap()
+
+    threading.Thread(target=_reap, name="coordinator-reaper", daemon=True).start()
+    return httpd
+
+
+class CoordinatorClient:
+    """Worker side of the protocol"""
+
+    def __init__(self, url, token=CLUSTER_TOKEN, timeout=60):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None, data=None):
+        headers = {TOKEN_HEADER: self.token} if self.token else {}
+        if payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = response.read()
+            if response.headers.get("Content-Type") == "application/json":
+                return json.loads(body)
+            return body
+
+    def register(self, worker_id, capacity):
+        return self._request("POST", "/register", {"worker_id": worker_id, "capacity": capacity})
+
+    def heartbeat(self, worker_id, running=None):
+        return self._request("POST", "/heartbeat", {"worker_id": worker_id, "running": running})
+
+    def claim(self, worker_id, limit):
+        return self._request("POST", "/claim", {"worker_id": worker_id, "limit": limit})
+
+    def fetch_input(self, item_id, path):
+        with open(path, "wb") as f:
+            f.write(self._request("GET", f"/items/{item_id}/input"))
+        return path
+
+    def upload_output(self, item_id, worker_id, path):
+        with open(path, "rb") as f:
+            return self._request("PUT", f"/items/{item_id}/output?worker_id={quote(worker_id)}", data=f.read())
+
+    def complete(self, item_id, worker_id, report):
+        return self._request("POST", f"/items/{item_id}/complete", dict(report, worker_id=worker_id))
+
+    def status(self):
+        return self._request("GET", "/status")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Shard a translation batch across workers on several hosts.")
+    parser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    parser.add_argument("-s", "--source", default="auto", help="Source language code (default: auto)")
+    parser.add_argument("-t", "--target", default="en", help="Target language code (default: en)")
+    parser.add_argument("-o", "--output-dir", default="translated", help="Where translated images are written")
+    parser.add_argument("-m", "--manifest", help="Manifest path (default: <output-dir>/manifest.json)")
+    parser.add_argument("-z", "--zip", help="Also stream every translated image into this ZIP archive")
+    parser.add_argument("-l", "--languages", help="File of per-image '<pattern> <source> [<target>]' overrides (see cli.py)")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on; anything but loopback needs IMAGESIFTER_CLUSTER_TOKEN")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (0 picks a free one)")
+    parser.add_argument("--local-workers", type=int, default=0, help="Also start this many workers on this host")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="Browsers per local worker")
+    parser.add_argument("--text-only", action="store_true", help="Collect translated text instead of images")
+    parser.add_argument("--jsonl", help="Text export path (default with --text-only: <output-dir>/translations.jsonl)")
+    parser.add_argument("--restore-size", action="store_true", help="Scale translations back to the original resolution")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Descend into directories / allow ** in globs")
+    return parser
+
+
+def main(argv=None):
+    from archive import JsonLinesExport, StreamingArchive
+    from cli import collect_inputs, languages_for, load_language_rules, output_paths_for
+
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    inputs = collect_inputs(args.inputs, recursive=args.recursive)
+    if not inputs:
+        logger.error("No images matched %s", " ".join(args.inputs))
+        return 2
+    try:
+        rules = load_language_rules(args.languages) if args.languages else []
+    except (OSError, ValueError) as e:
+        logger.error("Could not read the language overrides: %s", e)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+    items = [(path, *languages_for(path, rules, args.source, args.target), output)
+             for path, output in zip(inputs, output_paths_for(inputs, args.output_dir))]
+
+    if args.text_only:
+        archive = JsonLinesExport(args.jsonl or os.path.join(args.output_dir, "translations.jsonl"))
+    else:
+        archive = StreamingArchive(args.zip) if args.zip else None
+    options = {"text_only": args.text_only, "restore_size": args.restore_size}
+    coordinator = Coordinator(items, options=options, archive=archive)
+    try:
+        httpd = serve(coordinator, args.host, args.port)
+    except (OSError, ValueError) as e:
+        logger.error("Could not start the coordinator: %s", e)
+        if archive:
+            archive.close()
+        return 2
+    host, port = httpd.server_address[:2]
+    url = f"http://{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{port}"
+    logger.info("Coordinating %d image(s) at %s", len(items), url)
+
+    local_workers = [
+        subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py"),
+             "--coordinator", url, "--concurrency", str(args.concurrency)],
+        )
+        for _ in range(args.local_workers)
+    ]
+
+    started = time.time()
+    try:
+        while not coordinator.finished.wait(10):
+            status = coordinator.status()
+            logger.info("%d done, %d failed, %d running, %d pending across %d worker(s)",
+                        status["counts"]["done"], status["counts"]["failed"], status["counts"]["running"],
+                        status["counts"]["pending"], len(status["workers"]))
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; writing a partial manifest")
+    finally:
+        # Give workers one more heartbeat to learn the job is over before the server goes away
+        time.sleep(min(HEARTBEAT_SECONDS, 2) if local_workers else 0)
+        httpd.shutdown()
+        httpd.server_close()
+        if archive:
+            archive.close()
+        for process in local_workers:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+
+    entries = coordinator.entries()
+    status = coordinator.status()
+    succeeded = sum(1 for entry in entries if entry["status"] == "ok")
+    manifest = {
+        "source_lang": args.source,
+        "target_lang": args.target,
+        "languages": args.languages,
+        "started_at": started,
+        "elapsed_seconds": round(time.time() - started, 3),
+        "total": len(entries),
+        "succeeded": succeeded,
+        "failed": len(entries) - succeeded,
+        "cached": sum(1 for entry in entries if entry["cached"]),
+        "steals": status["steals"],
+        "redispatched": status["redispatched"],
+        "archive": archive.path if archive else None,
+        "items": entries,
+    }
+    manifest_path = args.manifest or os.path.join(args.output_dir, "manifest.json")
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info("%d/%d translated in %.1fs; manifest written to %s", succeeded, len(entries), manifest["elapsed_seconds"], manifest_path)
+    return 0 if succeeded == len(entries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Near-duplicate detection, so re-screenshots, slight crops and re-saves are translated once.
+
+Each upload gets a 256-bit difference hash (dHash) computed from a small grayscale thumbnail.
+Hashes go into a BK-tree, which finds everything within a Hamming distance without comparing
+against every earlier image. Text pages that differ by a few words can hash alike, so the
+default threshold only merges images whose hashes match exactly (re-saves, re-screenshots and
+crops of a few pixels); raise it knowingly.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+# Side of the dHash grid; the hash has HASH_SIZE * HASH_SIZE bits
+HASH_SIZE = 16
+
+# Largest Hamming distance (out of 256 bits) still treated as the same image; -1 disables
+DEDUPE_THRESHOLD = int(os.environ.get("IMAGESIFTER_DEDUPE_THRESHOLD", "0"))
+
+# Images whose aspect ratios differ by more than this are never merged, whatever their hashes
+MAX_ASPECT_DIFFERENCE = 0.05
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """Difference hash of an image file plus its aspect ratio; (None, None) if it cannot be read"""
+    try:
+        with Image.open(path) as image:
+            if image.format == "JPEG":
+                image.draft("L", (hash_size * 16, hash_size * 16))
+            image.seek(0)
+            frame = ImageOps.exif_transpose(image)
+            aspect = frame.width / frame.height
+            pixels = list(frame.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR).getdata())
+    except Exception:
+        return None, None
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for column in range(hash_size):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value, aspect
+
+
+def hash_batch(paths, workers=None):
+    """dhash() for many files in parallel processes; results come back in input order"""
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [dhash(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers or min(len(paths), os.cpu_count() or 1)) as executor:
+        return list(executor.map(dhash, paths))
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """BK-tree over perceptual hashes; each node is [hash, values, {distance: child}]"""
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, value_hash, value):
+        self.size += 1
+        if self._root is None:
+            self._root = [value_hash, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value_hash, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, [value], {}]
+                return
+            node = child
+
+    def find(self, value_hash, max_distance):
+        """All (distance, value) pairs within `max_distance`, closest first"""
+        found = []
+        pending = [self._root] if self._root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming(value_hash, node[0])
+            if distance <= max_distance:
+                found.extend((distance, value) for value in node[1])
+            # Triangle inequality: only subtrees in this band can hold matches
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    pending.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+def cluster(hashes, threshold=DEDUPE_THRESHOLD, groups=None):
+    """
+    Group near-identical images. `hashes` holds one (hash, aspect) pair per image (as returned
+    by dhash) and `groups` an optional key per image; only images with the same key (e.g. the
+    same language pair) are merged. Returns a list of index lists, representative first.
+    """
+    groups = groups or [None] * len(hashes)
+    indexes = {}
+    clusters = []
+    for i, ((value_hash, aspect), group) in enumerate(zip(hashes, groups)):
+        if value_hash is None or threshold < 0:
+            clusters.append([i])
+            continue
+        index = indexes.setdefault(group, HashIndex())
+        match = None
+        for _, cluster_id in index.find(value_hash, threshold):
+            representative_aspect = hashes[clusters[cluster_id][0]][1]
+            if abs(aspect - representative_aspect) <= MAX_ASPECT_DIFFERENCE * representative_aspect:
+                match = cluster_id
+                break
+        if match is None:
+            clusters.append([i])
+            index.add(value_hash, len(clusters) - 1)
+        else:
+            clusters[match].append(i)
+    return clusters
+
+
+def saved_work(duplicates, browser_runs, elapsed_seconds):
+    """Summary of what deduplication saved in one batch, with a wall-clock estimate"""
+    per_run = elapsed_seconds / browser_runs if browser_runs else 0.0
+    return {
+        "duplicates": duplicates,
+        "browser_runs": browser_runs,
+        "estimated_seconds_saved": round(duplicates * per_run, 1),
+    }
@@ -0,0 +1,275 @@
+"""Pool of warm Chromium drivers shared by every translation job"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+WARM_URL = "https://translate.google.com/?op=images"
+
+# Fragments of the errors chromedriver raises once the browser behind a session is gone
+# (see the "invalid session id" report in attached_assets)
+DEAD_SESSION_MARKERS = [
+    "invalid session id",
+    "session deleted",
+    "not connected to devtools",
+    "disconnected: not connected",
+    "chrome not reachable",
+    "no such window",
+]
+
+
+def is_dead_session_error(error):
+    """Return True if an exception means the browser session cannot be used again"""
+    message = str(error).lower()
+    return any(marker in message for marker in DEAD_SESSION_MARKERS)
+
+
+def quit_driver(driver):
+    """
+    Quit a browser, then release the profile and disk cache slots it held (the file locks in
+    `driver.imagesifter_profile_locks`, see translation.setup_chrome_driver) so the next
+    browser can reuse them instead of waiting for this object to be garbage-collected.
+    """
+    try:
+        driver.quit()
+    except Exception:
+        pass
+    for lock in getattr(driver, "imagesifter_profile_locks", None) or ():
+        try:
+            lock.close()
+        except Exception:
+            pass
+    driver.imagesifter_profile_locks = []
+
+
+def _process_tree_rss(pid):
+    """Resident memory in bytes of a process and all its children (Linux /proc only)"""
+    total = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError, IndexError):
+            continue
+    return total or None
+
+
+class PooledDriver:
+    """A driver owned by the pool together with its usage bookkeeping"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.jobs = 0
+        self.created_at = time.time()
+        self.broken = False
+        # Translate page URL currently loaded and ready for another upload (see translation.py)
+        self.page_url = None
+
+    def rss_bytes(self):
+        try:
+            return _process_tree_rss(self.driver.service.process.pid)
+        except Exception:
+            return None
+
+
+class DriverPool:
+    """
+    Keeps up to `size` browsers alive between jobs instead of cold-starting Chromium per image.
+
+    Drivers are health-checked when they come back, and recycled after `max_jobs` jobs or once
+    the browser process tree grows beyond `max_rss_mb`.
+    """
+
+    def __init__(self, factory, size=2, max_jobs=25, max_rss_mb=1500, warm_url=WARM_URL):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.warm_url = warm_url
+        self._idle = []
+        self._live = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "recycled": 0, "discarded": 0, "page_hits": 0}
+
+    def _count(self, name):
+        with self._cond:
+            self.stats[name] += 1
+
+    def _create(self):
+        pooled = PooledDriver(self.factory())
+        if self.warm_url:
+            try:
+                pooled.driver.get(self.warm_url)
+                # The first job for the warm page's language pair can upload straight away
+                pooled.page_url = self.warm_url
+            except Exception:
+                pass
+        self._count("created")
+        return pooled
+
+    def _healthy(self, pooled):
+        if pooled.broken:
+            return False
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycle(self, pooled):
+        if self.max_jobs and pooled.jobs >= self.max_jobs:
+            return True
+        if self.max_rss_mb:
+            rss = pooled.rss_bytes()
+            if rss and rss > self.max_rss_mb * 1024 * 1024:
+                return True
+        return False
+
+    def _discard(self, pooled):
+        quit_driver(pooled.driver)
+        with self._cond:
+            self._live -= 1
+            self._cond.notify()
+
+    def _pick_idle(self, prefer_url):
+        """Index of the idle driver to hand out: one showing `prefer_url`, else one with no page to lose"""
+        if prefer_url:
+            for index in range(len(self._idle) - 1, -1, -1):
+                if self._idle[index].page_url == prefer_url:
+                    self.stats["page_hits"] += 1
+                    return index
+            for index in range(len(self._idle) - 1, -1, -1):
+                if self._idle[index].page_url is None:
+                    return index
+        return len(self._idle) - 1
+
+    def acquire(self, timeout=None, fresh=False, prefer_url=None):
+        """
+        Lease a driver, starting a new browser only if the pool is not yet full. With `fresh`
+        an idle browser is quit and replaced, e.g. to retry a job that failed on it. With
+        `prefer_url` an idle browser that already has that page loaded is handed out first,
+        so a language pair keeps landing on the browsers pinned to it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stale = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop(self._pick_idle(None if fresh else prefer_url))
+                    if fresh:
+                        # Keep the slot, replace the browser
+                        self.stats["discarded"] += 1
+                        stale, pooled = pooled, None
+                    break
+                if self._live < self.size:
+                    self._live += 1
+                    pooled = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free browser")
+                self._cond.wait(remaining)
+
+        if stale is not None:
+            quit_driver(stale.driver)
+        if pooled is None:
+            try:
+                return self._create()
+            except Exception:
+                with self._cond:
+                    self._live -= 1
+                    self._cond.notify()
+                raise
+
+        if not self._healthy(pooled):
+            self._count("discarded")
+            self._discard(pooled)
+            return self.acquire(timeout=None if deadline is None else max(0, deadline - time.monotonic()),
+                                prefer_url=prefer_url)
+        self._count("reused")
+        return pooled
+
+    def release(self, pooled, error=None):
+        """Return a leased driver; broken or worn-out browsers are quit instead of reused"""
+        pooled.jobs += 1
+        if error is not None and is_dead_session_error(error):
+            pooled.broken = True
+
+        # Both checks talk to the browser, so they run before taking the lock
+        healthy = self._healthy(pooled)
+        worn_out = healthy and self._needs_recycle(pooled)
+        with self._cond:
+            if self._closed or not healthy:
+                self.stats["discarded"] += 1
+            elif worn_out:
+                self.stats["recycled"] += 1
+            elif self._live <= self.size:
+                self._idle.append(pooled)
+                self._cond.notify()
+                return
+            # Broken, worn out, or the pool was shrunk while this driver was out. The slot is
+            # given up before quitting, so concurrent releases see the right count.
+            self._live -= 1
+            self._cond.notify()
+        quit_driver(pooled.driver)
+
+    def resize(self, size):
+        """Change how many browsers may be alive at once; extra drivers are quit as they return"""
+        with self._cond:
+            self.size = max(1, int(size))
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        pooled = self.acquire(timeout)
+        # Callers of lease() drive the browser themselves, so any loaded page is stale afterwards
+        pooled.page_url = None
+        try:
+            yield pooled.driver
+        except Exception as e:
+            self.release(pooled, e)
+            raise
+        else:
+            self.release(pooled)
+
+    def prewarm(self, count=None):
+        """Start browsers in the background so the first jobs find a warm tab waiting"""
+        count = self.size if count is None else min(count, self.size)
+
+        def _warm():
+            while True:
+                with self._cond:
+                    if self._closed or self._live >= count:
+                        return
+                    self._live += 1
+                try:
+                    pooled = self._create()
+                except Exception:
+                    with self._cond:
+                        self._live -= 1
+                        self._cond.notify()
+                    return
+                with self._cond:
+                    self._idle.append(pooled)
+                    self._cond.notify()
+
+        threading.Thread(target=_warm, name="driver-pool-prewarm", daemon=True).start()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
@@ -0,0 +1,337 @@
+"""Locating the translated image on the result page and pulling its pixels (or its text) out"""
+import base64
+import json
+import os
+from readiness import By
+
+# Bytes pulled per CDP IO.read call when streaming an image out of the browser
+BINARY_CHUNK_SIZE = 1024 * 1024
+
+# Same heuristic as find_result_image_fallback, but evaluated entirely in the page so choosing
+# the image and reading its pixels costs one WebDriver round trip instead of hundreds
+SELECT_RESULT_IMAGE_JS = """
+var readPixels = arguments[0];
+var imgs = Array.prototype.slice.call(document.images);
+var half = window.innerWidth / 2;
+
+function info(img) {
+    var rect = img.getBoundingClientRect();
+    return {
+        src: img.getAttribute('src'),
+        x: rect.left + window.scrollX,
+        big: rect.width >= 100 && rect.height >= 100
+    };
+}
+
+// The uploaded original: a large blob/data image in the left half of the page
+var originalSrc = null;
+var infos = imgs.map(info);
+for (var i = 0; i < imgs.length; i++) {
+    var a = infos[i];
+    if (a.big && a.src && (a.src.indexOf('blob:') !== -1 || a.src.indexOf('data:image') !== -1) && a.x < half) {
+        originalSrc = a.src;
+    }
+}
+
+// The translation: right half of the page, or a translate/googleusercontent source
+var chosen = null;
+for (var i = 0; i < imgs.length && !chosen; i++) {
+    var b = infos[i];
+    if (!b.big || b.src === originalSrc) continue;
+    if (b.x > half) chosen = imgs[i];
+    else if (b.src && (b.src.indexOf('googleusercontent.com') !== -1 || b.src.indexOf('translate') !== -1)) chosen = imgs[i];
+}
+
+// Fallback: the last significant image that is not the original
+for (var i = imgs.length - 1; i >= 0 && !chosen; i--) {
+    var c = infos[i];
+    if (c.big && c.src && c.src !== originalSrc) chosen = imgs[i];
+}
+
+if (!chosen) return null;
+
+var result = {element: chosen, src: chosen.getAttribute('src'), data: null, error: null};
+if (!readPixels) return result;
+try {
+    var canvas = document.createElement('canvas');
+    canvas.width = chosen.naturalWidth || chosen.width;
+    canvas.height = chosen.naturalHeight || chosen.height;
+    canvas.getContext('2d').drawImage(chosen, 0, 0);
+    result.data = canvas.toDataURL('image/png');
+} catch (e) {
+    result.error = String(e);
+}
+return result;
+"""
+
+CANVAS_PNG_JS = """
+var img = arguments[0];
+var canvas = document.createElement('canvas');
+var ctx = canvas.getContext('2d');
+canvas.width = img.naturalWidth || img.width;
+canvas.height = img.naturalHeight || img.height;
+ctx.drawImage(img, 0, 0);
+return canvas.toDataURL('image/png');
+"""
+
+
+# Buttons on the result panel, most specific first
+COPY_TEXT_XPATHS = [
+    "//button[contains(., 'Copy text')]",
+    "//button[contains(@aria-label, 'Copy text')]",
+    "//*[@role='button'][contains(@aria-label, 'Copy')]",
+]
+SHOW_ORIGINAL_XPATHS = [
+    "//button[contains(., 'Show original')]",
+    "//*[@role='button'][contains(@aria-label, 'Show original')]",
+]
+SHOW_TRANSLATION_XPATHS = [
+    "//button[contains(., 'Show translation')]",
+    "//*[@role='button'][contains(@aria-label, 'Show translation')]",
+]
+
+# Clicks the first matching button and catches the text it copies on its way to the clipboard,
+# so nothing depends on clipboard permissions in a headless browser
+COPY_TEXT_JS = """
+var xpaths = arguments[0];
+var waitMs = arguments[1];
+var done = arguments[arguments.length - 1];
+var captured = null;
+function remember(value) { if (value && captured === null) captured = String(value); }
+
+var clipboard = navigator.clipboard;
+var originalSetData = DataTransfer.prototype.setData;
+if (clipboard) {
+    clipboard.writeText = function(text) { remember(text); return Promise.resolve(); };
+    clipboard.write = function(items) {
+        (items || []).forEach(function(item) {
+            if (item.types.indexOf('text/plain') !== -1) {
+                item.getType('text/plain').then(function(blob) { return blob.text(); }).then(remember);
+            }
+        });
+        return Promise.resolve();
+    };
+}
+DataTransfer.prototype.setData = function(type, value) {
+    if (String(type).indexOf('text') === 0) remember(value);
+    return originalSetData.apply(this, arguments);
+};
+function restore() {
+    if (clipboard) { delete clipboard.writeText; delete clipboard.write; }
+    DataTransfer.prototype.setData = originalSetData;
+}
+
+var button = null;
+for (var i = 0; i < xpaths.length && !button; i++) {
+    button = document.evaluate(xpaths[i], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+if (!button) { restore(); done(null); return; }
+button.click();
+var started = Date.now();
+(function poll() {
+    if (captured !== null || Date.now() - started > waitMs) { restore(); done(captured); return; }
+    setTimeout(poll, 25);
+})();
+"""
+
+# "Detected language: Japanese", "JAPANESE - DETECTED", ... -> the language part
+DETECTED_LANGUAGE_JS = """
+var node = document.evaluate("//*[not(self::script or self::style)][contains(translate(text(), 'DETECTED', 'detected'), 'detected')]",
+    document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!node) return null;
+var label = node.textContent.replace(/detected( language)?/i, '').replace(/^[\\s:\\-\u2013\u2014]+|[\\s:\\-\u2013\u2014]+$/g, '');
+return label || null;
+"""
+
+
+class ScriptUnavailable(Exception):
+    """The in-page selection script could not run; use the Python heuristic instead"""
+
+
+def select_result_image(driver, read_pixels=True):
+    """
+    Pick the translated image (and, with `read_pixels`, its canvas PNG) in a single
+    execute_script call.
+
+    Returns a dict with element, src, data (PNG data URL or None) and error, or None when the
+    page has no candidate image. Raises ScriptUnavailable if the script itself failed.
+    """
+    try:
+        return driver.execute_script(SELECT_RESULT_IMAGE_JS, read_pixels)
+    except Exception as e:
+        raise ScriptUnavailable(str(e))
+
+
+def find_result_image_fallback(driver):
+    """Element-by-element version of the selection heuristic; slow but independent of JS"""
+    all_imgs = driver.find_elements(By.TAG_NAME, "img")
+    window_width = driver.get_window_size()['width']
+
+    translated_img = None
+    original_img_src = None
+
+    # First, identify the original image to avoid selecting it
+    for img in all_imgs:
+        try:
+            src = img.get_attribute('src')
+            # Skip if it's an icon or very small image
+            if img.size['width'] < 100 or img.size['height'] < 100:
+                continue
+            # This might be the original uploaded image
+            if src and ('blob:' in src or 'data:image' in src):
+                # Check if this is in the input area (left side)
+                if img.location['x'] < window_width / 2:
+                    original_img_src = src
+        except:
+            continue
+
+    # Now find the translated image (should be on the right side or different from original)
+    for img in all_imgs:
+        try:
+            src = img.get_attribute('src')
+
+            # Skip small images
+            if img.size['width'] < 100 or img.size['height'] < 100:
+                continue
+
+            # Skip if it's the same as original
+            if src == original_img_src:
+                continue
+
+            # Prefer images on the right side of the screen (translation result area)
+            if img.location['x'] > window_width / 2:
+                translated_img = img
+                break
+
+            # Or images with translation-related attributes
+            if src and ('googleusercontent.com' in src or 'translate' in src):
+                translated_img = img
+                break
+        except:
+            continue
+
+    # Fallback: get the last significant image that's not the original
+    if not translated_img:
+        for img in reversed(all_imgs):
+            try:
+                src = img.get_attribute('src')
+                if (img.size['width'] > 100 and img.size['height'] > 100 and
+                    src != original_img_src and src):
+                    translated_img = img
+                    break
+            except:
+                continue
+
+    return translated_img
+
+
+def supports_binary_transfer(driver):
+    """Chromium drivers expose CDP, which lets us stream blobs out without a data URL"""
+    return hasattr(driver, "execute_cdp_cmd")
+
+
+def stream_image_to_file(driver, src, output_path, chunk_size=BINARY_CHUNK_SIZE):
+    """
+    Copy the bytes behind an image URL (blob:, data: or https:) straight into `output_path`.
+
+    The page fetches the URL into a Blob, and CDP IO.read hands it over in fixed-size chunks
+    that are decoded and written one at a time, so there is never a full-size base64 string
+    or re-encoded PNG in either process. Non-PNG payloads are converted so the output is
+    always a PNG. Returns the number of bytes written.
+    """
+    expression = (
+        f"fetch({json.dumps(src)}).then(function(r) {{"
+        f" if (!r.ok) throw new Error('HTTP ' + r.status); return r.blob(); }})"
+    )
+    evaluated = driver.execute_cdp_cmd("Runtime.evaluate", {
+        "expression": expression,
+        "awaitPromise": True,
+        "returnByValue": False,
+    })
+    if evaluated.get("exceptionDetails"):
+        raise Exception(evaluated["exceptionDetails"].get("text", "Blob fetch failed"))
+    object_id = evaluated.get("result", {}).get("objectId")
+    if not object_id:
+        raise Exception("Blob fetch returned no object")
+
+    handle = None
+    written = 0
+    try:
+        uuid = driver.execute_cdp_cmd("IO.resolveBlob", {"objectId": object_id})["uuid"]
+        handle = f"blob:{uuid}"
+        with open(output_path, "wb") as f:
+            while True:
+                chunk = driver.execute_cdp_cmd("IO.read", {"handle": handle, "size": chunk_size})
+                data = chunk.get("data", "")
+                if data:
+                    payload = base64.b64decode(data) if chunk.get("base64Encoded") else data.encode("utf-8")
+                    f.write(payload)
+                    written += len(payload)
+                if chunk.get("eof"):
+                    break
+    finally:
+        if handle:
+            try:
+                driver.execute_cdp_cmd("IO.close", {"handle": handle})
+            except Exception:
+                pass
+        try:
+            driver.execute_cdp_cmd("Runtime.releaseObject", {"objectId": object_id})
+        except Exception:
+            pass
+
+    if not written:
+        raise Exception("Blob was empty")
+    _ensure_png(output_path)
+    return written
+
+
+def _ensure_png(path):
+    with open(path, "rb") as f:
+        if f.read(8) == b"\x89PNG\r\n\x1a\n":
+            return
+    from PIL import Image
+    converted = f"{path}.convert.png"
+    with Image.open(path) as image:
+        image.save(converted, format="PNG")
+    os.replace(converted, path)
+
+
+def _copy_text(driver, xpaths=COPY_TEXT_XPATHS, wait_ms=3000):
+    try:
+        return driver.execute_async_script(COPY_TEXT_JS, xpaths, wait_ms)
+    except Exception:
+        return None
+
+
+def _click_first(driver, xpaths):
+    for xpath in xpaths:
+        buttons = driver.find_elements(By.XPATH, xpath)
+        if buttons:
+            driver.execute_script("arguments[0].click();", buttons[0])
+            return True
+    return False
+
+
+def read_result_text(driver):
+    """
+    Read the recognized and translated text from the result panel instead of its pixels.
+
+    Returns a dict with translated_text, source_text and detected_language; anything the page
+    does not offer is None. The source text needs the "Show original" toggle, which is flipped
+    back afterwards so the page is left as it was.
+    """
+    translated = _copy_text(driver)
+    source = None
+    if translated and _click_first(driver, SHOW_ORIGINAL_XPATHS):
+        source = _copy_text(driver)
+        _click_first(driver, SHOW_TRANSLATION_XPATHS)
+    try:
+        detected = driver.execute_script(DETECTED_LANGUAGE_JS)
+    except Exception:
+        detected = None
+    return {
+        "detected_language": detected,
+        "source_text": source,
+        "translated_text": translated,
+    }
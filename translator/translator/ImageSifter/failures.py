@@ -0,0 +1,72 @@
+"""Why a translation failed, and whether trying again can help"""
+from driver_pool import is_dead_session_error
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# Page text Google shows instead of the app when it is rate limiting this client
+THROTTLE_MARKERS = [
+    "unusual traffic",
+    "/sorry/",
+    "captcha",
+    "too many requests",
+]
+
+# reason -> kind; anything unknown is treated as transient
+REASONS = {
+    "no_text": PERMANENT,            # Google found nothing to translate in the image
+    "unsupported": PERMANENT,        # Google rejected the image format
+    "unreadable": PERMANENT,         # the input file itself is broken
+    "throttled": TRANSIENT,          # rate limited; also trips the circuit breaker
+    "dead_session": TRANSIENT,       # the browser went away (invalid session id, ...)
+    "browser_start": TRANSIENT,      # a new browser could not be launched
+    "upload_missing": TRANSIENT,     # the page rendered without an upload input
+    "timeout": TRANSIENT,            # no translation UI within TRANSLATION_TIMEOUT
+    "screenshot_fallback": TRANSIENT,  # only a screenshot could be saved, not the real image
+    "text_missing": TRANSIENT,       # text-only mode: the result panel had no text to copy
+    "error": TRANSIENT,
+}
+
+
+# Failures that say something about Google's side, as opposed to our browser or the input;
+# only these count towards the circuit breaker
+REMOTE_REASONS = {"throttled", "timeout", "upload_missing", "screenshot_fallback"}
+
+
+class TranslationFailure(Exception):
+    """
+    A translation that did not produce a usable image. `reason` is a REASONS key; `fallback_path`
+    holds a screenshot taken instead, if any, which callers must not treat as a translation.
+    """
+
+    def __init__(self, reason, message=None, fallback_path=None):
+        super().__init__(message or reason.replace("_", " "))
+        self.reason = reason
+        self.kind = REASONS.get(reason, TRANSIENT)
+        self.fallback_path = fallback_path
+
+    @property
+    def transient(self):
+        return self.kind == TRANSIENT
+
+    @property
+    def remote(self):
+        return self.reason in REMOTE_REASONS
+
+
+def is_throttle_text(text):
+    text = (text or "").lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def classify(error):
+    """Return a TranslationFailure for any exception raised while translating"""
+    if isinstance(error, TranslationFailure):
+        return error
+    if is_dead_session_error(error):
+        return TranslationFailure("dead_session", str(error))
+    if is_throttle_text(str(error)):
+        return TranslationFailure("throttled", str(error))
+    if isinstance(error, (FileNotFoundError, IsADirectoryError)):
+        return TranslationFailure("unreadable", str(error))
+    return TranslationFailure("error", str(error))
@@ -0,0 +1,190 @@
+"""
+Local stand-in for the Google Translate Images page, for benchmarks and offline runs.
+
+It reproduces only what the automation relies on: the Images tab, the file input matched by
+UPLOAD_SELECTORS, the original on the left and a rendered result image on the right half of
+the window, the Download/Copy/Detected-language indicators and the Clear button. "Copy text"
+writes the translated (or, after "Show original", the recognized) text to the clipboard.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Google Translate</title>
+<style>
+body { margin: 0; font-family: sans-serif; }
+.tabs div { display: inline-block; padding: 12px 20px; }
+#original { position: absolute; left: 2%; top: 120px; width: 40%; }
+#result { position: absolute; left: 55%; top: 120px; width: 40%; }
+#original img, #result img { max-width: 100%; min-width: 200px; min-height: 150px; }
+.hidden { display: none; }
+</style>
+</head>
+<body>
+<div class="tabs"><div>Text</div><div>Images</div><div>Documents</div></div>
+<div id="upload">
+  <button id="browse" type="button">Browse your files</button>
+  <input type="file" accept="image/*" id="file">
+</div>
+<div id="original"></div>
+<div id="result" class="hidden">
+  <div id="detected">Detected language: Japanese</div>
+  <button type="button" aria-label="Clear image">Clear</button>
+  <button type="button">Download translation</button>
+  <button type="button" id="copy">Copy text</button>
+  <button type="button" id="toggle">Show original</button>
+  <div id="result-image"></div>
+</div>
+<div id="notext" class="hidden">No text found in image</div>
+<script>
+var config = __CONFIG__;
+var input = document.getElementById('file');
+var upload = document.getElementById('upload');
+var original = document.getElementById('original');
+var result = document.getElementById('result');
+var notext = document.getElementById('notext');
+var urls = [];
+var uploads = 0;
+var lines = [];
+var showingOriginal = false;
+
+function reset() {
+    urls.forEach(function(url) { URL.revokeObjectURL(url); });
+    urls = [];
+    original.innerHTML = '';
+    document.getElementById('result-image').innerHTML = '';
+    result.classList.add('hidden');
+    notext.classList.add('hidden');
+    upload.classList.remove('hidden');
+    input.value = '';
+    lines = [];
+    showingOriginal = false;
+    document.getElementById('toggle').textContent = 'Show original';
+}
+
+function render(width, height) {
+    var canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    var ctx = canvas.getContext('2d');
+    ctx.fillStyle = '#ffffff';
+    ctx.fillRect(0, 0, width, height);
+    ctx.fillStyle = '#202124';
+    var line = Math.max(12, Math.round(height / 24));
+    ctx.font = line + 'px sans-serif';
+    lines = [];
+    for (var y = line * 2; y < height - line; y += line * 2) {
+        lines.push(y / (line * 2));
+        ctx.fillText('Translated line ' + (y / (line * 2)) + ' of upload ' + uploads, line, y);
+    }
+    canvas.toBlob(function(blob) {
+        var url = URL.createObjectURL(blob);
+        urls.push(url);
+        var img = document.createElement('img');
+        img.src = url;
+        document.getElementById('result-image').appendChild(img);
+        result.classList.remove('hidden');
+    }, 'image/png');
+}
+
+input.addEventListener('change', function() {
+    if (!input.files.length) return;
+    uploads += 1;
+    var url = URL.createObjectURL(input.files[0]);
+    urls.push(url);
+    var img = document.createElement('img');
+    img.onload = function() {
+        upload.classList.add('hidden');
+        var delay = config.delay_ms + Math.random() * config.jitter_ms;
+        setTimeout(function() {
+            if (Math.random() < config.no_text_rate) {
+                notext.classList.remove('hidden');
+                return;
+            }
+            render(config.width || img.naturalWidth, config.height || img.naturalHeight);
+        }, delay);
+    };
+    img.src = url;
+    original.appendChild(img);
+});
+
+document.querySelector('[aria-label="Clear image"]').addEventListener('click', reset);
+document.getElementById('toggle').addEventListener('click', function() {
+    showingOriginal = !showingOriginal;
+    this.textContent = showingOriginal ? 'Show translation' : 'Show original';
+});
+document.getElementById('copy').addEventListener('click', function() {
+    var text = lines.map(function(n) {
+        return (showingOriginal ? '\u539f\u6587 ' : 'Translated line ') + n + ' of upload ' + uploads;
+    }).join('\\n');
+    navigator.clipboard.writeText(text);
+});
+</script>
+</body>
+</html>
+"""
+
+
+class FakeTranslateServer:
+    """
+    Serves the stand-in page at `<url>?sl=..&tl=..&op=images` from a background thread.
+
+    `delay` (+ up to `jitter`) seconds pass between upload and result; `result_size` is the
+    (width, height) of the rendered translation, or None to match the upload.
+    """
+
+    def __init__(self, delay=1.5, jitter=0.0, result_size=None, no_text_rate=0.0, host="127.0.0.1", port=0):
+        width, height = result_size or (0, 0)
+        self.config = {
+            "delay_ms": int(delay * 1000),
+            "jitter_ms": int(jitter * 1000),
+            "width": width,
+            "height": height,
+            "no_text_rate": no_text_rate,
+        }
+        self.requests = 0
+        page = _PAGE.replace("__CONFIG__", json.dumps(self.config)).encode("utf-8")
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if urlparse(self.path).path != "/translate/":
+                    self.send_error(404)
+                    return
+                server.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/translate/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-translate", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,325 @@
+"""
+Local SQLite-backed job queue, so batches outlive the Streamlit session that submitted them.
+
+The UI submits a job (inputs are copied into the queue directory), long-lived worker
+processes (worker.py) claim and translate its items, and any session can poll progress and
+collect the outputs later by job id.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from metrics import Histogram
+
+QUEUE_DIR = os.environ.get("IMAGESIFTER_QUEUE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "imagesifter", "jobs"))
+
+# Items whose worker has not checked in for this long are handed to another worker
+STALE_SECONDS = int(os.environ.get("IMAGESIFTER_QUEUE_STALE_SECONDS", "120"))
+
+# An item claimed this many times without finishing (its workers keep dying) is failed instead
+MAX_CLAIMS = int(os.environ.get("IMAGESIFTER_QUEUE_MAX_CLAIMS", "3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    restore_size INTEGER NOT NULL DEFAULT 0,
+    dedupe_threshold INTEGER,
+    text_only INTEGER NOT NULL DEFAULT 0,
+    archive_path TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    claims INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    claimed_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS items_status ON items(status, id);
+CREATE INDEX IF NOT EXISTS items_job ON items(job_id, idx);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    pid INTEGER,
+    heartbeat REAL NOT NULL
+);
+"""
+
+# (table, column, definition) added after the first release, for migrating older queues
+_ADDED_COLUMNS = [
+    ("jobs", "dedupe_threshold", "INTEGER"),
+    ("jobs", "text_only", "INTEGER NOT NULL DEFAULT 0"),
+    ("items", "result", "TEXT"),
+    ("items", "claims", "INTEGER NOT NULL DEFAULT 0"),
+    ("jobs", "phases", "TEXT"),
+]
+
+
+def _load_phases(text):
+    return {phase: Histogram.from_dict(data) for phase, data in json.loads(text).items()} if text else {}
+
+
+def _pid_alive(pid):
+    """Whether a process exists; the queue is local, so worker pids belong to this host"""
+    if not pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    def __init__(self, root=QUEUE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.db_path = os.path.join(root, "queue.sqlite3")
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            # Queues created before a column existed get it added in place
+            for table, column, definition in _ADDED_COLUMNS:
+                columns = {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def submit(self, files, source_lang="auto", target_lang="en", restore_size=False, dedupe_threshold=None,
+               text_only=False):
+        """
+        Queue a job. `files` is a list of (name, data) or (name, data, source_lang, target_lang)
+        tuples; inputs are written into the queue directory. `dedupe_threshold` of None leaves
+        the worker's default; `text_only` jobs store each item's text as `result` instead of
+        an output image. Returns the job id.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        inputs_dir = os.path.join(self.job_dir(job_id), "inputs")
+        outputs_dir = os.path.join(self.job_dir(job_id), "outputs")
+        os.makedirs(inputs_dir)
+        os.makedirs(outputs_dir)
+
+        rows = []
+        for idx, entry in enumerate(files):
+            name, data = entry[0], entry[1]
+            item_source = entry[2] if len(entry) > 2 and entry[2] else source_lang
+            item_target = entry[3] if len(entry) > 3 and entry[3] else target_lang
+            safe_name = f"{idx:04d}_{os.path.basename(name)}"
+            input_path = os.path.join(inputs_dir, safe_name)
+            with open(input_path, "wb") as f:
+                f.write(data)
+            output_path = os.path.join(outputs_dir, f"{os.path.splitext(safe_name)[0]}_translated.png")
+            rows.append((job_id, idx, name, input_path, output_path, item_source, item_target, "pending"))
+
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (id, created_at, status, total, restore_size, dedupe_threshold, text_only)"
+                " VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+                (job_id, time.time(), len(rows), int(restore_size), dedupe_threshold, int(text_only)),
+            )
+            db.executemany(
+                "INSERT INTO items (job_id, idx, name, input_path, output_path, source_lang, target_lang, status)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return job_id
+
+    def claim(self, worker_id, limit=1):
+        """Atomically take up to `limit` pending items, oldest job first"""
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT items.*, jobs.restore_size, jobs.dedupe_threshold, jobs.text_only FROM items JOIN jobs ON jobs.id = items.job_id"
+                " WHERE items.status = 'pending' ORDER BY items.id LIMIT ?",
+                (limit,),
+            ).fetchall()
+            if not rows:
+                return []
+            now = time.time()
+            ids = [row["id"] for row in rows]
+            db.execute(
+                f"UPDATE items SET status = 'running', worker_id = ?, claimed_at = ?, claims = claims + 1"
+                f" WHERE id IN ({','.join('?' * len(ids))})",
+                [worker_id, now] + ids,
+            )
+            db.execute(
+                f"UPDATE jobs SET status = 'running' WHERE status = 'pending'"
+                f" AND id IN (SELECT job_id FROM items WHERE id IN ({','.join('?' * len(ids))}))",
+                ids,
+            )
+        return [dict(row) for row in rows]
+
+    def complete(self, item_id, ok, error=None, cached=False, result=None):
+        """
+        Record an item's outcome (`result` is any JSON-serializable extra, e.g. extracted text);
+        returns the job id if that was the job's last open item
+        """
+        with self._transaction() as db:
+            row = db.execute("SELECT job_id FROM items WHERE id = ?", (item_id,)).fetchone()
+            db.execute(
+                "UPDATE items SET status = ?, error = ?, cached = ?, result = ?, finished_at = ? WHERE id = ?",
+                ("done" if ok else "failed", error, int(cached),
+                 json.dumps(result, ensure_ascii=False) if result is not None else None, time.time(), item_id),
+            )
+            if not self._finish_job_if_done(db, row["job_id"]):
+                return None
+        return row["job_id"]
+
+    def _finish_job_if_done(self, db, job_id):
+        """Mark a job finished once none of its items is open; returns whether it is"""
+        remaining = db.execute(
+            "SELECT COUNT(*) FROM items WHERE job_id = ? AND status IN ('pending', 'running')", (job_id,)
+        ).fetchone()[0]
+        if remaining:
+            return False
+        db.execute(
+            "UPDATE jobs SET status = 'finished', finished_at = ? WHERE id = ? AND status != 'finished'",
+            (time.time(), job_id),
+        )
+        return True
+
+    def set_archive(self, job_id, archive_path):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET archive_path = ? WHERE id = ?", (archive_path, job_id))
+
+    def add_phases(self, job_id, histograms):
+        """Fold a batch's {phase: Histogram} timings into the job's running totals"""
+        with self._transaction() as db:
+            row = db.execute("SELECT phases FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            phases = _load_phases(row["phases"])
+            for phase, histogram in histograms.items():
+                phases[phase] = phases[phase].plus(histogram) if phase in phases else histogram
+            db.execute(
+                "UPDATE jobs SET phases = ? WHERE id = ?",
+                (json.dumps({phase: histogram.as_dict() for phase, histogram in phases.items()}), job_id),
+            )
+
+    def heartbeat(self, worker_id, pid=None):
+        """Mark a worker (and the items it holds) as alive; `pid` defaults to this process"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO workers (id, pid, heartbeat) VALUES (?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (worker_id, pid or os.getpid(), now),
+            )
+            db.execute(
+                "UPDATE items SET claimed_at = ? WHERE worker_id = ? AND status = 'running'", (now, worker_id)
+            )
+
+    def unregister(self, worker_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def live_workers(self, max_age=STALE_SECONDS):
+        """Workers that checked in within `max_age` and whose process still exists"""
+        with self._connect() as db:
+            rows = db.execute("SELECT pid FROM workers WHERE heartbeat > ?", (time.time() - max_age,)).fetchall()
+        return sum(1 for row in rows if _pid_alive(row["pid"]))
+
+    def requeue_stale(self, max_age=STALE_SECONDS, max_claims=MAX_CLAIMS):
+        """
+        Hand items held by workers that stopped checking in back to the queue. Items already
+        claimed `max_claims` times are failed instead, so one that keeps killing its worker
+        cannot do so forever. Returns (requeued, failed, ids of jobs this finished).
+        """
+        with self._transaction() as db:
+            stale = db.execute(
+                "SELECT id, job_id, claims FROM items WHERE status = 'running' AND claimed_at < ?",
+                (time.time() - max_age,),
+            ).fetchall()
+            exhausted = [row for row in stale if row["claims"] >= max_claims]
+            requeued = [row["id"] for row in stale if row["claims"] < max_claims]
+            if requeued:
+                db.execute(
+                    f"UPDATE items SET status = 'pending', worker_id = NULL, claimed_at = NULL"
+                    f" WHERE id IN ({','.join('?' * len(requeued))})",
+                    requeued,
+                )
+            for row in exhausted:
+                db.execute(
+                    "UPDATE items SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (f"Gave up after {row['claims']} workers stopped while translating it", time.time(), row["id"]),
+                )
+            finished = [job_id for job_id in sorted({row["job_id"] for row in exhausted})
+                        if self._finish_job_if_done(db, job_id)]
+        return len(requeued), len(exhausted), finished
+
+    def job(self, job_id):
+        """Job row plus per-status item counts, or None for an unknown id"""
+        with self._connect() as db:
+            job = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(db.execute(
+                "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+        job = dict(job)
+        job["phases"] = _load_phases(job["phases"])
+        job["counts"] = {status: counts.get(status, 0) for status in ("pending", "running", "done", "failed")}
+        return job
+
+    def items(self, job_id):
+        with self._connect() as db:
+            items = [dict(row) for row in db.execute(
+                "SELECT * FROM items WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()]
+        for item in items:
+            item["result"] = json.loads(item["result"]) if item["result"] else None
+        return items
+
+    def prune(self, max_age_days=7):
+        """Delete finished jobs (rows and files) older than `max_age_days`"""
+        cutoff = time.time() - max_age_days * 86400
+        with self._transaction() as db:
+            old = [row[0] for row in db.execute(
+                "SELECT id FROM jobs WHERE status = 'finished' AND finished_at < ?", (cutoff,)
+            ).fetchall()]
+            for job_id in old:
+                db.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+                db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            db.execute("DELETE FROM workers WHERE heartbeat < ?", (cutoff,))
+        for job_id in old:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return len(old)
@@ -0,0 +1,214 @@
+"""
+Cheap in-process latency metrics for every translation phase.
+
+Spans feed fixed-bucket histograms (a lock and a few integer adds per observation), which can
+be exported as Prometheus text, appended to a JSON-lines log, or summarized for the UI.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; browser phases range from milliseconds to tens of seconds
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Optional JSON-lines file receiving one record per translated image
+METRICS_LOG = os.environ.get("IMAGESIFTER_METRICS_LOG", "")
+
+# Optional Prometheus textfile written after every batch
+METRICS_PROM = os.environ.get("IMAGESIFTER_METRICS_PROM", "")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def copy(self):
+        clone = Histogram(self.buckets)
+        clone.counts = list(self.counts)
+        clone.sum = self.sum
+        clone.count = self.count
+        return clone
+
+    def plus(self, other):
+        total = self.copy()
+        total.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        total.sum += other.sum
+        total.count += other.count
+        return total
+
+    def as_dict(self):
+        return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data, buckets=BUCKETS):
+        histogram = cls(buckets)
+        histogram.counts = list(data["counts"])
+        histogram.sum = data["sum"]
+        histogram.count = data["count"]
+        return histogram
+
+    def minus(self, earlier):
+        """Observations made since `earlier` (a copy of this histogram)"""
+        delta = self.copy()
+        if earlier is not None:
+            delta.counts = [a - b for a, b in zip(self.counts, earlier.counts)]
+            delta.sum -= earlier.sum
+            delta.count -= earlier.count
+        return delta
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that contains it"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1] * 2
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {phase: histogram.copy() for phase, histogram in self._histograms.items()}
+
+    def delta(self, since=None):
+        """Histograms of the observations made since a snapshot, for phases that had any"""
+        histograms = {}
+        for phase, histogram in self.snapshot().items():
+            delta = histogram.minus((since or {}).get(phase))
+            if delta.count:
+                histograms[phase] = delta
+        return histograms
+
+    def summary(self, since=None):
+        """Rows of phase/count/mean/p50/p95/total for observations made since a snapshot"""
+        return summarize(self.delta(since))
+
+    def prometheus_text(self, name="imagesifter_phase_seconds"):
+        lines = [
+            f"# HELP {name} Time spent in each image translation phase",
+            f"# TYPE {name} histogram",
+        ]
+        for phase, histogram in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{phase="{phase}"}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{phase="{phase}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Atomically write the Prometheus textfile (node_exporter textfile collector format)"""
+        path = path or METRICS_PROM
+        if not path:
+            return None
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+span = REGISTRY.span
+
+def summarize(histograms):
+    """Table rows for a {phase: Histogram} mapping, e.g. one stored with a background job"""
+    rows = []
+    for phase, histogram in sorted(histograms.items()):
+        if not histogram.count:
+            continue
+        rows.append({
+            "phase": phase,
+            "count": histogram.count,
+            "mean_s": round(histogram.sum / histogram.count, 3),
+            "p50_s": round(histogram.quantile(0.5), 3),
+            "p95_s": round(histogram.quantile(0.95), 3),
+            "total_s": round(histogram.sum, 3),
+        })
+    return rows
+
+
+_log_lock = threading.Lock()
+
+
+def log_record(record, path=None):
+    """Append one JSON line to the metrics log, if one is configured"""
+    path = path or METRICS_LOG
+    if not path:
+        return
+    line = json.dumps(record, separators=(",", ":"))
+    with _log_lock:
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+class PhaseTimer:
+    """Records how long each phase of one translation took, and feeds the shared histograms"""
+
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.phases = []
+
+    def record(self, name, seconds):
+        self.phases.append((name, seconds))
+        if self.registry is not None:
+            self.registry.observe(name, seconds)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def as_dict(self):
+        timings = {}
+        for name, seconds in self.phases:
+            timings[name] = round(timings.get(name, 0.0) + seconds, 4)
+        return timings
+
+    def summary(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.phases]
+        return " · ".join(parts) + f" (total {self.total:.2f}s)"
@@ -0,0 +1,104 @@
+"""Normalize uploads before they reach the browser: orientation, size and format"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+# EXIF orientations that rotate the image by 90 degrees (width and height swap)
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+_EXIF_ORIENTATION = 0x0112
+
+# Quality of photos re-encoded for upload
+JPEG_QUALITY = 90
+
+
+def _displayed_size(image):
+    width, height = image.size
+    try:
+        if image.getexif().get(_EXIF_ORIENTATION) in _TRANSPOSED_ORIENTATIONS:
+            return height, width
+    except Exception:
+        pass
+    return width, height
+
+
+def original_size(path):
+    """Size of an image as it is displayed (after EXIF rotation), read from the header only"""
+    with Image.open(path) as image:
+        return _displayed_size(image)
+
+
+def normalize_image(path, max_dimension=2560, jpeg_quality=JPEG_QUALITY, output_stem=None):
+    """
+    Prepare one image for upload.
+
+    Applies the EXIF orientation, keeps only the first frame of animations, downscales so the
+    longest side is at most `max_dimension` (0 disables) and re-encodes as JPEG for photos or
+    PNG for everything else. Files that need none of this are passed through untouched; the
+    others are written to `<output_stem>.normalized.jpg/.png` (default stem: the input path).
+
+    Returns a dict with path, original_size, size, scale (normalized / original) and error.
+    """
+    record = {"path": path, "original_size": None, "size": None, "scale": 1.0, "error": None}
+    output_stem = output_stem or path
+    try:
+        with Image.open(path) as image:
+            source_format = image.format
+            width, height = _displayed_size(image)
+            record["original_size"] = record["size"] = (width, height)
+
+            orientation = image.getexif().get(_EXIF_ORIENTATION, 1)
+            animated = getattr(image, "n_frames", 1) > 1
+            longest = max(width, height)
+            scale = (max_dimension / longest) if max_dimension and longest > max_dimension else 1.0
+            if source_format in ("PNG", "JPEG") and orientation == 1 and not animated and scale == 1.0:
+                return record
+
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+            if source_format == "JPEG" and scale < 1.0:
+                # Let the JPEG decoder skip pixels we are about to throw away
+                image.draft("RGB", target if orientation not in _TRANSPOSED_ORIENTATIONS else target[::-1])
+
+            image.seek(0)
+            frame = ImageOps.exif_transpose(image)
+            if frame.size != target:
+                frame = frame.resize(target, Image.LANCZOS)
+
+            has_alpha = frame.mode in ("RGBA", "LA") or (frame.mode == "P" and "transparency" in frame.info)
+            if source_format == "JPEG" and not has_alpha:
+                output = f"{output_stem}.normalized.jpg"
+                frame.convert("RGB").save(output, format="JPEG", quality=jpeg_quality)
+            else:
+                output = f"{output_stem}.normalized.png"
+                if frame.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                    frame = frame.convert("RGBA" if has_alpha else "RGB")
+                frame.save(output, format="PNG", compress_level=3)
+
+            record.update(path=output, size=target, scale=target[0] / width)
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+
+def normalize_batch(paths, max_dimension=2560, workers=None, directory=None):
+    """
+    Normalize many images in parallel processes; results come back in input order. With
+    `directory` the re-encoded files go there instead of next to the inputs.
+    """
+    paths = list(paths)
+    count = len(paths)
+    stems = [os.path.join(directory, f"{i:05d}_{os.path.basename(path)}") if directory else None
+             for i, path in enumerate(paths)]
+    if count <= 1:
+        return [normalize_image(path, max_dimension, output_stem=stem) for path, stem in zip(paths, stems)]
+    with ProcessPoolExecutor(max_workers=workers or min(count, os.cpu_count() or 1)) as executor:
+        return list(executor.map(normalize_image, paths, [max_dimension] * count, [JPEG_QUALITY] * count, stems))
+
+
+def restore_original_size(translated_path, size):
+    """Scale a translated image back up to the (width, height) of the original upload"""
+    with Image.open(translated_path) as image:
+        if image.size == tuple(size):
+            return translated_path
+        restored = image.resize(tuple(size), Image.LANCZOS)
+    restored.save(translated_path, format="PNG")
+    return translated_path
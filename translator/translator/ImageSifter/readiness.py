@@ -0,0 +1,161 @@
+"""Event-driven waits for the Google Translate image page"""
+
+
+class By:
+    """
+    The W3C locator strategies, same values as selenium's By; spelled out so that importing
+    the translation modules does not load selenium before a browser is actually needed
+    """
+    CSS_SELECTOR = "css selector"
+    XPATH = "xpath"
+    TAG_NAME = "tag name"
+
+
+def _wait(driver, timeout, poll=0.5):
+    from selenium.webdriver.support.ui import WebDriverWait
+    return WebDriverWait(driver, timeout, poll_frequency=poll)
+
+# UI elements that only appear once Google has rendered a translation
+TRANSLATION_INDICATORS = [
+    "//button[contains(text(), 'Download translation')]",
+    "//button[contains(text(), 'Copy text')]",
+    "//*[contains(text(), 'Detected language')]",
+    "//*[contains(@aria-label, 'Download')]",
+    "//*[contains(@aria-label, 'Copy')]"
+]
+
+# Shared by the one-shot check and the MutationObserver; returns the first visible
+# indicator XPath, 'no_text' when Google gives up on the image, or null
+_CHECK_JS = """
+function imagesifterCheck(xpaths) {
+    for (var i = 0; i < xpaths.length; i++) {
+        var found = document.evaluate(xpaths[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var j = 0; j < found.snapshotLength; j++) {
+            var el = found.snapshotItem(j);
+            if (el.getClientRects && el.getClientRects().length &&
+                window.getComputedStyle(el).visibility !== 'hidden') {
+                return xpaths[i];
+            }
+        }
+    }
+    var text = ((document.body && document.body.innerText) || '').toLowerCase();
+    if (text.indexOf('no text found') !== -1) return 'no_text';
+    return null;
+}
+"""
+
+_WAIT_FOR_TRANSLATION_JS = _CHECK_JS + """
+var xpaths = arguments[0];
+var timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+
+var hit = imagesifterCheck(xpaths);
+if (hit) { done(hit); return; }
+
+var finished = false;
+var scheduled = false;
+function finish(value) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(value);
+}
+var observer = new MutationObserver(function() {
+    // Coalesce bursts of mutations into one check
+    if (scheduled || finished) return;
+    scheduled = true;
+    setTimeout(function() {
+        scheduled = false;
+        var result = imagesifterCheck(xpaths);
+        if (result) finish(result);
+    }, 50);
+});
+observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+var timer = setTimeout(function() { finish(imagesifterCheck(xpaths)); }, timeoutMs);
+"""
+
+_RESULT_IMAGE_READY_JS = """
+var half = window.innerWidth / 2;
+var imgs = document.images;
+for (var i = 0; i < imgs.length; i++) {
+    var img = imgs[i];
+    if (!img.complete || img.naturalWidth < 100 || img.naturalHeight < 100) continue;
+    var src = img.currentSrc || img.src || '';
+    if (img.getBoundingClientRect().left > half || src.indexOf('googleusercontent.com') !== -1) return true;
+}
+return false;
+"""
+
+
+def wait_for_page_ready(driver, timeout=15):
+    _wait(driver, timeout).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
+
+
+def wait_for_any_element(driver, locators, timeout=10, poll=0.1):
+    """Wait until any of the (By, value) locators matches; returns the first element or None"""
+    def _find(d):
+        for by, value in locators:
+            elements = d.find_elements(by, value)
+            if elements:
+                return elements[0]
+        return False
+
+    try:
+        return _wait(driver, timeout, poll).until(_find)
+    except Exception:
+        return None
+
+
+def wait_for_translation(driver, timeout=25, indicators=TRANSLATION_INDICATORS):
+    """
+    Block until the translation UI appears, using a MutationObserver inside the page so we
+    return as soon as the DOM changes rather than on a polling tick.
+
+    Returns the matching indicator XPath, 'no_text', or None on timeout.
+    """
+    previous_timeout = None
+    try:
+        previous_timeout = driver.timeouts.script
+        if previous_timeout < timeout + 5:
+            driver.set_script_timeout(timeout + 5)
+    except Exception:
+        previous_timeout = None
+    try:
+        return driver.execute_async_script(_WAIT_FOR_TRANSLATION_JS, indicators, int(timeout * 1000))
+    except Exception:
+        # Fall back to polling the same check with one round trip per tick
+        try:
+            return _wait(driver, timeout, 0.25).until(
+                lambda d: d.execute_script(_CHECK_JS + "return imagesifterCheck(arguments[0]);", indicators)
+            )
+        except Exception:
+            return None
+    finally:
+        if previous_timeout is not None:
+            try:
+                driver.set_script_timeout(previous_timeout)
+            except Exception:
+                pass
+
+
+def wait_for_translation_cleared(driver, timeout=5, indicators=TRANSLATION_INDICATORS):
+    """Wait until no translation indicator is visible any more (after clearing a result)"""
+    try:
+        return _wait(driver, timeout, 0.1).until(
+            lambda d: d.execute_script(_CHECK_JS + "return imagesifterCheck(arguments[0]) === null;", indicators)
+        )
+    except Exception:
+        return False
+
+
+def wait_for_result_image(driver, timeout=5):
+    """Wait until a large, fully decoded result image is on the page"""
+    try:
+        return _wait(driver, timeout, 0.1).until(
+            lambda d: d.execute_script(_RESULT_IMAGE_READY_JS)
+        )
+    except Exception:
+        return False
@@ -0,0 +1,61 @@
+"""Progress reporters: where the translation core sends its status messages"""
+import logging
+
+
+class Reporter:
+    """Base reporter; drops every message. Subclass and override what you need."""
+
+    def info(self, message):
+        pass
+
+    def success(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+
+class LoggingReporter(Reporter):
+    """Sends messages to the `imagesifter` logger, for the CLI and background workers"""
+
+    def __init__(self, logger=None, verbose=False):
+        self.logger = logger or logging.getLogger("imagesifter")
+        self.verbose = verbose
+
+    def info(self, message):
+        if self.verbose:
+            self.logger.info(message)
+        else:
+            self.logger.debug(message)
+
+    def success(self, message):
+        self.logger.info(message)
+
+    def warning(self, message):
+        self.logger.warning(message)
+
+    def error(self, message):
+        self.logger.error(message)
+
+
+class StreamlitReporter(Reporter):
+    """Renders messages as Streamlit alerts in the current session"""
+
+    def __init__(self):
+        import streamlit as st
+        self.st = st
+
+    def info(self, message):
+        self.st.info(message)
+
+    def success(self, message):
+        self.st.success(message)
+
+    def warning(self, message):
+        self.st.warning(message)
+
+    def error(self, message):
+        self.st.error(message)
@@ -0,0 +1,137 @@
+"""On-disk cache of translated images keyed by upload content and language pair"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+_LANG_RE = re.compile(r"[^A-Za-z0-9-]")
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _link_or_copy(src, dest):
+    try:
+        if os.path.exists(dest):
+            os.remove(dest)
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class TranslationCache:
+    """
+    Content-addressed store of translated PNGs.
+
+    Entries are keyed by (sha256 of the uploaded bytes, source_lang, target_lang) and evicted
+    least-recently-used first once the cache grows beyond `max_bytes`. File mtimes double as
+    the LRU clock so the ordering survives restarts.
+    """
+
+    def __init__(self, root, max_bytes=500 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(digest, source_lang, target_lang):
+        return f"{digest}_{_LANG_RE.sub('', source_lang)}_{_LANG_RE.sub('', target_lang)}"
+
+    def key_for_file(self, image_path, source_lang, target_lang):
+        return self.make_key(hash_file(image_path), source_lang, target_lang)
+
+    def key_for_bytes(self, data, source_lang, target_lang):
+        return self.make_key(hashlib.sha256(data).hexdigest(), source_lang, target_lang)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def get(self, key, dest=None):
+        """Return the cached PNG (linked or copied to `dest` if given), or None on a miss"""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        if dest:
+            _link_or_copy(path, dest)
+            return dest
+        return path
+
+    def lookup(self, image_path, source_lang, target_lang, dest=None):
+        """Hash an image file and look it up; returns (key, cached_path_or_None)"""
+        key = self.key_for_file(image_path, source_lang, target_lang)
+        return key, self.get(key, dest)
+
+    def put(self, key, src_path):
+        """Store a translated image; the write is atomic so readers never see partial files"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(src_path, tmp_path)
+            size = os.path.getsize(tmp_path)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._total_bytes += size - previous
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+        return path
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[1])
+            total = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    continue
+            self._total_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,73 @@
+import shutil
+import threading
+import time
+
+from PIL import Image
+
+import coordinator
+import worker
+
+# Seconds a stubbed translation takes, per worker thread name
+DELAYS = {"fast": 0.01, "slow": 0.4}
+
+
+def fake_translate_batch(items, concurrency=None, reporter=None, **options):
+    """Stands in for translate_batch: 'translates' by copying the input, at the thread's pace"""
+    for index, (image_path, _, _, output_path) in enumerate(items):
+        time.sleep(DELAYS[threading.current_thread().name])
+        shutil.copyfile(image_path, output_path)
+        yield {'index': index, 'translated_path': output_path, 'translated_text': None, 'error': None,
+               'cached': False, 'duplicate_of': None, 'fallback_path': None, 'tiles': 0}
+
+
+def test_localhost_workers_finish_every_item_and_steal(tmp_path, monkeypatch):
+    monkeypatch.setattr(worker, "translate_batch", fake_translate_batch)
+    monkeypatch.setattr(coordinator, "HEARTBEAT_SECONDS", 0.2)
+
+    items = []
+    for i in range(8):
+        path = tmp_path / f"{i}.png"
+        Image.new("RGB", (40 + i, 30), (i * 20, 100, 200)).save(path)
+        items.append((str(path), "auto", "en", str(tmp_path / f"{i}_translated.png")))
+    coord = coordinator.Coordinator(items)
+    httpd = coordinator.serve(coord, "127.0.0.1", 0, token="")
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    try:
+        workers = [
+            threading.Thread(target=worker.run_remote_worker, name=name, daemon=True,
+                             kwargs=dict(url=url, concurrency=1, poll_interval=0.05, worker_id=name))
+            for name in ("slow", "fast")
+        ]
+        # The slow worker registers first and takes everything; the fast one can only get
+        # through most of the batch by stealing from it
+        workers[0].start()
+        deadline = time.monotonic() + 10
+        while "slow" not in coord.status()["workers"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        workers[1].start()
+        assert coord.finished.wait(30)
+        for thread in workers:
+            thread.join(10)
+            assert not thread.is_alive()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    status = coord.status()
+    assert status["counts"]["done"] == len(items)
+    for _, _, _, output_path in items:
+        with Image.open(output_path) as image:
+            assert image.width >= 40
+    assert status["steals"] >= 2
+    assert status["workers"]["fast"]["completed"] > status["workers"]["slow"]["completed"]
+
+
+def test_worker_ids_are_restricted():
+    coord = coordinator.Coordinator([])
+    for bad in ("../x", "a/b", "", "a.b", None):
+        try:
+            coord.register(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} was accepted")
+    coord.register("host-1_abc")
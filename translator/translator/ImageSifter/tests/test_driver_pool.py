@@ -0,0 +1,54 @@
+from driver_pool import DriverPool
+
+
+class FakeLock:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+        self.imagesifter_profile_locks = [FakeLock(), FakeLock()]
+
+    def get(self, url):
+        pass
+
+    def execute_script(self, script):
+        if self.quit_called:
+            raise RuntimeError("invalid session id")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_recycled_driver_releases_its_slots():
+    pool = DriverPool(FakeDriver, size=1, max_jobs=1, max_rss_mb=0, warm_url=None)
+    pooled = pool.acquire()
+    locks = list(pooled.driver.imagesifter_profile_locks)
+    pool.release(pooled)
+    assert pooled.driver.quit_called
+    assert all(lock.closed for lock in locks)
+    assert pool.stats["recycled"] == 1
+
+
+def test_close_and_fresh_release_slots():
+    pool = DriverPool(FakeDriver, size=1, max_jobs=0, max_rss_mb=0, warm_url=None)
+    first = pool.acquire()
+    first_locks = list(first.driver.imagesifter_profile_locks)
+    pool.release(first)
+    second = pool.acquire(fresh=True)
+    assert second is not first and all(lock.closed for lock in first_locks)
+    second_locks = list(second.driver.imagesifter_profile_locks)
+    pool.release(second)
+    pool.close()
+    assert all(lock.closed for lock in second_locks)
+
+
+def test_warmed_driver_remembers_its_page():
+    pool = DriverPool(FakeDriver, size=1, max_rss_mb=0, warm_url="https://example.test/?op=images")
+    assert pool.acquire().page_url == "https://example.test/?op=images"
@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+from jobqueue import JobQueue
+from metrics import Histogram, summarize
+
+
+def test_live_workers_ignores_exited_processes(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    queue.heartbeat("crashed-on-startup", pid=child.pid)
+    assert queue.live_workers() == 0
+
+    queue.heartbeat("this-process")
+    assert queue.live_workers() == 1
+
+
+def test_phase_timings_accumulate_on_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    job_id = queue.submit([("a.png", b"png")])
+    first, second = Histogram(), Histogram()
+    first.observe(0.2)
+    second.observe(0.4)
+    second.observe(0.6)
+
+    queue.add_phases(job_id, {"translate": first})
+    queue.add_phases(job_id, {"translate": second, "download": first})
+
+    rows = {row["phase"]: row for row in summarize(queue.job(job_id)["phases"])}
+    assert rows["translate"]["count"] == 3
+    assert rows["translate"]["total_s"] == 1.2
+    assert rows["download"]["count"] == 1
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from readiness import (
+    By,
+    wait_for_any_element,
+    wait_for_page_ready,
+    wait_for_result_image,
+    wait_for_translation_cleared,
+)
+
+
+class FakeDriver:
+    """Just enough of a WebDriver for the waits: scripted readyState and element lookups"""
+
+    def __init__(self, ready_after=1, script_result=True, elements=None):
+        self.ready_after = ready_after
+        self.script_result = script_result
+        self.elements = elements or {}
+        self.polls = 0
+
+    def execute_script(self, script, *args):
+        if "document.readyState" in script:
+            self.polls += 1
+            return "complete" if self.polls > self.ready_after else "loading"
+        return self.script_result
+
+    def find_elements(self, by, value):
+        return self.elements.get((by, value), [])
+
+
+def test_page_ready_waits_for_complete():
+    driver = FakeDriver(ready_after=2)
+    wait_for_page_ready(driver, timeout=5)
+    assert driver.polls == 3
+
+
+def test_page_ready_times_out():
+    from selenium.common.exceptions import TimeoutException
+
+    with pytest.raises(TimeoutException):
+        wait_for_page_ready(FakeDriver(ready_after=10 ** 6), timeout=0.3)
+
+
+def test_any_element_returns_first_match():
+    element = object()
+    driver = FakeDriver(elements={(By.CSS_SELECTOR, "input[type='file']"): [element]})
+    locators = [(By.XPATH, "//div[@id='missing']"), (By.CSS_SELECTOR, "input[type='file']")]
+    assert wait_for_any_element(driver, locators, timeout=1) is element
+    assert wait_for_any_element(FakeDriver(), locators, timeout=0.3) is None
+
+
+def test_script_waits():
+    assert wait_for_translation_cleared(FakeDriver(script_result=True), timeout=1) is True
+    assert wait_for_translation_cleared(FakeDriver(script_result=False), timeout=0.3) is False
+    assert wait_for_result_image(FakeDriver(script_result=True), timeout=1) is True
@@ -0,0 +1,27 @@
+from PIL import Image
+
+import translation
+from result_cache import TranslationCache
+
+
+def test_all_cache_hits_never_create_a_pool(tmp_path, monkeypatch):
+    def _no_pool():
+        raise AssertionError("a batch of cache hits started a browser pool")
+
+    monkeypatch.setattr(translation, "_shared", {})
+    monkeypatch.setattr(translation, "_create_driver_pool", _no_pool)
+    monkeypatch.setattr(translation.REGISTRY, "write_prometheus", lambda *args, **kwargs: None)
+
+    cache = TranslationCache(str(tmp_path / "cache"))
+    items = []
+    for i in range(3):
+        image_path = tmp_path / f"{i}.png"
+        Image.new("RGB", (60, 40), (i * 50, 0, 0)).save(image_path)
+        translated = tmp_path / f"{i}_cached.png"
+        Image.new("RGB", (60, 40), (0, i * 50, 0)).save(translated)
+        cache.put(cache.key_for_file(str(image_path), "ja", "en"), str(translated))
+        items.append((str(image_path), "ja", "en", str(tmp_path / f"{i}_translated.png")))
+
+    outcomes = list(translation.translate_batch(items, cache=cache))
+    assert sorted(outcome["index"] for outcome in outcomes) == [0, 1, 2]
+    assert all(outcome["cached"] and outcome["error"] is None for outcome in outcomes)
@@ -0,0 +1,81 @@
+"""Small, memoized preview images for the upload grid and results view"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image, ImageOps
+
+THUMBNAIL_BUDGET_MB = int(os.environ.get("IMAGESIFTER_THUMBNAIL_BUDGET_MB", "64"))
+
+
+def make_thumbnail(data, max_size=480):
+    """Decode image bytes once and return a small JPEG (or PNG if it has transparency)"""
+    with Image.open(BytesIO(data)) as image:
+        if image.format == "JPEG":
+            # Decode at reduced resolution; far cheaper than decoding full size and shrinking
+            image.draft("RGB", (max_size, max_size))
+        image.seek(0)
+        thumbnail = ImageOps.exif_transpose(image)
+        thumbnail.thumbnail((max_size, max_size))
+
+    output = BytesIO()
+    if thumbnail.mode in ("RGBA", "LA") or (thumbnail.mode == "P" and "transparency" in thumbnail.info):
+        thumbnail.save(output, format="PNG")
+    else:
+        thumbnail.convert("RGB").save(output, format="JPEG", quality=80)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """
+    LRU of encoded thumbnails keyed by (content digest, size), bounded by total bytes. Files on
+    disk use their path, size and modification time in place of a digest (see thumbnail_for_file).
+    """
+
+    def __init__(self, max_bytes=THUMBNAIL_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest, max_size, load):
+        """Return the thumbnail for `digest`, calling `load()` for the image bytes only on a miss"""
+        key = (digest, max_size)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        thumbnail = make_thumbnail(load(), max_size)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = thumbnail
+                self._bytes += len(thumbnail)
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return thumbnail
+
+
+_default_cache = ThumbnailCache()
+
+
+def thumbnail_for_bytes(data, max_size=480, digest=None):
+    digest = digest or hashlib.sha256(data).hexdigest()
+    return _default_cache.get(digest, max_size, lambda: data)
+
+
+def thumbnail_for_file(path, max_size=480):
+    """Thumbnail of a file on disk; a hit costs one stat() instead of reading and hashing the file"""
+    stat = os.stat(path)
+
+    def _load():
+        with open(path, "rb") as f:
+            return f.read()
+
+    return _default_cache.get(("file", os.path.realpath(path), stat.st_size, stat.st_mtime_ns), max_size, _load)
+
+
+def thumbnail_for_digest(digest, max_size, load):
+    return _default_cache.get(digest, max_size, load)
@@ -0,0 +1,168 @@
+"""
+Tiling for oversized images: long chat screenshots, posters and webtoon strips.
+
+The Translate UI scales whatever it is given to fit its viewer, so a 20000px strip comes back
+with illegible text. Such images are cut into overlapping tiles that keep the text at its
+original scale; the tiles are translated concurrently like any other upload and stitched back
+together here. Within each overlap the seam follows the line where the two translated tiles
+agree best and the original has the least detail, i.e. the gap between two lines of text
+rather than through one, and is blended over a few pixels.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+# Longest side of a tile; 0 disables tiling
+TILE_SIZE = int(os.environ.get("IMAGESIFTER_TILE_SIZE", "2560"))
+
+# Minimum overlap between neighbouring tiles, in original pixels
+TILE_OVERLAP = int(os.environ.get("IMAGESIFTER_TILE_OVERLAP", "192"))
+
+# Images (and tiles) more elongated than this are what the viewer shrinks the most
+TILE_MAX_ASPECT = float(os.environ.get("IMAGESIFTER_TILE_MAX_ASPECT", "2.5"))
+
+# Half-width of the blend across a seam
+SEAM_FEATHER = 8
+
+
+def needs_tiling(size, tile_size=TILE_SIZE, max_aspect=TILE_MAX_ASPECT):
+    """Whether an image of `size` (width, height) loses detail unless it is tiled"""
+    if not tile_size or not size:
+        return False
+    longest, shortest = max(size), min(size)
+    return longest > tile_size and (longest > shortest * max_aspect or shortest > tile_size)
+
+
+def _spans(length, tile, overlap):
+    """Equal-length (start, end) spans covering `length`, overlapping by at least `overlap`"""
+    if length <= tile:
+        return [(0, length)]
+    overlap = min(overlap, tile // 4)
+    count = math.ceil((length - overlap) / (tile - overlap))
+    step = (length - tile) / (count - 1)
+    return [(round(i * step), round(i * step) + tile) for i in range(count)]
+
+
+def tile_layout(size, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_aspect=TILE_MAX_ASPECT):
+    """Column and row spans for an image of `size`; tiles are never more elongated than max_aspect"""
+    width, height = size
+    tile_width = min(width, tile_size, round(min(height, tile_size) * max_aspect))
+    tile_height = min(height, tile_size, round(min(width, tile_size) * max_aspect))
+    return _spans(width, tile_width, overlap), _spans(height, tile_height, overlap)
+
+
+def split_image(path, directory, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, max_aspect=TILE_MAX_ASPECT):
+    """
+    Cut one image into overlapping tiles written to `directory`.
+
+    Returns a plan dict with source, size, columns and rows (lists of spans), tiles (row-major
+    list of {path, box}) and error; stitch() turns the translated tiles back into one image.
+    """
+    plan = {"source": path, "size": None, "columns": [], "rows": [], "tiles": [], "error": None}
+    try:
+        with Image.open(path) as image:
+            source_format = image.format
+            image.seek(0)
+            frame = ImageOps.exif_transpose(image)
+            has_alpha = frame.mode in ("RGBA", "LA") or (frame.mode == "P" and "transparency" in frame.info)
+            frame = frame.convert("RGBA" if has_alpha else "RGB")
+        plan["size"] = frame.size
+        plan["columns"], plan["rows"] = tile_layout(frame.size, tile_size, overlap, max_aspect)
+        os.makedirs(directory, exist_ok=True)
+        for row, (top, bottom) in enumerate(plan["rows"]):
+            for column, (left, right) in enumerate(plan["columns"]):
+                tile = frame.crop((left, top, right, bottom))
+                if source_format == "JPEG" and not has_alpha:
+                    tile_path = os.path.join(directory, f"tile_{row:03d}_{column:03d}.jpg")
+                    tile.save(tile_path, format="JPEG", quality=90)
+                else:
+                    tile_path = os.path.join(directory, f"tile_{row:03d}_{column:03d}.png")
+                    tile.save(tile_path, format="PNG", compress_level=3)
+                plan["tiles"].append({"path": tile_path, "box": (left, top, right, bottom)})
+    except Exception as e:
+        plan["error"] = str(e)
+    return plan
+
+
+def split_batch(paths, directories, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, workers=None):
+    """split_image() for many files in parallel processes; plans come back in input order"""
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [split_image(path, directory, tile_size, overlap) for path, directory in zip(paths, directories)]
+    count = len(paths)
+    with ProcessPoolExecutor(max_workers=workers or min(count, os.cpu_count() or 1)) as executor:
+        return list(executor.map(split_image, paths, directories, [tile_size] * count, [overlap] * count))
+
+
+def _line_means(image):
+    """Mean value of every row of an L image"""
+    return list(image.resize((1, image.height), Image.BOX).getdata())
+
+
+def _join(top, bottom, offset, detail=None):
+    """
+    Stack `bottom` below `top`, starting `offset` pixels down; both have the same width. The
+    seam is the overlap row where the two differ least, plus the original's `detail` (an L
+    image of the overlap), so it runs between lines of text.
+    """
+    overlap = top.height - offset
+    canvas = Image.new(top.mode, (top.width, offset + bottom.height))
+    canvas.paste(top, (0, 0))
+    if overlap <= 0:
+        canvas.paste(bottom, (0, offset))
+        return canvas
+
+    feather = min(SEAM_FEATHER, overlap // 4)
+    difference = ImageChops.difference(top.crop((0, offset, top.width, top.height)).convert("RGB"),
+                                       bottom.crop((0, 0, bottom.width, overlap)).convert("RGB")).convert("L")
+    costs = _line_means(difference)
+    if detail is not None:
+        costs = [cost + edge for cost, edge in zip(costs, _line_means(detail))]
+    seam = min(range(feather, overlap - feather), key=costs.__getitem__, default=overlap // 2)
+
+    mask = Image.new("L", bottom.size, 0)
+    if feather:
+        mask.paste(Image.linear_gradient("L").resize((bottom.width, 2 * feather)), (0, seam - feather))
+    mask.paste(255, (0, seam + feather, bottom.width, bottom.height))
+    canvas.paste(bottom, (0, offset), mask)
+    return canvas
+
+
+def _transposed(image):
+    return image.transpose(Image.Transpose.TRANSPOSE) if image is not None else None
+
+
+def stitch(plan, translated_paths, output_path):
+    """Reassemble translated tiles (same order as plan['tiles']) into one PNG of the original size"""
+    with Image.open(plan["source"]) as image:
+        image.seek(0)
+        detail = ImageOps.exif_transpose(image).convert("L").filter(ImageFilter.FIND_EDGES)
+
+    tiles = []
+    for tile, translated_path in zip(plan["tiles"], translated_paths):
+        left, top, right, bottom = tile["box"]
+        with Image.open(translated_path) as translated:
+            translated = translated.convert("RGB")
+        if translated.size != (right - left, bottom - top):
+            translated = translated.resize((right - left, bottom - top), Image.LANCZOS)
+        tiles.append(translated)
+
+    # Join each row left to right (as a transposed vertical join), then the rows top to bottom
+    columns, rows = plan["columns"], plan["rows"]
+    strips = []
+    for row, (top, bottom) in enumerate(rows):
+        strip = _transposed(tiles[row * len(columns)])
+        for column in range(1, len(columns)):
+            (_, previous_end), (start, _) = columns[column - 1], columns[column]
+            overlap = detail.crop((start, top, previous_end, bottom)) if previous_end > start else None
+            strip = _join(strip, _transposed(tiles[row * len(columns) + column]), start, _transposed(overlap))
+        strips.append(strip.transpose(Image.Transpose.TRANSPOSE))
+
+    result = strips[0]
+    for row in range(1, len(rows)):
+        (_, previous_end), (start, _) = rows[row - 1], rows[row]
+        overlap = detail.crop((0, start, plan["size"][0], previous_end)) if previous_end > start else None
+        result = _join(result, strips[row], start, overlap)
+    result.save(output_path, format="PNG")
+    return output_path
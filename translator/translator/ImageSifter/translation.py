@@ -0,0 +1,930 @@
+"""
+Streamlit-free translation core shared by the web UI and the command-line batch runner.
+
+Progress and diagnostics go through a Reporter (see reporting.py) instead of calling
+Streamlit directly, so the same code runs on worker nodes with no UI session.
+"""
+import os
+import time
+import atexit
+import random
+import shutil
+import tempfile
+import threading
+from driver_pool import DriverPool
+from batch import CircuitBreaker, GroupScheduler, RateLimiter, run_batch
+from browser_resolver import resolve_browser
+from browser_profile import (
+    PROFILE_AUTO_WARM,
+    apply_network_filter,
+    browser_version_changed,
+    build_profile_template,
+    claim_disk_cache,
+    claim_profile,
+    invalidate_profile,
+    profile_arguments,
+    profile_status,
+)
+from result_cache import TranslationCache
+from extraction import (
+    CANVAS_PNG_JS,
+    ScriptUnavailable,
+    find_result_image_fallback,
+    read_result_text,
+    select_result_image,
+    stream_image_to_file,
+    supports_binary_transfer,
+)
+from dedupe import DEDUPE_THRESHOLD, cluster, hash_batch
+from failures import TranslationFailure, classify, is_throttle_text
+from preprocess import normalize_batch, original_size, restore_original_size
+from tiling import TILE_SIZE, needs_tiling, split_batch, stitch
+from reporting import Reporter
+from metrics import REGISTRY, PhaseTimer, log_record, span
+from readiness import (
+    By,
+    wait_for_any_element,
+    wait_for_page_ready,
+    wait_for_result_image,
+    wait_for_translation,
+    wait_for_translation_cleared,
+)
+
+# Image formats accepted by the Google Translate image page
+SUPPORTED_EXTENSIONS = ['png', 'jpg', 'jpeg', 'jfif', 'gif', 'bmp', 'webp']
+
+# Upload inputs on the Images page, most specific first
+UPLOAD_SELECTORS = [
+    "input[type='file'][accept*='image']",
+    "input[type='file']",
+    "[data-test-id='file-upload'] input",
+    ".VfPpkd-Bz112c input[type='file']"
+]
+UPLOAD_LOCATORS = [(By.CSS_SELECTOR, selector) for selector in UPLOAD_SELECTORS]
+
+# Controls that discard the current result and bring back the upload area
+CLEAR_RESULT_XPATHS = [
+    "//button[contains(@aria-label, 'Clear')]",
+    "//*[@role='button'][contains(@aria-label, 'Clear')]",
+    "//button[contains(text(), 'Clear')]"
+]
+
+# Cookie consent buttons Google shows before the app in some regions
+CONSENT_XPATHS = [
+    "//button[contains(., 'Reject all')]",
+    "//button[contains(., 'Accept all')]",
+    "//input[@type='submit'][contains(@value, 'Reject all') or contains(@value, 'Accept all')]"
+]
+
+# Browser pool settings (override through the environment)
+POOL_SIZE = int(os.environ.get("IMAGESIFTER_POOL_SIZE", "2"))
+POOL_MAX_JOBS = int(os.environ.get("IMAGESIFTER_POOL_MAX_JOBS", "25"))
+POOL_MAX_RSS_MB = int(os.environ.get("IMAGESIFTER_POOL_MAX_RSS_MB", "1500"))
+
+# Jobs a browser translates for one language pair in a row while another pair waits with no browser
+PAIR_QUANTUM = int(os.environ.get("IMAGESIFTER_PAIR_QUANTUM", "8"))
+
+# Google Translate base URL; point it at a local stand-in (fake_translate.py) for benchmarks
+TRANSLATE_URL = os.environ.get("IMAGESIFTER_TRANSLATE_URL", "https://translate.google.com/")
+
+# Longest we wait for Google to render a translation after upload
+TRANSLATION_TIMEOUT = int(os.environ.get("IMAGESIFTER_TRANSLATION_TIMEOUT", "25"))
+
+# Translation result cache (set IMAGESIFTER_CACHE_DIR to an empty string to disable)
+CACHE_DIR = os.environ.get("IMAGESIFTER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "imagesifter", "results"))
+CACHE_MAX_MB = int(os.environ.get("IMAGESIFTER_CACHE_MAX_MB", "500"))
+
+# Longest side, in pixels, of images sent to the browser (0 uploads originals untouched)
+MAX_DIMENSION = int(os.environ.get("IMAGESIFTER_MAX_DIMENSION", "2560"))
+
+# Batch settings
+MAX_WORKERS = int(os.environ.get("IMAGESIFTER_MAX_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+RATE_PER_SEC = float(os.environ.get("IMAGESIFTER_RATE_PER_SEC", "1.0"))
+RATE_BURST = int(os.environ.get("IMAGESIFTER_RATE_BURST", "2"))
+
+# Retries for transient failures, each on a fresh browser after an exponential backoff
+MAX_ATTEMPTS = int(os.environ.get("IMAGESIFTER_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = float(os.environ.get("IMAGESIFTER_RETRY_BASE_SECONDS", "2"))
+RETRY_MAX_SECONDS = float(os.environ.get("IMAGESIFTER_RETRY_MAX_SECONDS", "30"))
+
+# Circuit breaker: remote failures in a row before every worker pauses, and the first pause
+BREAKER_THRESHOLD = int(os.environ.get("IMAGESIFTER_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("IMAGESIFTER_BREAKER_COOLDOWN", "30"))
+
+def setup_chrome_driver(user_data_dir=None):
+    """
+    Set up Chrome driver with headless options for Replit environment
+
+    Without `user_data_dir` the browser runs on a clone of the shared profile template when
+    one is available, else on a blank profile with a reusable disk cache (as it does when
+    `user_data_dir` is an empty string).
+    """
+    # Deferred to the first launch, so importing this module (on every Streamlit rerun, or for
+    # a CLI that only reads the cache) does not load selenium
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")  # Use new headless mode
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-logging")
+    chrome_options.add_argument("--disable-web-security")
+    chrome_options.add_argument("--allow-running-insecure-content")
+    chrome_options.add_argument("--disable-background-timer-throttling")
+    chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+    chrome_options.add_argument("--disable-renderer-backgrounding")
+    chrome_options.add_argument("--disable-features=VizDisplayCompositor,Translate,OptimizationHints,MediaRouter")
+    chrome_options.add_argument("--disable-ipc-flooding-protection")
+    chrome_options.add_argument("--disable-default-apps")
+    chrome_options.add_argument("--disable-hang-monitor")
+    chrome_options.add_argument("--disable-prompt-on-repost")
+    chrome_options.add_argument("--disable-sync")
+    chrome_options.add_argument("--force-color-profile=srgb")
+    chrome_options.add_argument("--metrics-recording-only")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--enable-features=NetworkService,NetworkServiceInProcess")
+    
+    # Smaller window, no first-run work, and an HTTP cache that survives browser restarts
+    profile_lock = profile_manifest = None
+    if user_data_dir is None:
+        user_data_dir, profile_lock, profile_manifest = claim_profile()
+    disk_cache_dir = disk_cache_lock = None
+    if not user_data_dir:
+        disk_cache_dir, disk_cache_lock = claim_disk_cache()
+    locks = [lock for lock in (profile_lock, disk_cache_lock) if lock]
+    for argument in profile_arguments(disk_cache_dir, user_data_dir):
+        chrome_options.add_argument(argument)
+    
+    # Browser and driver are discovered once per process (and cached on disk); see browser_resolver.py
+    browser = resolve_browser()
+    if browser['binary']:
+        chrome_options.binary_location = browser['binary']
+    
+    try:
+        # Without a known chromedriver, Selenium Manager finds or downloads a matching one
+        service = Service(executable_path=browser['driver']) if browser['driver'] else Service()
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+        
+        # Set timeouts to prevent session issues
+        # Explicit waits only (readiness.py); an implicit wait would stall every empty lookup
+        driver.implicitly_wait(0)
+        driver.set_page_load_timeout(30)
+        driver.set_script_timeout(30)
+        
+        # Keep the profile and cache slots claimed for as long as this browser lives;
+        # driver_pool.quit_driver releases them when the browser is quit
+        driver.imagesifter_profile_locks = locks
+        if browser_version_changed(profile_manifest, driver):
+            invalidate_profile(reason="browser version changed")
+        try:
+            apply_network_filter(driver)
+        except Exception:
+            pass  # Blocking is an optimization; the page works without it
+        
+        return driver
+    except Exception as e:
+        for lock in locks:
+            lock.close()
+        if profile_manifest:
+            # A clone that will not start points at a broken template; retry on a blank profile
+            invalidate_profile(reason=f"browser failed to start with it: {str(e)}")
+            return setup_chrome_driver(user_data_dir="")
+        raise Exception(f"Failed to start ChromeDriver: {str(e)}")
+
+# Re-entrant: some factories (the circuit breaker) fetch other shared resources
+_shared_lock = threading.RLock()
+_shared = {}
+
+def _shared_resource(name, factory):
+    """Process-wide singleton, so Streamlit reruns, sessions and CLI batches share one instance"""
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = factory()
+        return _shared[name]
+
+_profile_warming = threading.Lock()
+
+def _warm_profile_in_background():
+    """Rebuild a missing or stale profile template without holding up the caller"""
+    if not PROFILE_AUTO_WARM or profile_status() not in ("missing", "stale", "corrupt"):
+        return
+    if not _profile_warming.acquire(blocking=False):
+        return
+    
+    def _run():
+        try:
+            warm_profile()
+        except Exception as e:
+            import logging
+            logging.getLogger("imagesifter").warning("Could not warm the shared browser profile: %s", e)
+        finally:
+            _profile_warming.release()
+    
+    threading.Thread(target=_run, name="profile-warm", daemon=True).start()
+
+def launch_driver():
+    """setup_chrome_driver, timed as the driver_launch phase"""
+    _warm_profile_in_background()
+    with span("driver_launch"):
+        return setup_chrome_driver()
+
+def _create_driver_pool():
+    pool = DriverPool(
+        launch_driver,
+        size=POOL_SIZE,
+        max_jobs=POOL_MAX_JOBS,
+        max_rss_mb=POOL_MAX_RSS_MB,
+        warm_url=images_page_url("auto", "en"),
+    )
+    pool.prewarm(1)
+    atexit.register(pool.close)
+    return pool
+
+def get_driver_pool():
+    """Process-wide pool of warm browsers"""
+    return _shared_resource("driver_pool", _create_driver_pool)
+
+def get_rate_limiter():
+    """Global limit on how fast translations are started, shared by every worker and session"""
+    return _shared_resource("rate_limiter", lambda: RateLimiter(rate=RATE_PER_SEC, burst=RATE_BURST))
+
+def get_circuit_breaker():
+    """Process-wide breaker that pauses all translations while Google is throttling us"""
+    return _shared_resource(
+        "circuit_breaker",
+        lambda: CircuitBreaker(BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, rate_limiter=get_rate_limiter()),
+    )
+
+def get_translation_cache():
+    """Shared on-disk cache of finished translations, or None when caching is disabled"""
+    if not CACHE_DIR:
+        return None
+    return _shared_resource(
+        "translation_cache", lambda: TranslationCache(CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+    )
+
+def images_page_url(source_lang, target_lang):
+    return f"{TRANSLATE_URL}?sl={source_lang}&tl={target_lang}&op=images"
+
+def warm_profile(reporter=None):
+    """
+    Build a fresh shared profile template: load the Images page once on a blank profile,
+    answer the cookie consent prompt if Google shows one, and publish the result.
+    """
+    reporter = reporter or Reporter()
+    
+    def _prime(driver):
+        driver.get(images_page_url("auto", "en"))
+        wait_for_page_ready(driver, 15)
+        consent_locators = [(By.XPATH, xpath) for xpath in CONSENT_XPATHS]
+        if wait_for_any_element(driver, consent_locators + UPLOAD_LOCATORS, timeout=15) is not None:
+            for by, value in consent_locators:
+                buttons = [button for button in driver.find_elements(by, value) if button.is_displayed()]
+                if buttons:
+                    reporter.info("🍪 Answering the cookie consent prompt")
+                    driver.execute_script("arguments[0].click();", buttons[0])
+                    wait_for_page_ready(driver, 15)
+                    break
+        if wait_for_any_element(driver, UPLOAD_LOCATORS, timeout=15) is None:
+            raise Exception("Images page did not finish loading while warming the profile")
+    
+    with span("profile_warm"):
+        manifest = build_profile_template(lambda directory: setup_chrome_driver(user_data_dir=directory), _prime)
+    reporter.success(f"✅ Shared browser profile rebuilt for browser {manifest['browser_version']}")
+    return manifest
+
+def _raise_if_throttled(driver):
+    """Google answers rate-limited clients with a /sorry/ captcha page instead of the app"""
+    try:
+        if "/sorry/" in driver.current_url or is_throttle_text(
+            driver.execute_script("return document.body ? document.body.innerText.slice(0, 2000) : '';")
+        ):
+            raise TranslationFailure("throttled", "Google is rate limiting this client (captcha page)")
+    except TranslationFailure:
+        raise
+    except Exception:
+        pass
+
+def _find_upload_element(driver, reporter, timeout=5):
+    """Return the first enabled file input matched by UPLOAD_SELECTORS, or None"""
+    wait_for_any_element(driver, UPLOAD_LOCATORS, timeout=timeout)
+    for selector in UPLOAD_SELECTORS:
+        try:
+            upload_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+            for element in upload_elements:
+                # Make sure it's visible or at least present
+                if element.is_enabled():
+                    reporter.info(f"✅ Found upload element using selector: {selector}")
+                    return element
+        except:
+            continue
+    return None
+
+def _open_images_page(driver, url, reporter, timer):
+    """Navigate to the Images page and return its upload input (or None if it never shows up)"""
+    # Navigate to Google Translate image translation with explicit parameters
+    reporter.info(f"🌐 Navigating to: {url}")
+    with timer.phase("navigate"):
+        driver.get(url)
+        
+        # Wait for page to load completely
+        wait_for_page_ready(driver, 15)
+    _raise_if_throttled(driver)
+    
+    # Verify we're on the image translation page
+    current_url = driver.current_url
+    page_title = driver.title
+    reporter.info(f"📍 Current page: {page_title}")
+    
+    if "translate" not in current_url.lower():
+        reporter.error("❌ Failed to navigate to Google Translate properly")
+        raise Exception("Not on Google Translate page")
+    
+    # Check if Images tab is selected; wait for the tab or the upload input, whichever renders first
+    with timer.phase("tab_select"):
+        images_tab_xpath = "//div[contains(text(), 'Images') or contains(text(), 'images')]"
+        first_element = wait_for_any_element(driver, [(By.XPATH, images_tab_xpath)] + UPLOAD_LOCATORS, timeout=10)
+        images_tabs = driver.find_elements(By.XPATH, images_tab_xpath)
+        if images_tabs:
+            reporter.info("✅ Images tab found - clicking to ensure it's selected")
+            driver.execute_script("arguments[0].click();", images_tabs[0])
+        elif first_element is None:
+            reporter.info("ℹ️ Images tab not found or already selected")
+    
+    with timer.phase("find_upload"):
+        # First try to click the "Browse your files" button if it exists
+        browse_buttons = driver.find_elements(By.XPATH, "//button[contains(text(), 'Browse your files') or contains(text(), 'browse')]")
+        if browse_buttons and browse_buttons[0].is_displayed():
+            reporter.info("🔍 Found 'Browse your files' button - clicking it")
+            driver.execute_script("arguments[0].click();", browse_buttons[0])
+        else:
+            reporter.info("ℹ️ No 'Browse your files' button found")
+        
+        return _find_upload_element(driver, reporter)
+
+def _reset_images_page(driver, target_lang, reporter):
+    """
+    Clear the previous result from an Images page that is already loaded, so the next upload
+    skips navigation. Returns the upload input, or None if the page state looks wrong.
+    """
+    try:
+        current_url = driver.current_url
+        if "op=images" not in current_url or f"tl={target_lang}" not in current_url:
+            return None
+        
+        clear_button = None
+        for xpath in CLEAR_RESULT_XPATHS:
+            buttons = [button for button in driver.find_elements(By.XPATH, xpath) if button.is_displayed()]
+            if buttons:
+                clear_button = buttons[0]
+                break
+        # No Clear button is fine on a page that was only warmed and has no result yet
+        if clear_button is not None:
+            driver.execute_script("arguments[0].click();", clear_button)
+        
+        # The old result must be gone, or the next detection would fire on stale UI
+        if not wait_for_translation_cleared(driver, timeout=5 if clear_button is not None else 0.5):
+            return None
+        upload_element = _find_upload_element(driver, reporter, timeout=5)
+        if upload_element is not None:
+            reporter.info("♻️ Reusing loaded Images page")
+        return upload_element
+    except Exception:
+        return None
+
+def _log_translation(image_path, source_lang, target_lang, timer, completed, fallback, mode="image"):
+    log_record({
+        "ts": time.time(),
+        "image": os.path.basename(image_path),
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "mode": mode,
+        "completed": completed,
+        "fallback": fallback,
+        "total_s": round(timer.total, 4),
+        "phases": timer.as_dict(),
+    })
+
+
+def translate_image_with_google(image_path, source_lang="auto", target_lang="en", pool=None, cache=None,
+                                cache_key=None, reporter=None, output_path=None, fresh_driver=False,
+                                text_only=False):
+    """
+    Translate an image using Google Translate's image translation feature
+
+    Results are served from the translation cache when the same image and language pair has
+    been translated before. Pass `cache_key` if the caller already looked the image up.
+    The translated PNG is written to `output_path` (default: next to the input); with
+    `fresh_driver` it runs on a newly started browser. Raises TranslationFailure (see
+    failures.py) when no real translation could be extracted, including when only a
+    screenshot could be saved.
+
+    Returns (translated_path, None), or with `text_only` (None, text) where text is the dict
+    from extraction.read_result_text; no pixels are pulled out and the cache is not used.
+    """
+    reporter = reporter or Reporter()
+    output_path = output_path or f"{image_path}_translated.png"
+    cache = None if text_only else (cache if cache is not None else get_translation_cache())
+    if cache and cache_key is None:
+        cache_key, cached_path = cache.lookup(image_path, source_lang, target_lang, output_path)
+        if cached_path:
+            reporter.success(f"⚡ Served {os.path.basename(image_path)} from the translation cache")
+            return cached_path, None
+    
+    pool = pool or get_driver_pool()
+    timer = PhaseTimer()
+    url = images_page_url(source_lang, target_lang)
+    try:
+        with timer.phase("lease"):
+            lease = pool.acquire(fresh=fresh_driver, prefer_url=url)
+        driver = lease.driver
+    except Exception as e:
+        import traceback
+        error_msg = f"Failed to start browser: {str(e)}"
+        full_traceback = traceback.format_exc()
+        reporter.error(error_msg)
+        reporter.error(f"Browser setup error details: {full_traceback}")
+        raise TranslationFailure("browser_start", error_msg) from e
+    
+    job_error = None
+    try:
+        # Reuse the Images page this browser already has loaded for the same language pair;
+        # fall back to a full navigation if it cannot be reset cleanly
+        upload_element = None
+        if lease.page_url == url:
+            with timer.phase("reset"):
+                upload_element = _reset_images_page(driver, target_lang, reporter)
+        lease.page_url = None
+        if upload_element is None:
+            upload_element = _open_images_page(driver, url, reporter, timer)
+        
+        if not upload_element:
+            reporter.error("❌ Could not find any file upload element")
+            # Try to take a screenshot for debugging
+            debug_screenshot = f"{image_path}_debug_upload_page.png"
+            driver.save_screenshot(debug_screenshot)
+            _raise_if_throttled(driver)
+            raise TranslationFailure("upload_missing", "Could not find file upload element")
+        
+        # Upload the image
+        reporter.info(f"📤 Uploading image: {image_path}")
+        with timer.phase("upload"):
+            upload_element.send_keys(image_path)
+        reporter.info("✅ File upload command sent")
+        
+        # Wait for the translation UI to appear; returns as soon as the DOM shows it
+        with timer.phase("result_detection"):
+            indicator = wait_for_translation(driver, timeout=TRANSLATION_TIMEOUT)
+        translation_completed = indicator not in (None, "no_text")
+        if translation_completed:
+            reporter.success(f"✅ Translation UI detected after {timer.phases[-1][1]:.1f} seconds using: {indicator}")
+        
+        if not translation_completed:
+            # Check if Google Translate shows "No text found" or similar messages
+            page_source = driver.page_source.lower()
+            
+            if indicator == "no_text" or "no text found" in page_source:
+                reporter.error("❌ Google Translate reports: 'No text found' in the image")
+                reporter.info("💡 Suggestions to fix this:")
+                reporter.info("• Try an image with clearer, larger text")
+                reporter.info("• Ensure the text has good contrast with the background")
+                reporter.info("• Use images with horizontal text (not rotated)")
+                reporter.info("• Try a different image format or higher resolution")
+                raise TranslationFailure("no_text", "Google Translate found no text in the image")
+            elif "not supported" in page_source:
+                reporter.error("❌ Image format not supported by Google Translate")
+                raise TranslationFailure("unsupported", "Image format not supported by Google Translate")
+            else:
+                _raise_if_throttled(driver)
+                reporter.error("❌ Translation failed - Google Translate couldn't process this image")
+                reporter.info("🔄 This could mean the image format isn't supported or the text wasn't detected")
+                raise TranslationFailure("timeout", f"No translation appeared within {TRANSLATION_TIMEOUT}s")
+        
+        if text_only:
+            # The result panel already holds the text; the rendered image is never needed
+            with timer.phase("text_extraction"):
+                text = read_result_text(driver)
+            if not text['translated_text']:
+                raise TranslationFailure("text_missing", "The result panel offered no text to copy")
+            lease.page_url = url
+            reporter.success(f"✅ Read {len(text['translated_text'])} characters of translated text")
+            reporter.info(f"⏱️ {os.path.basename(image_path)}: {timer.summary()}")
+            _log_translation(image_path, source_lang, target_lang, timer, completed=True, fallback=False, mode="text")
+            return None, text
+        
+        # Wait for the rendered result image to finish decoding
+        with timer.phase("result_image"):
+            wait_for_result_image(driver, timeout=5)
+        
+        # Look for the translated image and download it directly
+        translated_image_path = None
+        screenshot_fallback = False
+        
+        extraction_start = time.perf_counter()
+        try:
+            # Choose the translated image and read its pixels in one round trip;
+            # the element-by-element heuristic is only used if the script cannot run
+            base64_data = None
+            img_src = None
+            try:
+                binary_transfer = supports_binary_transfer(driver)
+                selection = select_result_image(driver, read_pixels=not binary_transfer)
+                translated_img = selection['element'] if selection else None
+                if selection:
+                    img_src = selection.get('src')
+                    base64_data = selection.get('data')
+                    if selection.get('error'):
+                        reporter.warning(f"⚠️ In-page canvas read failed: {selection['error']}")
+            except ScriptUnavailable as script_error:
+                reporter.warning(f"⚠️ Result selection script failed, scanning images one by one: {str(script_error)}")
+                translated_img = find_result_image_fallback(driver)
+            
+            if translated_img:
+                # Get the source URL of the translated image
+                if img_src is None:
+                    img_src = translated_img.get_attribute('src')
+                reporter.info(f"Found translated image with source: {img_src[:50]}..." if img_src else "No source found")
+                
+                if img_src:
+                    # Handle blob URLs by getting image data directly from browser
+                    try:
+                        extracted = False
+                        
+                        # Fastest: stream the original image bytes out over CDP, no data URL involved
+                        if binary_transfer:
+                            try:
+                                with span("transfer_write"):
+                                    stream_image_to_file(driver, img_src, output_path)
+                                translated_image_path = output_path
+                                extracted = True
+                                reporter.success("✅ Extracted translated image bytes directly from the browser")
+                            except Exception as binary_error:
+                                reporter.warning(f"⚠️ Binary transfer failed, using canvas method: {str(binary_error)}")
+                        
+                        if not extracted:
+                            # Canvas method: re-encodes in the page and returns a base64 data URL
+                            if not base64_data:
+                                base64_data = driver.execute_script(CANVAS_PNG_JS, translated_img)
+                            
+                            if base64_data and base64_data.startswith('data:image'):
+                                # Decode base64 (skipping the data URL prefix) and save
+                                import base64
+                                translated_image_path = output_path
+                                with span("decode_write"), open(translated_image_path, 'wb') as f:
+                                    f.write(base64.b64decode(base64_data[base64_data.index(',') + 1:]))
+                                extracted = True
+                                reporter.success("✅ Successfully extracted high-quality translated image using canvas method!")
+                        
+                        if extracted:
+                            # Only real extractions are cached, never screenshot fallbacks
+                            if cache and cache_key:
+                                try:
+                                    cache.put(cache_key, translated_image_path)
+                                except Exception as cache_error:
+                                    reporter.warning(f"⚠️ Could not cache translation: {str(cache_error)}")
+                        else:
+                            raise Exception("Canvas method failed - no valid image data returned")
+                        
+                    except Exception as download_error:
+                        reporter.error(f"❌ Image extraction failed: {str(download_error)}")
+                        # Try element screenshot as fallback
+                        try:
+                            translated_image_path = output_path
+                            translated_img.screenshot(translated_image_path)
+                            screenshot_fallback = True
+                            reporter.warning("⚠️ Used element screenshot fallback - quality may be reduced")
+                        except Exception as screenshot_error:
+                            reporter.error(f"Element screenshot also failed: {str(screenshot_error)}")
+                            # Final fallback to full screenshot
+                            translated_image_path = output_path
+                            driver.save_screenshot(translated_image_path)
+                            screenshot_fallback = True
+                            reporter.warning("⚠️ Used full page screenshot as final fallback")
+                else:
+                    reporter.error("No image source URL found")
+                    # Fallback to full screenshot
+                    translated_image_path = output_path
+                    driver.save_screenshot(translated_image_path)
+                    screenshot_fallback = True
+            
+            else:
+                reporter.error("❌ No translated image found on the page")
+                
+        except Exception as e:
+            reporter.error(f"❌ Error during image extraction: {str(e)}")
+            
+        # Fallback to regular screenshot if everything else failed
+        if not translated_image_path:
+            reporter.warning("⚠️ Using full page screenshot as final fallback")
+            translated_image_path = output_path
+            driver.save_screenshot(translated_image_path)
+            screenshot_fallback = True
+        timer.record("extraction", time.perf_counter() - extraction_start)
+        
+        # A cleanly finished translation leaves the page reusable for the next upload
+        if translation_completed:
+            lease.page_url = url
+        
+        reporter.info(f"⏱️ {os.path.basename(image_path)}: {timer.summary()}")
+        _log_translation(image_path, source_lang, target_lang, timer, translation_completed, screenshot_fallback)
+        if screenshot_fallback:
+            # A picture of the page is not a translation; the caller decides what to do with it
+            raise TranslationFailure(
+                "screenshot_fallback", "Only a screenshot of the result could be saved", fallback_path=translated_image_path
+            )
+        return translated_image_path, None
+            
+    except TranslationFailure as e:
+        job_error = e
+        raise
+    except Exception as e:
+        import traceback
+        job_error = e
+        error_msg = f"Error translating image: {str(e)}"
+        full_traceback = traceback.format_exc()
+        reporter.error(error_msg)
+        reporter.error(f"Full error details: {full_traceback}")
+        raise classify(e) from e
+    finally:
+        # Hand the browser back to the pool; dead sessions are quit there instead of reused
+        pool.release(lease, job_error)
+
+
+def translate_with_retries(job, reporter=None, rate_limiter=None, breaker=None, max_attempts=None, **options):
+    """
+    Run translate_image_with_google(*job, **options), retrying transient failures on a fresh browser with
+    exponential backoff. Every attempt waits for the circuit breaker and a rate-limit token.
+    Permanent failures and the last transient one are raised as TranslationFailure.
+    """
+    reporter = reporter or Reporter()
+    max_attempts = max(1, max_attempts or MAX_ATTEMPTS)
+    name = os.path.basename(job[0])
+    for attempt in range(1, max_attempts + 1):
+        if breaker:
+            with span("breaker_wait"):
+                breaker.before_attempt()
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            result = translate_image_with_google(*job, fresh_driver=attempt > 1, **options)
+        except Exception as e:
+            failure = classify(e)
+            if breaker:
+                if failure.remote:
+                    pause = breaker.record_failure(throttled=failure.reason == "throttled")
+                    if pause:
+                        reporter.warning(f"🛑 Google looks overloaded or is throttling us; pausing all translations for {pause:.0f}s")
+                elif failure.transient:
+                    breaker.release()
+                else:
+                    # Google answered (e.g. no text found), so the service itself is fine
+                    breaker.record_success()
+            if not failure.transient or attempt == max_attempts:
+                failure.attempts = attempt
+                raise failure
+            delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            REGISTRY.observe("retry_backoff", delay)
+            reporter.warning(
+                f"🔁 {name}: {failure.reason.replace('_', ' ')}; retrying on a fresh browser in {delay:.1f}s "
+                f"(attempt {attempt + 1}/{max_attempts})"
+            )
+            time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
+
+def translate_batch(items, concurrency=None, reporter=None, pool=None, cache=None, initializer=None,
+                    max_dimension=None, restore_size=False, dedupe_threshold=None, text_only=False, tile_size=None,
+                    pair_quantum=None):
+    """
+    Translate many images, serving cache hits first and running the rest concurrently.
+
+    `items` is a list of (image_path, source_lang, target_lang, output_path) tuples. Cache
+    misses that look alike (see dedupe.py; `dedupe_threshold=-1` disables that) are translated
+    once and the result copied to the others. The rest are normalized first (see preprocess.py;
+    `max_dimension=0` skips that), and with `restore_size` every output is scaled back to its
+    original resolution. Yields one dict per item in completion order with keys index,
+    translated_path, translated_text, error, cached, duplicate_of (the index whose translation
+    was reused, or None) and fallback_path. Transient failures are retried (see
+    translate_with_retries); `error` is then the final TranslationFailure, and fallback_path a
+    screenshot saved in place of a translation, which never counts as a result.
+
+    With `text_only` nothing is extracted as an image: translated_path stays None and
+    translated_text holds the dict from extraction.read_result_text (detected_language,
+    source_text, translated_text). The image cache does not apply in that mode.
+
+    Oversized images (see tiling.py; `tile_size=0` disables that) are split into overlapping
+    tiles that are translated concurrently with everything else and stitched back at their
+    original resolution; `tiles` in the outcome is how many tiles that took (0 if untiled).
+    Tiling is skipped in text-only mode, where overlapping tiles would repeat lines.
+
+    Items may each have their own language pair. The pair is part of the page URL, so jobs are
+    scheduled per pair (see batch.GroupScheduler): every browser stays on one pair and reuses
+    its loaded page, and after `pair_quantum` jobs it moves to a pair that nobody is serving.
+    """
+    reporter = reporter or Reporter()
+    cache = None if text_only else (cache if cache is not None else get_translation_cache())
+    concurrency = concurrency or POOL_SIZE
+    max_dimension = MAX_DIMENSION if max_dimension is None else max_dimension
+    dedupe_threshold = DEDUPE_THRESHOLD if dedupe_threshold is None else dedupe_threshold
+    tile_size = TILE_SIZE if tile_size is None else tile_size
+    if max_dimension:
+        tile_size = min(tile_size, max_dimension)
+    
+    def _finish(outcome, image_path, size=None):
+        if restore_size and outcome['translated_path'] and outcome['error'] is None:
+            try:
+                restore_original_size(outcome['translated_path'], size or original_size(image_path))
+            except Exception as e:
+                reporter.warning(f"⚠️ Could not restore original size of {os.path.basename(image_path)}: {str(e)}")
+        return outcome
+    
+    misses = []
+    for i, (image_path, source_lang, target_lang, output_path) in enumerate(items):
+        output_path = output_path or f"{image_path}_translated.png"
+        
+        # Cache hits go straight to the caller without touching a browser
+        cache_key = None
+        if cache:
+            try:
+                cache_key, cached_path = cache.lookup(image_path, source_lang, target_lang, output_path)
+            except Exception as e:
+                # A missing or unreadable input fails on its own instead of aborting the batch
+                reporter.error(f"❌ Could not read {os.path.basename(image_path)}: {str(e)}")
+                yield {'index': i, 'translated_path': None, 'translated_text': None, 'error': classify(e),
+                       'cached': False, 'duplicate_of': None, 'fallback_path': None, 'tiles': 0}
+                continue
+            if cached_path:
+                outcome = {'index': i, 'translated_path': cached_path, 'translated_text': None, 'error': None,
+                           'cached': True, 'duplicate_of': None, 'fallback_path': None, 'tiles': 0}
+                yield _finish(outcome, image_path)
+                continue
+        misses.append((i, image_path, source_lang, target_lang, output_path, cache_key))
+    
+    if not misses:
+        return
+    
+    # Normalized uploads and tiles live here, never next to the caller's files. The directory
+    # goes away when the batch ends, and also if the caller abandons or breaks off the batch,
+    # since its finalizer runs once this generator is closed or collected.
+    work_dir = tempfile.TemporaryDirectory(prefix="imagesifter-batch-")
+    tile_dirs = {}
+    
+    # Near-identical uploads for the same language pair go to the browser once
+    followers = {}
+    if dedupe_threshold >= 0 and len(misses) > 1:
+        with span("dedupe"):
+            hashes = hash_batch([miss[1] for miss in misses])
+            clusters = cluster(hashes, dedupe_threshold, groups=[(miss[2], miss[3]) for miss in misses])
+        if len(clusters) < len(misses):
+            reporter.info(
+                f"🧬 {len(misses) - len(clusters)} near-duplicate upload(s) will reuse the translation of a similar image"
+            )
+        followers = {position: [misses[member] for member in members[1:]] for position, members in enumerate(clusters)}
+        misses = [misses[members[0]] for members in clusters]
+    
+    def _fan_out(outcome, follower):
+        """Outcome for a near-duplicate, sharing its representative's translation"""
+        i, output_path = follower[0], follower[4]
+        duplicate = dict(outcome, index=i, translated_path=None, duplicate_of=outcome['index'], fallback_path=None)
+        if outcome['error'] is None and outcome['translated_path']:
+            try:
+                shutil.copyfile(outcome['translated_path'], output_path)
+                duplicate['translated_path'] = output_path
+            except OSError as e:
+                duplicate['error'] = e
+        return duplicate
+    
+    # Oversized images become tiles; they skip normalization, which would shrink them illegibly
+    plans = {}
+    if tile_size and not text_only:
+        candidates = []
+        for position, miss in enumerate(misses):
+            try:
+                if needs_tiling(original_size(miss[1]), tile_size):
+                    candidates.append(position)
+            except Exception:
+                continue
+        if candidates:
+            tile_dirs = {p: os.path.join(work_dir.name, f"{p:05d}.tiles") for p in candidates}
+            with span("tiling"):
+                split = split_batch([misses[p][1] for p in candidates], [tile_dirs[p] for p in candidates], tile_size)
+            for position, plan in zip(candidates, split):
+                name = os.path.basename(misses[position][1])
+                if plan['error']:
+                    reporter.warning(f"⚠️ Could not split {name} into tiles, translating it whole: {plan['error']}")
+                    continue
+                plans[position] = plan
+                reporter.info(f"🧩 {name} ({plan['size'][0]}×{plan['size'][1]}) split into {len(plan['tiles'])} tiles")
+    whole = [position for position in range(len(misses)) if position not in plans]
+    
+    # Orientation, downscaling and format fixes run in parallel processes before any upload
+    if max_dimension:
+        with span("preprocess"):
+            records = dict(zip(whole, normalize_batch([misses[p][1] for p in whole], max_dimension=max_dimension,
+                                                                directory=work_dir.name)))
+    else:
+        records = {p: {'path': misses[p][1], 'original_size': None, 'scale': 1.0, 'error': None} for p in whole}
+    
+    # Only now is a browser needed; a batch of cache hits never starts one
+    pool = pool or get_driver_pool()
+    
+    # Each job is either a whole image (tile None) or one tile of a split image
+    jobs = []
+    job_owners = []
+    for position, (i, image_path, source_lang, target_lang, output_path, cache_key) in enumerate(misses):
+        if position in plans:
+            for tile_index, tile in enumerate(plans[position]['tiles']):
+                jobs.append((tile['path'], source_lang, target_lang, pool, cache, None, reporter,
+                             f"{os.path.splitext(tile['path'])[0]}_translated.png"))
+                job_owners.append((position, tile_index))
+            continue
+        record = records[position]
+        if record['error']:
+            reporter.warning(f"⚠️ Could not normalize {os.path.basename(image_path)}, uploading as-is: {record['error']}")
+        elif record['scale'] < 1.0:
+            reporter.info(f"📐 {os.path.basename(image_path)} downscaled to {record['scale']:.0%} for upload")
+        upload_path = record['path'] if not record['error'] else image_path
+        jobs.append((upload_path, source_lang, target_lang, pool, cache, cache_key, reporter, output_path))
+        job_owners.append((position, None))
+    
+    pool.resize(max(concurrency, POOL_SIZE))
+    rate_limiter = get_rate_limiter()
+    breaker = get_circuit_breaker()
+    scheduler = GroupScheduler([(job[1], job[2]) for job in jobs], PAIR_QUANTUM if pair_quantum is None else pair_quantum)
+    if scheduler.groups > 1:
+        reporter.info(f"🗺️ {scheduler.groups} language pairs in this batch; each browser keeps to one pair at a time")
+    
+    def _translate(*job):
+        return translate_with_retries(job, reporter=reporter, rate_limiter=rate_limiter, breaker=breaker, text_only=text_only)
+    
+    def _assemble(position, tile_results):
+        """Stitch a split image once all its tiles are in; returns (translated_path, error)"""
+        plan = plans[position]
+        output_path, cache_key = misses[position][4], misses[position][5]
+        try:
+            errors = [error for _, error in tile_results if error is not None]
+            if errors:
+                # Other tiles of the image may still have translated; one gap spoils the whole
+                return None, errors[0]
+            with span("stitch"):
+                stitch(plan, [path for path, _ in tile_results], output_path)
+            if cache and cache_key:
+                try:
+                    cache.put(cache_key, output_path)
+                except Exception as cache_error:
+                    reporter.warning(f"⚠️ Could not cache translation: {str(cache_error)}")
+            return output_path, None
+        except Exception as e:
+            return None, classify(e)
+        finally:
+            shutil.rmtree(tile_dirs[position], ignore_errors=True)
+    
+    def _yield_outcome(position, translated_path, translated_text, error, tiles=0):
+        i, image_path = misses[position][0], misses[position][1]
+        outcome = {
+            'index': i,
+            'translated_path': translated_path,
+            'translated_text': translated_text,
+            'error': error,
+            'cached': False,
+            'duplicate_of': None,
+            'fallback_path': getattr(error, 'fallback_path', None),
+            'tiles': tiles,
+        }
+        # Copy before the representative is resized, so each duplicate is restored to its own size
+        duplicates = [(_fan_out(outcome, follower), follower[1]) for follower in followers.get(position, [])]
+        size = plans[position]['size'] if position in plans else records[position]['original_size']
+        yield _finish(outcome, image_path, size)
+        for duplicate, duplicate_path in duplicates:
+            yield _finish(duplicate, duplicate_path)
+    
+    pending_tiles = {position: [None] * len(plan['tiles']) for position, plan in plans.items()}
+    for job_index, result, error in run_batch(jobs, _translate, concurrency=concurrency, initializer=initializer,
+                                                 scheduler=scheduler):
+        position, tile_index = job_owners[job_index]
+        translated_path, translated_text = result if result else (None, None)
+        if tile_index is None:
+            yield from _yield_outcome(position, translated_path, translated_text, error)
+            continue
+        tile_results = pending_tiles[position]
+        tile_results[tile_index] = (translated_path, error if error is not None or translated_path else
+                                    TranslationFailure("error", "Tile produced no image"))
+        if all(tile_results):
+            del pending_tiles[position]
+            stitched_path, stitch_error = _assemble(position, tile_results)
+            yield from _yield_outcome(position, stitched_path, None, stitch_error, tiles=len(tile_results))
+    
+    work_dir.cleanup()
+    if scheduler.groups > 1:
+        reporter.info(f"🗺️ Browsers switched language pair {scheduler.switches} time(s)")
+    
+    try:
+        REGISTRY.write_prometheus()
+    except OSError as e:
+        reporter.warning(f"⚠️ Could not write metrics file: {str(e)}")
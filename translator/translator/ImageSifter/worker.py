@@ -0,0 +1,289 @@
+"""
+Background translation worker: claims items from the job queue and translates them.
+
+    python worker.py --concurrency 2
+    python worker.py --coordinator http://coordinator-host:8765 --concurrency 2
+
+Run one or more of these next to the app (the UI also starts one on demand). Workers
+survive UI reconnects; if one dies its items are re-queued after STALE_SECONDS, at most
+MAX_CLAIMS times, and a batch that raises fails its items instead of leaving them running. With
+--coordinator the worker takes its items from a coordinator on another host instead of the
+local queue (see coordinator.py) and exits when that job is done.
+"""
+import argparse
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import uuid
+from archive import JsonLinesExport, StreamingArchive
+from coordinator import CoordinatorClient
+from jobqueue import QUEUE_DIR, STALE_SECONDS, JobQueue
+from metrics import REGISTRY
+from reporting import LoggingReporter
+from translation import POOL_SIZE, translate_batch
+
+logger = logging.getLogger("imagesifter")
+
+HEARTBEAT_SECONDS = 15
+
+# Items claimed per browser at once, so dedupe and language-pair scheduling see a real batch
+CLAIM_PER_BROWSER = int(os.environ.get("IMAGESIFTER_WORKER_CLAIM_PER_BROWSER", "16"))
+
+# Worker processes this one started, kept so their exit status is collected
+_spawned = []
+
+
+def build_job_archive(queue, job_id):
+    """
+    Zip a finished job's outputs next to them so any session can download it later; text-only
+    jobs get a JSON-lines file with one object per translated image instead
+    """
+    if queue.job(job_id)["text_only"]:
+        path = os.path.join(queue.job_dir(job_id), "translations.jsonl")
+        with JsonLinesExport(path) as export:
+            for item in queue.items(job_id):
+                if item["status"] == "done" and item["result"]:
+                    export.add(dict(image=item["name"], source_lang=item["source_lang"],
+                                    target_lang=item["target_lang"], **item["result"]))
+        queue.set_archive(job_id, path)
+        return path
+    path = os.path.join(queue.job_dir(job_id), "translated_images.zip")
+    with StreamingArchive(path) as archive:
+        for item in queue.items(job_id):
+            if item["status"] == "done" and os.path.exists(item["output_path"]):
+                archive.add(item["output_path"], f"translated_image_{item['idx'] + 1}.png")
+    queue.set_archive(job_id, path)
+    return path
+
+
+def _default_worker_id():
+    # Only characters coordinator.WORKER_ID_RE accepts; host names may contain dots
+    node = re.sub(r"[^A-Za-z0-9_-]", "-", os.uname().nodename)[:64]
+    return f"{node}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _complete(queue, item, ok, error=None, cached=False, result=None):
+    """Record one item's outcome, and build the job's archive if it was the last one"""
+    finished_job = queue.complete(item["id"], ok, error=error, cached=cached, result=result)
+    logger.info("%s item %d (%s): %s", item["job_id"], item["idx"], item["name"], "ok" if ok else error)
+    if finished_job:
+        build_job_archive(queue, finished_job)
+        logger.info("Job %s finished", finished_job)
+
+
+def run_worker(queue, concurrency=POOL_SIZE, poll_interval=1.0, idle_exit=0, worker_id=None):
+    worker_id = worker_id or _default_worker_id()
+    stop = threading.Event()
+
+    def _heartbeat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                queue.heartbeat(worker_id)
+            except Exception as e:
+                logger.warning("Heartbeat failed: %s", e)
+
+    queue.heartbeat(worker_id)
+    threading.Thread(target=_heartbeat, name="queue-heartbeat", daemon=True).start()
+    reporter = LoggingReporter()
+    logger.info("Worker %s polling %s", worker_id, queue.root)
+
+    idle_since = time.monotonic()
+    try:
+        while True:
+            requeued, abandoned, finished_jobs = queue.requeue_stale(STALE_SECONDS)
+            if requeued:
+                logger.warning("Re-queued %d item(s) from unresponsive workers", requeued)
+            if abandoned:
+                logger.error("Failed %d item(s) that were lost with their worker too many times", abandoned)
+            for finished_job in finished_jobs:
+                build_job_archive(queue, finished_job)
+                logger.info("Job %s finished", finished_job)
+
+            claimed = queue.claim(worker_id, limit=max(1, concurrency * CLAIM_PER_BROWSER))
+            if not claimed:
+                if idle_exit and time.monotonic() - idle_since > idle_exit:
+                    logger.info("Idle for %ds, exiting", idle_exit)
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            # Items from different jobs may ask for different batch options
+            def _settings(c):
+                return bool(c["restore_size"]), c["dedupe_threshold"], bool(c["text_only"])
+
+            for restore_size, dedupe_threshold, text_only in sorted({_settings(c) for c in claimed}, key=repr):
+                group = [c for c in claimed if _settings(c) == (restore_size, dedupe_threshold, text_only)]
+                items = [(c["input_path"], c["source_lang"], c["target_lang"], c["output_path"]) for c in group]
+                reported = set()
+                job_ids = {c["job_id"] for c in group}
+                metrics_before = [REGISTRY.snapshot()]
+
+                def _save_phases():
+                    # Saved before each completion so a job's timings are in place by the time it is
+                    # marked finished; a batch spanning several jobs counts towards each
+                    now = REGISTRY.snapshot()
+                    phases = {phase: histogram.minus(metrics_before[0].get(phase)) for phase, histogram in now.items()}
+                    phases = {phase: histogram for phase, histogram in phases.items() if histogram.count}
+                    metrics_before[0] = now
+                    if phases:
+                        for job_id in job_ids:
+                            queue.add_phases(job_id, phases)
+
+                try:
+                    for outcome in translate_batch(items, concurrency=concurrency, reporter=reporter, restore_size=restore_size,
+                                                   dedupe_threshold=dedupe_threshold, text_only=text_only):
+                        item = group[outcome["index"]]
+                        ok = outcome["error"] is None and bool(outcome["translated_path"] or outcome["translated_text"])
+                        error = str(outcome["error"]) if outcome["error"] is not None else (None if ok else "Translation failed")
+                        reported.add(item["id"])
+                        _save_phases()
+                        _complete(queue, item, ok, error, cached=outcome["cached"], result=outcome["translated_text"])
+                except Exception as e:
+                    # Fail what this batch still held rather than leave it 'running' for the next
+                    # worker to crash on
+                    logger.exception("Batch of %d item(s) failed", len(group))
+                    _save_phases()
+                    for item in group:
+                        if item["id"] not in reported:
+                            _complete(queue, item, False, f"Worker error: {e}")
+            idle_since = time.monotonic()
+    finally:
+        stop.set()
+        queue.unregister(worker_id)
+
+
+def run_remote_worker(url, concurrency=POOL_SIZE, poll_interval=1.0, worker_id=None, max_errors=5):
+    """Translate items handed out by a coordinator until it reports the job done (or goes away)"""
+    worker_id = worker_id or _default_worker_id()
+    client = CoordinatorClient(url)
+    heartbeat_seconds = client.register(worker_id, concurrency)["heartbeat_seconds"]
+    stop = threading.Event()
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+
+    def _heartbeat():
+        while not stop.wait(heartbeat_seconds):
+            with in_flight_lock:
+                running = sorted(in_flight)
+            try:
+                client.heartbeat(worker_id, running)
+            except (OSError, urllib.error.URLError) as e:
+                logger.warning("Heartbeat failed: %s", e)
+
+    threading.Thread(target=_heartbeat, name="coordinator-heartbeat", daemon=True).start()
+    reporter = LoggingReporter()
+    logger.info("Worker %s taking items from %s", worker_id, url)
+
+    errors = 0
+    try:
+        with tempfile.TemporaryDirectory(prefix="imagesifter-remote-") as work_dir:
+            while True:
+                try:
+                    response = client.claim(worker_id, concurrency)
+                    errors = 0
+                except (OSError, urllib.error.URLError) as e:
+                    errors += 1
+                    if errors >= max_errors:
+                        logger.info("Coordinator unreachable (%s), exiting", e)
+                        return
+                    time.sleep(poll_interval * errors)
+                    continue
+                claimed = response["items"]
+                if not claimed:
+                    if response["done"]:
+                        logger.info("Coordinator reports the job is done")
+                        return
+                    time.sleep(poll_interval)
+                    continue
+
+                with in_flight_lock:
+                    in_flight.update(c["id"] for c in claimed)
+                items = []
+                for c in claimed:
+                    input_path = client.fetch_input(c["id"], os.path.join(work_dir, f"{c['id']}_{os.path.basename(c['name'])}"))
+                    items.append((input_path, c["source_lang"], c["target_lang"], f"{input_path}_translated.png"))
+                for outcome in translate_batch(items, concurrency=concurrency, reporter=reporter, **response["options"]):
+                    item = claimed[outcome["index"]]
+                    ok = outcome["error"] is None and bool(outcome["translated_path"] or outcome["translated_text"])
+                    try:
+                        if ok and outcome["translated_path"]:
+                            client.upload_output(item["id"], worker_id, outcome["translated_path"])
+                        client.complete(item["id"], worker_id, {
+                            "ok": ok,
+                            "error": str(outcome["error"]) if outcome["error"] is not None else (None if ok else "Translation failed"),
+                            "reason": getattr(outcome["error"], "reason", None),
+                            "attempts": getattr(outcome["error"], "attempts", None),
+                            "cached": outcome["cached"],
+                            "tiles": outcome["tiles"],
+                            "duplicate_of": claimed[outcome["duplicate_of"]]["id"] if outcome["duplicate_of"] is not None else None,
+                            "translated_text": outcome["translated_text"],
+                        })
+                    except (OSError, urllib.error.URLError) as e:
+                        # Dropped from the heartbeat below, so the coordinator hands it to someone else
+                        logger.warning("Could not report item %d: %s", item["id"], e)
+                        continue
+                    finally:
+                        with in_flight_lock:
+                            in_flight.discard(item["id"])
+                    logger.info("Item %d (%s): %s", item["id"], item["name"], "ok" if ok else outcome["error"])
+                for path, _, _, output_path in items:
+                    for leftover in (path, output_path):
+                        if os.path.exists(leftover):
+                            os.remove(leftover)
+    finally:
+        stop.set()
+
+
+def ensure_worker(queue, concurrency=POOL_SIZE, idle_exit=900):
+    """Start a detached worker process unless one is already checking in"""
+    # Reap workers started earlier, so one that died is not mistaken for a live (zombie) pid
+    _spawned[:] = [process for process in _spawned if process.poll() is None]
+    if queue.live_workers():
+        return False
+    worker_id = _default_worker_id()
+    with open(os.path.join(queue.root, "worker.log"), "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--queue-dir", queue.root, "--worker-id", worker_id,
+             "--concurrency", str(concurrency), "--idle-exit", str(idle_exit)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    _spawned.append(process)
+    # Register the child straight away so concurrent sessions do not each spawn a worker; if it
+    # dies on startup its pid disappears and live_workers() stops counting it
+    queue.heartbeat(worker_id, pid=process.pid)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process queued image translation jobs.")
+    parser.add_argument("--queue-dir", default=QUEUE_DIR, help="Job queue directory")
+    parser.add_argument("-c", "--concurrency", type=int, default=POOL_SIZE, help="Parallel browsers")
+    parser.add_argument("--idle-exit", type=int, default=0, help="Exit after this many idle seconds (0 = never)")
+    parser.add_argument("--prune-days", type=int, default=7, help="Delete finished jobs older than this on startup")
+    parser.add_argument("--coordinator", help="Take items from the coordinator at this URL instead of the local queue")
+    parser.add_argument("--worker-id", help="Identify as this worker (default: host, pid and a random suffix)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.coordinator:
+        run_remote_worker(args.coordinator, concurrency=args.concurrency, worker_id=args.worker_id)
+        return 0
+
+    queue = JobQueue(args.queue_dir)
+    if args.prune_days:
+        queue.prune(args.prune_days)
+    run_worker(queue, concurrency=args.concurrency, idle_exit=args.idle_exit, worker_id=args.worker_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())